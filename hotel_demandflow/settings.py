@@ -21,6 +21,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so under ASGI every streamed body reaches the server as an async iterator
+    "hotel_queue.middleware.AsyncStreamingMiddleware",
+    # Next, so its timings and query counts cover the rest of the stack
+    "hotel_queue.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -34,7 +38,8 @@ ROOT_URLCONF = "hotel_demandflow.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Django's engine, timing renders for the request metrics
+        "BACKEND": "hotel_queue.backends.templates.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -49,15 +54,60 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "hotel_demandflow.wsgi.application"
+# Live dashboard updates (/events/) are only streamed under the ASGI app, served
+# by a single worker process, e.g. `uvicorn hotel_demandflow.asgi:application`.
+# Exports stream there too: AsyncStreamingMiddleware keeps them from being buffered.
 ASGI_APPLICATION = "hotel_demandflow.asgi.application"
 
+# SQLite tuned for several staff writing at once (see hotel_queue/backends/sqlite3):
+# WAL lets reads carry on during a write, writers BEGIN IMMEDIATE and wait up to
+# "timeout" seconds for the write lock, and connections are kept between requests.
+# WAL is kept in the database file and switched on once by migration 0017, so
+# only the per-connection pragmas are run here and opening the database for
+# `check` or `test` does not rewrite it.
+# `manage.py benchmark_sqlite` compares this with the stock settings.
+SQLITE_INIT_COMMAND = ";".join([
+    # Safe with WAL: a power cut can lose the last commits but not corrupt the database
+    "PRAGMA synchronous = NORMAL",
+    # Page cache per connection, in KiB when negative
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+])
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "hotel_queue.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": SQLITE_INIT_COMMAND,
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        "CONN_MAX_AGE": 60,
     }
 }
 
+# Reports (completed list, exports, stats, admin change lists) read through a
+# second, read-only connection to the same file, chosen by
+# hotel_queue.routers.ReportingRouter. Its big page cache and mmap are its own,
+# so a long export neither holds the write lock nor evicts the live queue's pages.
+DATABASES["reporting"] = {
+    **DATABASES["default"],
+    "OPTIONS": {
+        "read_only": True,
+        "init_command": ";".join([
+            "PRAGMA query_only = ON",
+            "PRAGMA cache_size = -64000",
+            "PRAGMA mmap_size = 268435456",
+            "PRAGMA temp_store = MEMORY",
+        ]),
+        "timeout": 20,
+    },
+    "TEST": {"MIRROR": "default"},
+}
+
+DATABASE_ROUTERS = ["hotel_queue.routers.ReportingRouter"]
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = "en-us"
@@ -75,6 +125,37 @@ LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "dashboard"
 LOGOUT_REDIRECT_URL = "login"
 
-
-
-
+# Finished background exports are kept here and reused until completed demands change
+EXPORT_ROOT = BASE_DIR / "exports"
+# Run export jobs in a worker thread; set to False to leave them for `manage.py run_export_jobs`
+EXPORT_JOBS_IN_THREAD = True
+
+# `manage.py archive_demands` moves demands completed this long ago out of the live queue
+ARCHIVE_AFTER_HOURS = 24
+
+# Demands without an expected completion are queued as if due this many minutes
+# after creation, so deadline-first ordering ages them forward instead of starving them
+DEFAULT_DEADLINE_MINUTES = 60
+
+# "fifo" claims the oldest pending demand, and auto-assigns by expected completion,
+# then age; "deadline" does both by due_at, soonest first (see DEFAULT_DEADLINE_MINUTES)
+QUEUE_ORDER = "fifo"
+
+# Give new demands to free staff of the right role, and free staff the next demand, automatically
+AUTO_ASSIGN = True
+
+# Hand demand writes (add, start, complete, bulk changes, ingestion, assignment) to
+# one writer thread per process that commits whatever arrives within
+# WRITE_BATCH_WINDOW_MS, up to WRITE_BATCH_SIZE operations, in a single
+# transaction (see hotel_queue/writer.py)
+COALESCE_WRITES = False
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_WINDOW_MS = 2
+
+# Per-view request histograms (hotel_queue/middleware.py) are served at /metrics/
+# in the Prometheus text format: to staff, or to a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("DJANGO_METRICS_TOKEN", "")
+# Log requests slower than this, with their SQL, to the "hotel_queue.performance"
+# logger; None turns the log off
+SLOW_REQUEST_MS = None
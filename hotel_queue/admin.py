@@ -1,20 +1,116 @@
 from django.contrib import admin
-from .models import Demand, HotelSettings, StaffRole, StaffMember
+from .dispatch import demands_removed, refresh_open_demands, staff_freed
+from .eventlog import STATUS_EVENTS, log_created, log_events
+from .rollups import record_completions
+from .routers import reporting_reads
+from .models import CapacityLimit, Demand, DemandArchive, DemandEvent, DemandTombstone, ExportJob, HotelSettings, ServiceRollup, StaffRole, StaffMember
+from .sync import next_version, record_tombstones
+
+
+class ReportingChangeListMixin:
+    """Read change list pages from the read-only reporting database; actions and edits still write to the primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with reporting_reads():
+            response = super().changelist_view(request, extra_context)
+            # The rows are only fetched while the template renders
+            if hasattr(response, "render"):
+                response.render()
+        return response
 
 
 @admin.register(Demand)
-class DemandAdmin(admin.ModelAdmin):
+class DemandAdmin(ReportingChangeListMixin, admin.ModelAdmin):
     list_display = ("id", "demand_type", "status", "created_at", "expected_completion", "completed_at", "room_or_table", "quantity", "assigned_to", "created_by", "fulfilled_by")
     list_filter = ("demand_type", "status", "created_at", "assigned_to")
     search_fields = ("description", "room_or_table", "created_by__username", "fulfilled_by__username", "assigned_to__name")
     ordering = ("-created_at",)
 
+    # Edits can change who is busy, so recount open demands for the staff involved.
+    # Admin views run in a transaction, so versions and tombstones commit with the change.
+    def save_model(self, request, obj, form, change):
+        previous = form.initial.get("assigned_to") if change else None
+        obj.version = next_version()
+        super().save_model(request, obj, form, change)
+        if not change:
+            log_created([obj], request.user)
+        else:
+            if "assigned_to" in form.changed_data and obj.assigned_to_id:
+                log_events("assigned", [obj.pk], request.user, staff_id=obj.assigned_to_id)
+            if "status" in form.changed_data and obj.status in STATUS_EVENTS:
+                log_events(STATUS_EVENTS[obj.status], [obj.pk], request.user)
+                if obj.status == "Completed" and obj.completed_at:
+                    record_completions(obj.version)
+        refresh_open_demands([previous, obj.assigned_to_id])
+
+    def delete_model(self, request, obj):
+        demand_id = obj.pk
+        super().delete_model(request, obj)
+        record_tombstones([demand_id])
+        log_events("cleared", [demand_id], request.user)
+        refresh_open_demands([obj.assigned_to_id])
+        demands_removed([demand_id])
+        staff_freed([obj.assigned_to_id])
+
+    def delete_queryset(self, request, queryset):
+        staff_ids = set(queryset.values_list("assigned_to_id", flat=True))
+        demand_ids = list(queryset.values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+        record_tombstones(demand_ids)
+        log_events("cleared", demand_ids, request.user)
+        refresh_open_demands(staff_ids)
+        demands_removed(demand_ids)
+        staff_freed(staff_ids)
+
+
+@admin.register(DemandArchive)
+class DemandArchiveAdmin(ReportingChangeListMixin, admin.ModelAdmin):
+    list_display = ("id", "demand_type", "status", "created_at", "completed_at", "archived_at", "room_or_table", "assigned_to", "created_by", "fulfilled_by")
+    list_filter = ("demand_type", "completed_at")
+    search_fields = ("description", "room_or_table", "created_by__username", "fulfilled_by__username", "assigned_to__name")
+    ordering = ("-completed_at",)
+
+
+@admin.register(DemandTombstone)
+class DemandTombstoneAdmin(admin.ModelAdmin):
+    list_display = ("id", "demand_id", "version", "removed_at")
+    search_fields = ("demand_id",)
+
+
+@admin.register(DemandEvent)
+class DemandEventAdmin(ReportingChangeListMixin, admin.ModelAdmin):
+    list_display = ("id", "demand_id", "kind", "at", "demand_type", "actor_id", "staff_id")
+    list_filter = ("kind", "demand_type")
+    search_fields = ("demand_id",)
+
+    # The log is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ServiceRollup)
+class ServiceRollupAdmin(ReportingChangeListMixin, admin.ModelAdmin):
+    list_display = ("id", "hour", "demand_type", "staff_id", "count", "wait_seconds", "service_seconds")
+    list_filter = ("demand_type",)
+    ordering = ("-hour",)
+
 
 @admin.register(HotelSettings)
 class HotelSettingsAdmin(admin.ModelAdmin):
     list_display = ("id", "num_tables", "num_rooms")
 
 
+@admin.register(CapacityLimit)
+class CapacityLimitAdmin(admin.ModelAdmin):
+    list_display = ("id", "demand_type", "room_or_table", "max_open", "policy", "rejected_count", "queued_count", "shed_count")
+    list_filter = ("policy", "demand_type")
+
+
 @admin.register(StaffRole)
 class StaffRoleAdmin(admin.ModelAdmin):
     list_display = ("id", "name")
@@ -23,8 +119,12 @@ class StaffRoleAdmin(admin.ModelAdmin):
 
 @admin.register(StaffMember)
 class StaffMemberAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "role")
+    list_display = ("id", "name", "role", "open_demands")
     list_filter = ("role",)
     search_fields = ("name", "role__name")
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "file_format", "status", "row_count", "last_completed_at", "created_at", "finished_at", "requested_by")
+    list_filter = ("status", "file_format")
@@ -5,9 +5,5 @@ class HotelQueueConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "hotel_queue"
 
-
-
-
-
-
-
+    def ready(self):
+        from . import signals  # noqa: F401
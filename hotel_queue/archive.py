@@ -0,0 +1,88 @@
+import heapq
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+
+from .eventlog import log_events
+from .models import Demand, DemandArchive
+from .sync import record_tombstones
+
+
+# Fields copied from a live Demand row into DemandArchive
+ARCHIVE_FIELDS = [
+    "id", "demand_type", "description", "status", "created_at", "expected_completion",
+    "started_at", "completed_at", "created_by_id", "fulfilled_by_id", "assigned_to_id", "quantity", "room_or_table",
+]
+
+ARCHIVE_BATCH_SIZE = 1000
+
+CLEAR_BATCH_SIZE = 500
+
+# Sorts completed rows without a completed_at last
+_NEVER = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+def completed_sources():
+    """Return the live and archived completed demands, each newest first.
+
+    Reports read both so archiving never hides history from them.
+    """
+    return [
+        Demand.objects.filter(status="Completed").order_by("-completed_at"),
+        DemandArchive.objects.order_by("-completed_at"),
+    ]
+
+
+def merge_completed(iterables):
+    """Merge per-table iterables that are already newest first into one newest-first stream."""
+    return heapq.merge(*iterables, key=lambda demand: demand.completed_at or _NEVER, reverse=True)
+
+
+def archive_completed(completed_before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move completed demands finished before ``completed_before`` into DemandArchive.
+
+    Rows move in batches, each in its own short transaction, so the write lock
+    is never held for long. Yields the number of rows moved per batch.
+    """
+    # Moved rows leave the table, so every batch is simply the first rows in
+    # (status, completed_at) index order; no sort and no keyset needed
+    candidates = Demand.objects.filter(status="Completed", completed_at__lt=completed_before).order_by()
+    while True:
+        with transaction.atomic():
+            rows = list(candidates.values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                return
+            ids = [row["id"] for row in rows]
+            DemandArchive.objects.bulk_create([DemandArchive(**row) for row in rows], ignore_conflicts=True)
+            Demand.objects.filter(id__in=ids).delete()
+            record_tombstones(ids)
+        yield len(ids)
+
+
+def clear_completed(batch_size=CLEAR_BATCH_SIZE, dry_run=False):
+    """Delete completed demands, live and archived, in chunks of primary keys.
+
+    Each chunk is its own short transaction, so writers adding demands wait
+    for one chunk at most instead of the whole clear. With ``dry_run`` nothing
+    is deleted and the chunks are only counted. Yields the number of rows per chunk.
+    """
+    for demands in completed_sources():
+        # Deleted rows leave the table, so each chunk is the first ids in index order
+        demands = demands.order_by()
+        if dry_run:
+            remaining = demands.count()
+            while remaining > 0:
+                yield min(batch_size, remaining)
+                remaining -= batch_size
+            continue
+        while True:
+            with transaction.atomic():
+                ids = list(demands.values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    break
+                log_events("cleared", ids)
+                _, deleted = demands.filter(id__in=ids).delete()
+                if demands.model is Demand:
+                    # Archived rows got their tombstones when they were archived
+                    record_tombstones(ids)
+            yield deleted.get(demands.model._meta.label, 0)
@@ -0,0 +1,95 @@
+import heapq
+import math
+from collections import defaultdict
+
+
+class AssignmentEngine:
+    """Per-role heaps of free staff and unassigned pending demands.
+
+    Demands are served earliest due first (demands without a due time after
+    those with one), then oldest first; staff longest free first.
+    Every operation is O(log n). Removal is lazy: an entry stays in its heap
+    until it reaches the top and is found to be stale, so callers can drop
+    demands or staff that something else took without searching the heap.
+
+    The engine holds no database state; dispatch.auto_assign confirms each
+    match with a conditional UPDATE and tells the engine when one was stale.
+    """
+
+    def __init__(self):
+        self._demand_heaps = defaultdict(list)
+        self._staff_heaps = defaultdict(list)
+        # Current heap entry per id; anything else found in a heap is stale
+        self._demands = {}
+        self._staff = {}
+
+    def __len__(self):
+        return len(self._demands)
+
+    def add_demand(self, demand_id, role, created_at, due_at=None):
+        due = due_at if due_at is not None else math.inf
+        entry = (due, created_at, demand_id, role)
+        self._demands[demand_id] = entry
+        heapq.heappush(self._demand_heaps[role], entry)
+
+    def remove_demand(self, demand_id):
+        self._demands.pop(demand_id, None)
+
+    def add_staff(self, staff_id, role, free_since):
+        entry = (free_since, staff_id, role)
+        self._staff[staff_id] = entry
+        heapq.heappush(self._staff_heaps[role], entry)
+
+    def remove_staff(self, staff_id):
+        self._staff.pop(staff_id, None)
+
+    def move_staff(self, staff_id, role):
+        """Queue a free staff member under a new ``role``, keeping their place in the free order."""
+        entry = self._staff.get(staff_id)
+        if entry is not None and entry[2] != role:
+            self.add_staff(staff_id, role, entry[0])
+
+    def roles(self):
+        return set(self._demand_heaps) & set(self._staff_heaps)
+
+    def _top(self, heap, live, id_index):
+        while heap:
+            entry = heap[0]
+            if live.get(entry[id_index]) == entry:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def pop_match(self, role):
+        """Take the most urgent demand and the longest-free staff member for ``role``.
+
+        Returns ``(demand_entry, staff_entry)`` or None when either side is
+        empty. Put an entry back with restore() if the match fails.
+        """
+        demand = self._top(self._demand_heaps[role], self._demands, 2)
+        staff = self._top(self._staff_heaps[role], self._staff, 1)
+        if demand is None or staff is None:
+            return None
+        heapq.heappop(self._demand_heaps[role])
+        heapq.heappop(self._staff_heaps[role])
+        del self._demands[demand[2]]
+        del self._staff[staff[1]]
+        return demand, staff
+
+    def restore_demand(self, entry):
+        self._demands[entry[2]] = entry
+        heapq.heappush(self._demand_heaps[entry[3]], entry)
+
+    def restore_staff(self, entry):
+        self._staff[entry[1]] = entry
+        heapq.heappush(self._staff_heaps[entry[2]], entry)
+
+    def match_all(self, role):
+        """Pair off demands and staff for ``role`` until one side runs out; return ``[(demand_id, staff_id)]``."""
+        pairs = []
+        while True:
+            match = self.pop_match(role)
+            if match is None:
+                return pairs
+            demand, staff = match
+            pairs.append((demand[2], staff[1]))
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = {"DEFERRED", "IMMEDIATE", "EXCLUSIVE"}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Django's SQLite backend plus the two connection options Django 5.1 adds.
+
+    OPTIONS may hold ``init_command``, ";"-separated statements (PRAGMAs) run
+    on every new connection, and ``transaction_mode``, how atomic blocks
+    BEGIN. With "IMMEDIATE" a transaction takes the write lock when it starts,
+    so two transactions that read and then write wait on the busy timeout
+    instead of one failing at once with "database is locked". The keys match
+    Django 5.1, so after an upgrade the stock ENGINE can take over.
+
+    ``read_only`` (ours, not Django's) opens the file with a ``mode=ro`` URI,
+    so the connection can never write or take the write lock.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("init_command", None)
+        if params.pop("read_only", False):
+            if self.is_in_memory_db():
+                raise ImproperlyConfigured(f"settings.DATABASES {self.alias!r} cannot open an in-memory database read-only")
+            params["database"] = Path(params["database"]).resolve().as_uri() + "?mode=ro"
+        mode = params.pop("transaction_mode", None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES {self.alias!r} transaction_mode must be one of {', '.join(sorted(TRANSACTION_MODES))}"
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.settings_dict["OPTIONS"].get("init_command", "").split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute(f"BEGIN {mode.upper()}" if mode else "BEGIN")
@@ -0,0 +1,33 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django
+from django.template.backends.django import reraise
+
+from hotel_queue.metrics import add_template_time
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        began = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            add_template_time(time.perf_counter() - began)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Django's template engine, timing each top-level render for hotel_queue.metrics.
+
+    Includes and extended templates render inside their parent, so they are
+    counted once, as part of it.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+
+from .models import CapacityLimit, HotelSettings, StaffMember, StaffRole
+
+
+LOCATIONS_KEY = "hotel_queue:locations"
+STAFF_KEY = "hotel_queue:staff"
+CAPACITY_KEY = "hotel_queue:capacity"
+
+# Saves and transitions delete these keys in this process; the timeout bounds
+# how stale another process's copy can get when the cache is not shared
+CACHE_TIMEOUT = 300
+
+
+def build_location_choices():
+    """Tables then rooms, as (value, label) pairs, sized from HotelSettings."""
+    settings_obj = HotelSettings.objects.first()
+    num_tables = settings_obj.num_tables if settings_obj else 10
+    num_rooms = settings_obj.num_rooms if settings_obj else 10
+    table_choices = [(f"Table {i}", f"Table {i}") for i in range(1, num_tables + 1)]
+    room_choices = [(f"Room {100+i}", f"Room {100+i}") for i in range(1, num_rooms + 1)]
+    return table_choices + room_choices
+
+
+def location_choices():
+    return cache.get_or_set(LOCATIONS_KEY, build_location_choices, CACHE_TIMEOUT)
+
+
+def build_staff():
+    return {
+        "roles": set(StaffRole.objects.values_list("name", flat=True)),
+        "members": {member.id: member for member in StaffMember.objects.select_related("role").order_by("id")},
+    }
+
+
+def staff():
+    """Role names and every StaffMember (with role and open_demands) keyed by id."""
+    return cache.get_or_set(STAFF_KEY, build_staff, CACHE_TIMEOUT)
+
+
+def staff_by_role():
+    members_by_role = {}
+    for member in staff()["members"].values():
+        members_by_role.setdefault(member.role.name, []).append(member)
+    return members_by_role
+
+
+def build_capacity_limits():
+    # Most specific first, so a demand is turned away by the narrowest full buffer
+    limits = list(CapacityLimit.objects.all())
+    limits.sort(key=lambda limit: (not limit.demand_type, not limit.room_or_table, limit.id))
+    return limits
+
+
+def capacity_limits():
+    """Every CapacityLimit, type-and-location limits first. The counters on them may be stale."""
+    return cache.get_or_set(CAPACITY_KEY, build_capacity_limits, CACHE_TIMEOUT)
+
+
+def invalidate_locations(**kwargs):
+    cache.delete(LOCATIONS_KEY)
+
+
+def invalidate_staff(**kwargs):
+    cache.delete(STAFF_KEY)
+
+
+def invalidate_capacity(**kwargs):
+    cache.delete(CAPACITY_KEY)
@@ -0,0 +1,158 @@
+from collections import Counter
+
+from django.db.models import F
+
+from .caching import capacity_limits
+from .eventlog import log_events, log_transition
+from .models import CapacityLimit, Demand
+from .sync import next_version, record_tombstones
+from .writer import run_write
+
+
+# What became of a demand offered to admit()
+ADMITTED = "admitted"
+QUEUED = "queued"
+REJECTED = "rejected"
+SHED = "shed"
+
+# Counter bumped on the limit that turned a demand away, per outcome
+OUTCOME_COUNTERS = {
+    QUEUED: "queued_count",
+    REJECTED: "rejected_count",
+    SHED: "shed_count",
+}
+
+# Seconds a client turned away by a full buffer is asked to wait before retrying
+RETRY_AFTER_SECONDS = 30
+
+# Waiting demands looked at per release_waiting call
+RELEASE_BATCH = 200
+
+
+class Buffers:
+    """Open-demand counts for the capacity limits an admission batch touches.
+
+    Each count is read once, on the (status, demand_type, room_or_table)
+    index, and then kept up to date in memory as demands are admitted or
+    shed. Use it inside the transaction that reserved a sync version: the
+    write lock that takes keeps other writers out until the inserts commit,
+    so the counts cannot go stale under a concurrent request.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = capacity_limits() if limits is None else limits
+        self.counts = {}
+        self.outcomes = Counter()
+
+    def count(self, limit):
+        if limit.id not in self.counts:
+            self.counts[limit.id] = limit.open_demands().count()
+        return self.counts[limit.id]
+
+    def full_limit(self, demand):
+        """The first limit ``demand`` falls under that has no room left, or None."""
+        for limit in self.limits:
+            if limit.applies_to(demand) and self.count(limit) >= limit.max_open:
+                return limit
+        return None
+
+    def take(self, demand, change=1):
+        for limit in self.limits:
+            if limit.applies_to(demand):
+                self.counts[limit.id] = self.count(limit) + change
+
+    def record(self, limit, outcome):
+        self.outcomes[limit.id, OUTCOME_COUNTERS[outcome]] += 1
+
+    def save_counters(self):
+        for (limit_id, field), total in self.outcomes.items():
+            CapacityLimit.objects.filter(id=limit_id).update(**{field: F(field) + total})
+        self.outcomes.clear()
+
+
+def admit(demand, buffers, version, user=None):
+    """Decide whether a new, unsaved ``demand`` fits the capacity limits.
+
+    Returns ``(outcome, limit, shed_id)``. ADMITTED: save it as it is. QUEUED:
+    its status is now Waiting; save it. SHED: a less urgent, unassigned
+    pending demand (``shed_id``) was deleted to make room; save it. REJECTED:
+    do not save it, because the buffer is full or, under the shed policy,
+    because it is the least urgent demand there. ``limit`` is the full limit
+    that decided. Call buffers.save_counters() before the transaction commits.
+    """
+    if not buffers.limits:
+        return ADMITTED, None, None
+    demand.set_due_at()
+    limit = buffers.full_limit(demand)
+    if limit is None:
+        buffers.take(demand)
+        return ADMITTED, None, None
+    if limit.policy == "queue":
+        buffers.record(limit, QUEUED)
+        demand.status = "Waiting"
+        return QUEUED, limit, None
+    if limit.policy == "shed":
+        victim = (
+            limit.open_demands()
+            .filter(status="Pending", assigned_to__isnull=True, due_at__gt=demand.due_at)
+            .order_by("-due_at", "-id")
+            .values_list("id", "demand_type", "room_or_table")
+            .first()
+        )
+        if victim is not None:
+            victim = Demand(id=victim[0], demand_type=victim[1], room_or_table=victim[2])
+            buffers.take(victim, -1)
+            if buffers.full_limit(demand) is None:
+                buffers.take(demand)
+                log_events("shed", [victim.id], user)
+                Demand.objects.filter(id=victim.id).delete()
+                record_tombstones([victim.id], version)
+                buffers.record(limit, SHED)
+                return SHED, limit, victim.id
+            # Another full buffer would still turn the demand away; keep the victim
+            buffers.take(victim)
+        # The new demand is the least urgent one, so it is the one turned away
+        buffers.record(limit, REJECTED)
+        return REJECTED, limit, None
+    buffers.record(limit, REJECTED)
+    return REJECTED, limit, None
+
+
+def buffer_name(limit):
+    return " at ".join(part for part in [limit.demand_type, limit.room_or_table] if part) or "The queue"
+
+
+def full_message(limit):
+    """Why a demand was turned away, for form errors and ingest responses."""
+    if limit.policy == "shed":
+        return (f"{buffer_name(limit)} is at capacity ({limit.max_open} open) "
+                f"and nothing waiting there is less urgent than this demand.")
+    return f"{buffer_name(limit)} is at capacity ({limit.max_open} open). Try again later."
+
+
+def release_waiting(user=None):
+    """Move Waiting demands into their buffers, most urgent first, while there is room.
+
+    Returns the released demands, now Pending. Run it after demands complete
+    or limits change.
+    """
+    if not Demand.objects.filter(status="Waiting").exists():
+        return []
+    return run_write(lambda: _release(user))
+
+
+def _release(user):
+    version = next_version()
+    buffers = Buffers()
+    released = []
+    for demand in Demand.objects.filter(status="Waiting").order_by("due_at", "id")[:RELEASE_BATCH]:
+        if buffers.full_limit(demand) is None:
+            buffers.take(demand)
+            demand.status = "Pending"
+            released.append(demand)
+    if released:
+        Demand.objects.filter(id__in=[demand.id for demand in released], status="Waiting").update(
+            status="Pending", version=version
+        )
+        log_transition("released", version, user)
+    return released
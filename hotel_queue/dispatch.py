@@ -0,0 +1,346 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .assignment import AssignmentEngine
+from .caching import invalidate_staff
+from .capacity import REJECTED, Buffers, admit, release_waiting
+from .eventlog import STATUS_EVENTS, log_created, log_transition
+from .events import publish_demands
+from .models import DEMAND_TYPE_ROLES, Demand, StaffMember
+from .rollups import record_completions
+from .sync import next_version
+from .writer import run_write
+
+
+# Statuses a demand is open, and can be completed, in
+OPEN_STATES = ["Pending", "In Progress"]
+
+# Statuses that keep the assigned staff member busy: a Waiting demand is still
+# theirs, and becomes Pending as soon as its buffer has room
+BUSY_STATES = ["Waiting", *OPEN_STATES]
+
+# Seconds the in-memory assignment engine is trusted before it is reloaded, so
+# changes made by other processes are picked up
+ENGINE_MAX_AGE = 60
+
+
+def refresh_open_demands(staff_ids=None):
+    """Recount StaffMember.open_demands for ``staff_ids`` (every member if None).
+
+    The count is recomputed from Demand on the (status, assigned_to) index
+    rather than incremented, so it cannot drift after a lost race or a failed
+    request. Call it after anything that creates, completes or reassigns
+    assigned demands.
+    """
+    members = StaffMember.objects.all()
+    if staff_ids is not None:
+        staff_ids = {staff_id for staff_id in staff_ids if staff_id}
+        if not staff_ids:
+            return
+        members = members.filter(id__in=staff_ids)
+    open_counts = (
+        Demand.objects.filter(assigned_to=OuterRef("pk"), status__in=BUSY_STATES)
+        .order_by()
+        .values("assigned_to")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    members.update(open_demands=Coalesce(Subquery(open_counts), 0))
+    invalidate_staff()
+
+
+def demand_types_for_role(role_name):
+    return [demand_type for demand_type, role in DEMAND_TYPE_ROLES.items() if role == role_name]
+
+
+def create_demand(demand, user):
+    """Admit an unsaved demand past the capacity limits and save it; return ``(outcome, limit, shed_id)``.
+
+    A REJECTED demand is not saved. Recounting, publishing and assignment are
+    left to the caller, as the write may have been batched (see writer.py).
+    """
+    return run_write(lambda: _create(demand, user))
+
+
+def _create(demand, user):
+    demand.version = next_version()
+    buffers = Buffers()
+    outcome, limit, shed_id = admit(demand, buffers, demand.version, user)
+    buffers.save_counters()
+    if outcome != REJECTED:
+        demand.save()
+        log_created([demand], user)
+    return outcome, limit, shed_id
+
+
+def start_demand(demand_id, user):
+    """Move one demand from Pending to In Progress; return True if this call won it.
+
+    The status check is part of the UPDATE itself, so when two staff start the
+    same demand only one of them sees a changed row.
+    """
+    return run_write(lambda: _start(demand_id, user))
+
+
+def _start(demand_id, user):
+    version = next_version()
+    updated = Demand.objects.filter(id=demand_id, status="Pending").update(
+        status="In Progress", fulfilled_by=user, started_at=timezone.now(), version=version
+    )
+    if updated:
+        log_transition("started", version, user)
+    return updated == 1
+
+
+def complete_demand(demand, user):
+    """Mark an open demand Completed; return True if this call changed it."""
+    updated = run_write(lambda: _complete(demand.id, user))
+    if updated:
+        refresh_open_demands([demand.assigned_to_id])
+        release_waiting_demands(user)
+        staff_freed([demand.assigned_to_id])
+    return updated
+
+
+def _complete(demand_id, user):
+    version = next_version()
+    updated = Demand.objects.filter(id=demand_id, status__in=OPEN_STATES).update(
+        status="Completed", fulfilled_by=user, completed_at=timezone.now(), version=version
+    )
+    if updated:
+        log_transition("completed", version, user)
+        record_completions(version)
+    return updated == 1
+
+
+def release_waiting_demands(user=None):
+    """Let Waiting demands into buffers that now have room, and queue them for assignment."""
+    released = release_waiting(user)
+    if released:
+        refresh_open_demands(demand.assigned_to_id for demand in released)
+        publish_demands(demand.id for demand in released)
+        demands_created(released)
+    return released
+
+
+def claim_order():
+    return ("due_at", "id") if settings.QUEUE_ORDER == "deadline" else ("created_at", "id")
+
+
+def claim_next_demand(user, demand_type=None, role=None):
+    """Claim the next Pending demand matching the filters, or return None if there is none.
+
+    "Next" is the one due soonest when QUEUE_ORDER is "deadline", otherwise the oldest.
+    """
+    pending = Demand.objects.filter(status="Pending")
+    if demand_type:
+        pending = pending.filter(demand_type=demand_type)
+    if role:
+        pending = pending.filter(demand_type__in=demand_types_for_role(role))
+    pending = pending.order_by(*claim_order()).values_list("id", flat=True)
+    return run_write(lambda: _claim(pending, user))
+
+
+def _claim(pending, user):
+    # Picking the row and starting it share one write transaction, which SQLite
+    # begins IMMEDIATE, so no other claim can take the row in between and a
+    # claim only comes back empty when nothing is Pending. (Databases with row
+    # locks skip rows another claim holds.)
+    candidate = pending.select_for_update(skip_locked=True).first()
+    if candidate is None or not _start(candidate, user):
+        return None
+    return Demand.objects.select_related("assigned_to").get(id=candidate)
+
+
+# Bulk actions: (states a demand may be in, state it moves to)
+TRANSITIONS = {
+    "start": (["Pending"], "In Progress"),
+    "complete": (["Pending", "In Progress"], "Completed"),
+}
+
+
+def bulk_transition(demand_ids, action, user):
+    """Apply ``action`` to the given demands with one UPDATE and return how many changed.
+
+    Demands that are no longer in a valid source state are left alone.
+    """
+    source_states, target_state = TRANSITIONS[action]
+    changes = {"status": target_state, "fulfilled_by": user}
+    demands = Demand.objects.filter(id__in=demand_ids, status__in=source_states)
+    staff_ids = None
+    if target_state == "In Progress":
+        changes["started_at"] = timezone.now()
+    if target_state == "Completed":
+        changes["completed_at"] = timezone.now()
+        staff_ids = set(demands.values_list("assigned_to_id", flat=True))
+    changed = run_write(lambda: _transition(demands, changes, user))
+    if staff_ids:
+        refresh_open_demands(staff_ids)
+        if changed:
+            release_waiting_demands(user)
+        staff_freed(staff_ids)
+    return changed
+
+
+def _transition(demands, changes, user):
+    version = next_version()
+    changed = demands.update(version=version, **changes)
+    if changed:
+        log_transition(STATUS_EVENTS[changes["status"]], version, user)
+        if changes["status"] == "Completed":
+            record_completions(version)
+    return changed
+
+
+_engine = None
+_engine_built_at = 0.0
+_engine_lock = threading.RLock()
+
+
+def build_assignment_engine():
+    """Load free staff and unassigned pending demands into a new AssignmentEngine."""
+    engine = AssignmentEngine()
+    for staff_id, role_name in StaffMember.objects.filter(open_demands=0).values_list("id", "role__name"):
+        engine.add_staff(staff_id, role_name, 0.0)
+    pending = (
+        Demand.objects.filter(status="Pending", assigned_to__isnull=True)
+        .order_by()
+        .values_list("id", "demand_type", "created_at", "expected_completion", "due_at")
+    )
+    for demand_id, demand_type, created_at, expected_completion, due_at in pending:
+        queue_demand(engine, demand_id, demand_type, created_at, expected_completion, due_at)
+    return engine
+
+
+def queue_demand(engine, demand_id, demand_type, created_at, expected_completion, due_at):
+    role_name = DEMAND_TYPE_ROLES.get(demand_type)
+    if role_name:
+        # Deadline ordering ages demands without an expected completion forward (due_at);
+        # otherwise those wait behind the ones with one, oldest first
+        due = due_at if settings.QUEUE_ORDER == "deadline" else expected_completion
+        engine.add_demand(demand_id, role_name, created_at.timestamp(), due.timestamp() if due else None)
+    return role_name
+
+
+def assignment_engine():
+    global _engine, _engine_built_at
+    with _engine_lock:
+        if _engine is None or time.monotonic() - _engine_built_at > ENGINE_MAX_AGE:
+            _engine = build_assignment_engine()
+            _engine_built_at = time.monotonic()
+        return _engine
+
+
+def reset_assignment_engine():
+    global _engine
+    with _engine_lock:
+        _engine = None
+
+
+def demands_removed(demand_ids):
+    """Drop deleted or shed demands from the assignment engine, if it is loaded."""
+    with _engine_lock:
+        if _engine is not None:
+            for demand_id in demand_ids:
+                _engine.remove_demand(demand_id)
+
+
+def staff_removed(staff_ids):
+    """Drop deleted staff members from the assignment engine, if it is loaded."""
+    with _engine_lock:
+        if _engine is not None:
+            for staff_id in staff_ids:
+                _engine.remove_staff(staff_id)
+
+
+def staff_role_changed(staff_id, role_name):
+    with _engine_lock:
+        if _engine is not None:
+            _engine.move_staff(staff_id, role_name)
+
+
+def assign_demand(demand_id, staff_id):
+    """Give a pending, unassigned demand to a staff member with nothing open.
+
+    Returns "assigned", or "staff_busy" / "demand_taken" when the database no
+    longer agrees with the engine. Both checks run under the write lock the
+    version reservation takes, so two processes cannot double-book.
+    """
+    return run_write(lambda: _assign(demand_id, staff_id))
+
+
+def _assign(demand_id, staff_id):
+    version = next_version()
+    if not StaffMember.objects.select_for_update().filter(id=staff_id, open_demands=0).exists():
+        return "staff_busy"
+    updated = Demand.objects.filter(id=demand_id, status="Pending", assigned_to__isnull=True).update(
+        assigned_to_id=staff_id, version=version
+    )
+    if not updated:
+        return "demand_taken"
+    log_transition("assigned", version)
+    refresh_open_demands([staff_id])
+    return "assigned"
+
+
+def auto_assign(roles=None):
+    """Match queued demands with free staff for ``roles`` (all roles if None); return the ``(demand_id, staff_id)`` pairs made."""
+    if not settings.AUTO_ASSIGN:
+        return []
+    assigned = []
+    with _engine_lock:
+        engine = assignment_engine()
+        for role_name in (roles if roles is not None else engine.roles()):
+            while True:
+                match = engine.pop_match(role_name)
+                if match is None:
+                    break
+                demand, member = match
+                outcome = assign_demand(demand[2], member[1])
+                if outcome == "assigned":
+                    assigned.append((demand[2], member[1]))
+                elif outcome == "staff_busy":
+                    engine.restore_demand(demand)
+                else:
+                    engine.restore_staff(member)
+    publish_demands(demand_id for demand_id, _ in assigned)
+    return assigned
+
+
+def demands_created(demands):
+    """Queue newly created demands that nobody was assigned to, then assign what can be."""
+    if not settings.AUTO_ASSIGN:
+        return []
+    roles = set()
+    with _engine_lock:
+        engine = assignment_engine()
+        for demand in demands:
+            if demand.assigned_to_id is None and demand.status == "Pending":
+                role_name = queue_demand(
+                    engine, demand.id, demand.demand_type, demand.created_at, demand.expected_completion, demand.due_at,
+                )
+                if role_name:
+                    roles.add(role_name)
+        return auto_assign(roles)
+
+
+def staff_freed(staff_ids):
+    """Queue staff members whose last open demand just closed, then assign what can be."""
+    if not settings.AUTO_ASSIGN:
+        return []
+    staff_ids = {staff_id for staff_id in staff_ids if staff_id}
+    if not staff_ids:
+        return []
+    free = StaffMember.objects.filter(id__in=staff_ids, open_demands=0).values_list("id", "role__name")
+    roles = set()
+    with _engine_lock:
+        engine = assignment_engine()
+        for staff_id, role_name in free:
+            engine.add_staff(staff_id, role_name, time.time())
+            roles.add(role_name)
+        return auto_assign(roles)
@@ -0,0 +1,171 @@
+from collections import Counter, defaultdict
+
+from django.utils import timezone
+
+from .models import Demand, DemandEvent
+
+
+EVENT_BATCH_SIZE = 2000
+
+# Event written when a demand moves into each status
+STATUS_EVENTS = {
+    "In Progress": "started",
+    "Completed": "completed",
+}
+
+
+def _actor_id(user):
+    return user.id if user is not None else None
+
+
+def log_created(demands, user=None):
+    """Log "created" for newly saved demands, plus "queued" for Waiting ones and "assigned" where a staff member is set."""
+    at = timezone.now()
+    events = []
+    for demand in demands:
+        events.append(DemandEvent(demand_id=demand.id, kind="created", at=demand.created_at or at,
+                                  demand_type=demand.demand_type, actor_id=_actor_id(user)))
+        if demand.status == "Waiting":
+            events.append(DemandEvent(demand_id=demand.id, kind="queued", at=demand.created_at or at,
+                                      demand_type=demand.demand_type, actor_id=_actor_id(user)))
+        if demand.assigned_to_id:
+            events.append(DemandEvent(demand_id=demand.id, kind="assigned", at=demand.created_at or at,
+                                      demand_type=demand.demand_type, actor_id=_actor_id(user),
+                                      staff_id=demand.assigned_to_id))
+    DemandEvent.objects.bulk_create(events)
+
+
+def log_transition(kind, version, user=None):
+    """Log ``kind`` for every demand the current transaction stamped with ``version``.
+
+    A version belongs to one transaction, so this finds exactly the rows a
+    conditional UPDATE changed without reading them beforehand.
+    """
+    at = timezone.now()
+    rows = Demand.objects.filter(version=version).order_by().values_list("id", "demand_type", "assigned_to_id")
+    DemandEvent.objects.bulk_create(
+        DemandEvent(demand_id=demand_id, kind=kind, at=at, demand_type=demand_type,
+                    actor_id=_actor_id(user), staff_id=staff_id)
+        for demand_id, demand_type, staff_id in rows
+    )
+
+
+def log_events(kind, demand_ids, user=None, staff_id=None):
+    """Log ``kind`` for the given demand ids, e.g. "cleared" just before they are deleted."""
+    at = timezone.now()
+    DemandEvent.objects.bulk_create(
+        DemandEvent(demand_id=demand_id, kind=kind, at=at, actor_id=_actor_id(user), staff_id=staff_id)
+        for demand_id in demand_ids
+    )
+
+
+def event_batches(after_id=0, until_id=None, kinds=None, batch_size=EVENT_BATCH_SIZE):
+    """Yield lists of events with ids after ``after_id`` in log order, one primary-key range at a time."""
+    events = DemandEvent.objects.order_by("id")
+    if kinds:
+        events = events.filter(kind__in=kinds)
+    if until_id is not None:
+        events = events.filter(id__lte=until_id)
+    while True:
+        batch = list(events.filter(id__gt=after_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1].id
+
+
+def iter_events(after_id=0, until_id=None, kinds=None, batch_size=EVENT_BATCH_SIZE):
+    for batch in event_batches(after_id, until_id, kinds, batch_size):
+        yield from batch
+
+
+def replay_queue_state(events):
+    """Rebuild ``{demand_id: state}`` from the log, as the queue stood after the last event.
+
+    Cleared and shed demands drop out; archived ones stay Completed.
+    """
+    demands = {}
+    for event in events:
+        if event.kind in ("cleared", "shed"):
+            demands.pop(event.demand_id, None)
+            continue
+        state = demands.setdefault(event.demand_id, {
+            "demand_type": event.demand_type, "status": "Pending", "assigned_to_id": None,
+            "created_at": None, "started_at": None, "completed_at": None,
+        })
+        if event.kind == "created":
+            state["created_at"] = event.at
+        elif event.kind == "queued":
+            state["status"] = "Waiting"
+        elif event.kind == "released":
+            state["status"] = "Pending"
+        elif event.kind == "assigned":
+            state["assigned_to_id"] = event.staff_id
+        elif event.kind == "started":
+            state["status"] = "In Progress"
+            state["started_at"] = event.at
+        elif event.kind == "completed":
+            state["status"] = "Completed"
+            state["completed_at"] = event.at
+    return demands
+
+
+def completed_rows(events):
+    """Yield one row per "completed" event with the demand's type, staff and timestamps, for rebuilding rollups."""
+    demands = {}
+    for event in events:
+        state = demands.setdefault(event.demand_id, {
+            "demand_type": event.demand_type, "assigned_to_id": None,
+            "created_at": None, "started_at": None, "completed_at": None,
+        })
+        if event.kind == "created":
+            state["created_at"] = event.at
+        elif event.kind == "assigned":
+            state["assigned_to_id"] = event.staff_id
+        elif event.kind == "started":
+            state["started_at"] = event.at
+        elif event.kind == "completed":
+            if state["created_at"] is not None:
+                yield {**state, "completed_at": event.at}
+        elif event.kind in ("cleared", "shed"):
+            del demands[event.demand_id]
+
+
+def replay_analytics(events):
+    """Per demand type: events by kind plus mean wait (created to started) and service (started to completed) seconds."""
+    counts = defaultdict(Counter)
+    created = {}
+    started = {}
+    types = {}
+    waits = defaultdict(list)
+    services = defaultdict(list)
+    for event in events:
+        demand_type = types.setdefault(event.demand_id, event.demand_type)
+        counts[demand_type][event.kind] += 1
+        if event.kind == "created":
+            created[event.demand_id] = event.at
+        elif event.kind == "started":
+            started[event.demand_id] = event.at
+            if event.demand_id in created:
+                waits[demand_type].append((event.at - created[event.demand_id]).total_seconds())
+        elif event.kind == "completed":
+            # Completing straight from Pending counts the whole time as service
+            began = started.pop(event.demand_id, None) or created.get(event.demand_id)
+            if began is not None:
+                services[demand_type].append((event.at - began).total_seconds())
+        elif event.kind in ("cleared", "shed"):
+            created.pop(event.demand_id, None)
+            started.pop(event.demand_id, None)
+            types.pop(event.demand_id, None)
+
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    return {
+        demand_type: {
+            "events": dict(kinds),
+            "mean_wait_seconds": mean(waits[demand_type]),
+            "mean_service_seconds": mean(services[demand_type]),
+        }
+        for demand_type, kinds in counts.items()
+    }
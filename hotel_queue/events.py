@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .models import Demand
+
+
+# Events buffered per open stream; a client that falls this far behind is
+# told to reload instead of holding more memory
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Above this many changed demands one "reload" event replaces per-row events
+MAX_ROW_EVENTS = 50
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+# Django 4.2 does not notice a client that went away mid-stream, so each
+# stream ends after this many seconds and EventSource reconnects by itself
+STREAM_SECONDS = 300
+
+
+class Broker:
+    """In-process pub/sub for demand changes.
+
+    Sync views publish from worker threads; each subscriber is an asyncio
+    queue owned by the event loop of the streaming view that reads it. Only
+    streams in the same process see an event, so run a single ASGI worker
+    process (or put a shared broker in front) when using live updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, event)
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Too far behind to patch rows reliably; make the client start over
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"event": "reload"})
+
+
+broker = Broker()
+
+
+def row_html(demand, staff_view):
+    return render_to_string("hotel_queue/_demand_row.html", {"d": demand, "staff_view": staff_view})
+
+
+def publish_demands(demand_ids):
+    """Tell open dashboards that these demands were created or changed, once the transaction commits."""
+    demand_ids = list(demand_ids)
+    if not demand_ids or not broker.has_subscribers():
+        return
+    transaction.on_commit(lambda: _publish_now(demand_ids))
+
+
+def _publish_now(demand_ids):
+    if len(demand_ids) > MAX_ROW_EVENTS:
+        broker.publish({"event": "reload"})
+        return
+    demands = Demand.objects.filter(id__in=demand_ids).select_related("assigned_to")
+    # Ids no longer in the table were deleted (shed to make room, say)
+    for demand_id in set(demand_ids) - {demand.id for demand in demands}:
+        broker.publish({"event": "remove", "id": demand_id})
+    for demand in demands:
+        if demand.status == "Completed":
+            broker.publish({"event": "remove", "id": demand.id})
+            continue
+        broker.publish({
+            "event": "upsert",
+            "id": demand.id,
+            "html": {"staff": row_html(demand, True), "viewer": row_html(demand, False)},
+        })
+
+
+def format_sse(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(staff_view):
+    """Yield Server-Sent Events for one dashboard until the client disconnects."""
+    subscriber = broker.subscribe()
+    loop, queue = subscriber
+    deadline = loop.time() + STREAM_SECONDS
+    try:
+        yield "retry: 3000\n\n"
+        while loop.time() < deadline:
+            try:
+                timeout = min(KEEPALIVE_SECONDS, deadline - loop.time())
+                event = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event["event"] == "upsert":
+                event = {**event, "html": event["html"]["staff" if staff_view else "viewer"]}
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscriber)
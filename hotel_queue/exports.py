@@ -0,0 +1,238 @@
+import csv
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.db.models.functions import Length
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+from .archive import completed_sources, merge_completed
+from .models import ExportJob
+from .routers import reporting_reads
+from .writer import run_write
+
+
+COMPLETED_HEADERS = [
+    "ID", "Type", "Description", "Location", "Created At",
+    "Completed At", "Time Taken", "Created By", "Fulfilled By"
+]
+
+# Rows are pulled from the database in chunks of this size
+EXPORT_CHUNK_SIZE = 2000
+
+MAX_COLUMN_WIDTH = 50
+
+# Unfinished export jobs older than this are assumed dead and are not reused
+STALE_JOB_AFTER = timedelta(minutes=10)
+
+
+def completed_rows(sources):
+    """Yield one export row per completed demand without loading the querysets into memory.
+
+    ``sources`` are newest-first querysets (live and archived demands) that are
+    merged into a single newest-first stream.
+    """
+    streams = [
+        demands.select_related("created_by", "fulfilled_by").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        for demands in sources
+    ]
+    for demand in merge_completed(streams):
+        time_taken = ""
+        if demand.completed_at:
+            time_taken = str(demand.completed_at - demand.created_at).split('.')[0]
+        yield [
+            demand.id,
+            demand.demand_type,
+            demand.description,
+            demand.room_or_table or "-",
+            demand.created_at.strftime("%Y-%m-%d %H:%M"),
+            demand.completed_at.strftime("%Y-%m-%d %H:%M") if demand.completed_at else "-",
+            time_taken,
+            demand.created_by.username if demand.created_by else "-",
+            demand.fulfilled_by.username if demand.fulfilled_by else "-",
+        ]
+
+
+def completed_column_widths(sources):
+    # Write-only sheets need their widths before the first row, so get the
+    # longest values with one aggregate query per table instead of a second pass over the rows
+    longest = {}
+    for demands in sources:
+        found = demands.aggregate(
+            id=Max("id"),
+            demand_type=Max(Length("demand_type")),
+            description=Max(Length("description")),
+            room_or_table=Max(Length("room_or_table")),
+            created_by=Max(Length("created_by__username")),
+            fulfilled_by=Max(Length("fulfilled_by__username")),
+        )
+        for key, value in found.items():
+            longest[key] = max(longest.get(key) or 0, value or 0)
+    lengths = [
+        len(str(longest["id"] or "")),
+        longest["demand_type"] or 0,
+        longest["description"] or 0,
+        longest["room_or_table"] or 1,
+        16,
+        16,
+        len("0:00:00"),
+        longest["created_by"] or 0,
+        longest["fulfilled_by"] or 1,
+    ]
+    return [
+        min(max(length, len(header)) + 2, MAX_COLUMN_WIDTH)
+        for header, length in zip(COMPLETED_HEADERS, lengths)
+    ]
+
+
+def write_completed_workbook(sources, fileobj):
+    """Write completed demands to ``fileobj`` as an xlsx using a write-only workbook."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Completed Tasks")
+
+    for col, width in enumerate(completed_column_widths(sources), 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    # Style for headers
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    header_row = []
+    for header in COMPLETED_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+
+    for row in completed_rows(sources):
+        ws.append(row)
+
+    wb.save(fileobj)
+
+
+class Echo:
+    """File-like object whose write() hands the value back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def stream_completed_csv(sources):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COMPLETED_HEADERS)
+    for row in completed_rows(sources):
+        yield writer.writerow(row)
+
+
+def write_completed_csv(sources, fileobj):
+    writer = csv.writer(fileobj)
+    writer.writerow(COMPLETED_HEADERS)
+    writer.writerows(completed_rows(sources))
+
+
+def completed_snapshot():
+    """Return (row_count, last_completed_at) identifying the current set of completed demands.
+
+    Archiving moves rows between tables without changing either value, so a
+    cached export stays valid across it.
+    """
+    row_count = 0
+    last_completed_at = None
+    for demands in completed_sources():
+        snapshot = demands.aggregate(row_count=Count("id"), last_completed_at=Max("completed_at"))
+        row_count += snapshot["row_count"]
+        if snapshot["last_completed_at"] and (last_completed_at is None or snapshot["last_completed_at"] > last_completed_at):
+            last_completed_at = snapshot["last_completed_at"]
+    return row_count, last_completed_at
+
+
+def export_path(job):
+    return os.path.join(settings.EXPORT_ROOT, job.file_name)
+
+
+def request_export(user, file_format="xlsx"):
+    """Return an export job for the current completed demands, reusing a matching one if it exists.
+
+    A finished job whose file is still on disk is handed back as is, as is a job
+    that is already queued or running for the same snapshot. Otherwise a new job
+    is created and, when EXPORT_JOBS_IN_THREAD is on, started in a worker thread.
+    """
+    row_count, last_completed_at = completed_snapshot()
+    # Looked up and created in one write transaction, so a double click queues one job
+    job, created = run_write(lambda: _find_or_create_job(user, file_format, row_count, last_completed_at))
+    if created and settings.EXPORT_JOBS_IN_THREAD:
+        threading.Thread(target=run_export_job_in_thread, args=(job.id,), daemon=True).start()
+    return job
+
+
+def _find_or_create_job(user, file_format, row_count, last_completed_at):
+    matching = ExportJob.objects.filter(
+        file_format=file_format,
+        row_count=row_count,
+        last_completed_at=last_completed_at,
+        status__in=["Pending", "Running", "Done"],
+    )
+    stale_before = timezone.now() - STALE_JOB_AFTER
+    for job in matching:
+        if job.status == "Done" and os.path.exists(export_path(job)):
+            return job, False
+        # A queued or running job is shared unless its worker has evidently died
+        if job.status != "Done" and job.created_at > stale_before:
+            return job, False
+    job = ExportJob.objects.create(
+        file_format=file_format,
+        requested_by=user,
+        row_count=row_count,
+        last_completed_at=last_completed_at,
+    )
+    return job, True
+
+
+def run_export_job(job):
+    # Claim the job so a management command and a thread never build the same file
+    claimed = ExportJob.objects.filter(id=job.id, status="Pending").update(status="Running")
+    if not claimed:
+        return job
+    job.status = "Running"
+    try:
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        stamp = job.last_completed_at.strftime("%Y%m%d_%H%M%S") if job.last_completed_at else "empty"
+        job.file_name = f"completed_tasks_{stamp}_{job.row_count}_{job.id}.{job.file_format}"
+        path = export_path(job)
+        partial = path + ".part"
+        # Only export what the snapshot saw, so the cache key matches the file
+        sources = completed_sources()
+        if job.last_completed_at:
+            sources = [demands.filter(completed_at__lte=job.last_completed_at) for demands in sources]
+        with reporting_reads():
+            if job.file_format == "csv":
+                with open(partial, "w", newline="", encoding="utf-8") as fileobj:
+                    write_completed_csv(sources, fileobj)
+            else:
+                with open(partial, "wb") as fileobj:
+                    write_completed_workbook(sources, fileobj)
+        os.replace(partial, path)
+        job.status = "Done"
+    except Exception as exc:
+        job.status = "Failed"
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "file_name", "error", "finished_at"])
+    return job
+
+
+def run_export_job_in_thread(job_id):
+    try:
+        run_export_job(ExportJob.objects.get(id=job_id))
+    finally:
+        connections.close_all()
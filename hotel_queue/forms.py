@@ -1,5 +1,9 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
-from .models import Demand, HotelSettings, StaffRole, StaffMember
+from django.utils import timezone
+from .caching import location_choices, staff
+from .models import DEMAND_TYPE_ROLES, Demand
 
 
 FOOD_CHOICES = [
@@ -19,7 +23,8 @@ class DemandForm(forms.ModelForm):
     food_item = forms.ChoiceField(choices=[("", "Select food item...")] + FOOD_CHOICES, required=False, widget=forms.Select(attrs={"class": "form-select", "id": "id_food_item"}))
     quantity = forms.IntegerField(required=False, min_value=1, widget=forms.NumberInput(attrs={"class": "form-control", "placeholder": "Quantity", "id": "id_quantity"}))
     room_or_table = forms.ChoiceField(required=False, choices=[("", "Select Room/Table...")], widget=forms.Select(attrs={"class": "form-select", "id": "id_room_or_table"}), label="Location")
-    assigned_to = forms.ModelChoiceField(required=False, queryset=StaffMember.objects.all(), widget=forms.Select(attrs={"class": "form-select", "id": "id_assigned_to"}), label="Assigned To")
+    # Choices come from the cached staff list; clean_assigned_to turns the id back into a StaffMember
+    assigned_to = forms.ChoiceField(required=False, choices=[("", "---------")], widget=forms.Select(attrs={"class": "form-select", "id": "id_assigned_to"}), label="Assigned To")
     expected_completion = forms.DateTimeField(required=False, widget=forms.DateTimeInput(attrs={"class": "form-control", "type": "datetime-local"}))
 
     class Meta:
@@ -36,14 +41,7 @@ class DemandForm(forms.ModelForm):
         self.fields["description"].required = False
         
         # Populate room/table choices from settings - merged into a single dropdown
-        settings_qs = HotelSettings.objects.all()
-        num_tables = settings_qs.first().num_tables if settings_qs.exists() else 10
-        num_rooms = settings_qs.first().num_rooms if settings_qs.exists() else 10
-        
-        # Create a combined list of tables and rooms
-        table_choices = [(f"Table {i}", f"Table {i}") for i in range(1, num_tables + 1)]
-        room_choices = [(f"Room {100+i}", f"Room {100+i}") for i in range(1, num_rooms + 1)]
-        combined_choices = [("", "Select Table or Room...")] + table_choices + room_choices
+        combined_choices = [("", "Select Table or Room...")] + location_choices()
         
         # Set the choices for the room_or_table field
         self.fields["room_or_table"].choices = combined_choices
@@ -52,11 +50,17 @@ class DemandForm(forms.ModelForm):
         self.fields["room_or_table"].widget.attrs['placeholder'] = "Select Table or Room"
             
         # Populate assigned_to with only available staff members (not assigned to pending/in-progress demands)
-        busy_staff_ids = Demand.objects.filter(status__in=["Pending", "In Progress"]).values_list('assigned_to_id', flat=True)
-        available_staff = StaffMember.objects.select_related("role").exclude(id__in=busy_staff_ids)
-        self.fields["assigned_to"].queryset = available_staff
+        self.staff_members = staff()["members"]
+        available_staff = [member for member in self.staff_members.values() if not member.open_demands]
+        self.fields["assigned_to"].choices = [("", "---------")] + [(str(member.id), str(member)) for member in available_staff]
         self.fields["assigned_to"].widget.attrs['placeholder'] = "Assign to Staff Member"
 
+    def clean_assigned_to(self):
+        staff_id = self.cleaned_data.get("assigned_to")
+        if not staff_id:
+            return None
+        return self.staff_members[int(staff_id)]
+
     def clean(self):
         cleaned = super().clean()
         demand_type = cleaned.get("demand_type")
@@ -81,22 +85,43 @@ class DemandForm(forms.ModelForm):
             if not room_or_table:
                 self.add_error("room_or_table", "Please enter room/table number.")
         # Optional: filter assigned_to by role based on demand type
-        role_map = {
-            "Food": "Waiter",
-            "Cleaning": "Cleaner",
-            "Maintenance": "Maintenance Staff",
-            "Billing": "Billing Staff",
-            "Room Service": "Room Service Staff",
-        }
-        role_name = role_map.get(demand_type)
-        if role_name:
-            try:
-                role = StaffRole.objects.get(name=role_name)
-                self.fields["assigned_to"].queryset = StaffMember.objects.filter(role=role)
-                if assigned_to and assigned_to.role != role:
-                    self.add_error("assigned_to", f"Please choose a staff member with role {role_name}.")
-            except StaffRole.DoesNotExist:
-                pass
+        role_name = DEMAND_TYPE_ROLES.get(demand_type)
+        if role_name and role_name in staff()["roles"]:
+            if assigned_to and assigned_to.role.name != role_name:
+                self.add_error("assigned_to", f"Please choose a staff member with role {role_name}.")
         return cleaned
 
 
+class DemandFilterForm(forms.Form):
+    """Server-side filters for the dashboard and completed list (sent as GET parameters)."""
+
+    demand_type = forms.ChoiceField(required=False, choices=[("", "All types")] + Demand.DEMAND_TYPES, widget=forms.Select(attrs={"class": "form-select"}), label="Type")
+    room_or_table = forms.ChoiceField(required=False, choices=[("", "All locations")], widget=forms.Select(attrs={"class": "form-select"}), label="Location")
+    assigned_to = forms.TypedChoiceField(required=False, coerce=int, empty_value=None, choices=[("", "Anyone")], widget=forms.Select(attrs={"class": "form-select"}), label="Assigned To")
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}), label="From")
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"class": "form-control", "type": "date"}), label="To")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["room_or_table"].choices = [("", "All locations")] + location_choices()
+        self.fields["assigned_to"].choices = [("", "Anyone")] + [(member.id, str(member)) for member in staff()["members"].values()]
+
+    def apply(self, queryset, date_field):
+        """Narrow ``queryset`` by the valid filters; ``date_field`` is the column the date range applies to."""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data.get("demand_type"):
+            queryset = queryset.filter(demand_type=data["demand_type"])
+        if data.get("room_or_table"):
+            queryset = queryset.filter(room_or_table=data["room_or_table"])
+        if data.get("assigned_to"):
+            queryset = queryset.filter(assigned_to_id=data["assigned_to"])
+        # Whole local days, compared as a datetime range so the column's index still applies
+        if data.get("date_from"):
+            start = timezone.make_aware(datetime.combine(data["date_from"], time.min))
+            queryset = queryset.filter(**{f"{date_field}__gte": start})
+        if data.get("date_to"):
+            end = timezone.make_aware(datetime.combine(data["date_to"] + timedelta(days=1), time.min))
+            queryset = queryset.filter(**{f"{date_field}__lt": end})
+        return queryset
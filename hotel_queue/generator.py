@@ -0,0 +1,295 @@
+import random
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import build_location_choices, invalidate_staff
+from .dispatch import refresh_open_demands
+from .models import DEMAND_TYPE_ROLES, Demand, DemandEvent, StaffMember, StaffRole, queue_deadline
+from .rollups import add_rollups, build_rollups
+from .sync import next_version
+
+
+# Share of each demand type, as percentages
+DEFAULT_TYPE_MIX = {"Food": 40, "Cleaning": 20, "Maintenance": 10, "Billing": 10, "Room Service": 20}
+
+# Relative arrivals per local hour of day: breakfast, lunch and dinner peaks, quiet nights
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 10, 8, 5, 6, 9, 9, 6, 4, 4, 5, 8, 10, 9, 6, 3, 2]
+
+DESCRIPTIONS = {
+    "Food": ["Tea", "Coffee", "Club sandwich", "Masala dosa", "Paneer tikka", "Fresh lime soda", "Dal makhani", "Fruit platter"],
+    "Cleaning": ["Room cleaning", "Change towels", "Change bed linen", "Clean bathroom", "Turndown service"],
+    "Maintenance": ["AC not cooling", "Leaking tap", "TV remote not working", "Light bulb out", "Door lock stuck"],
+    "Billing": ["Print invoice", "Split the bill", "Query a charge", "Early checkout bill"],
+    "Room Service": ["Extra pillows", "Iron and board", "Wake-up call", "Drinking water", "Extra blanket"],
+}
+
+# Demand columns the generator fills, by attname; the rest keep their database defaults
+INSERT_FIELDS = [
+    "demand_type", "description", "status", "created_at", "expected_completion", "started_at", "completed_at",
+    "due_at", "created_by_id", "fulfilled_by_id", "assigned_to_id", "quantity", "room_or_table", "version",
+]
+
+DATETIME_FIELDS = {"created_at", "expected_completion", "started_at", "completed_at", "due_at"}
+
+# DemandEvent columns written for each generated demand, so replaying the log rebuilds them
+EVENT_FIELDS = ["demand_id", "kind", "at", "demand_type", "actor_id", "staff_id"]
+
+# Rows per executemany call
+INSERT_BATCH_SIZE = 10000
+
+# Rows per transaction: few enough commits that fsync does not dominate
+TRANSACTION_ROWS = 100000
+
+
+class GeneratorConfig:
+    """What to generate. Times are in minutes; fractions run from 0 to 1.
+
+    Completed demands arrive over ``days`` days before ``until``; the open ones
+    (Pending, or In Progress for ``in_progress_fraction`` of them) arrive in the
+    last ``open_hours`` hours. Waits and service times are exponential.
+    """
+
+    def __init__(self, count, until, seed=1, type_mix=None, days=90, open_fraction=0.01, open_hours=4,
+                 in_progress_fraction=0.4, assigned_fraction=0.8, deadline_fraction=0.3, wait_minutes=10,
+                 service_minutes=20, staff_per_role=5, users=5):
+        self.count = count
+        self.until = until
+        self.seed = seed
+        self.type_mix = type_mix or DEFAULT_TYPE_MIX
+        self.days = days
+        self.open_fraction = open_fraction
+        self.open_hours = open_hours
+        self.in_progress_fraction = in_progress_fraction
+        self.assigned_fraction = assigned_fraction
+        self.deadline_fraction = deadline_fraction
+        self.wait_minutes = wait_minutes
+        self.service_minutes = service_minutes
+        self.staff_per_role = staff_per_role
+        self.users = users
+
+
+def ensure_people(config):
+    """Return ``(user ids, staff ids by demand type)``, creating any generator users and staff that are missing."""
+    user_ids = [
+        User.objects.get_or_create(username=f"generated-{i}", defaults={"is_staff": True})[0].id
+        for i in range(1, config.users + 1)
+    ]
+    staff_by_type = {}
+    for demand_type, role_name in DEMAND_TYPE_ROLES.items():
+        role, _ = StaffRole.objects.get_or_create(name=role_name)
+        names = [f"Generated {role_name} {i}" for i in range(1, config.staff_per_role + 1)]
+        existing = set(StaffMember.objects.filter(role=role, name__in=names).values_list("name", flat=True))
+        StaffMember.objects.bulk_create(StaffMember(name=name, role=role) for name in names if name not in existing)
+        staff_by_type[demand_type] = list(
+            StaffMember.objects.filter(role=role, name__in=names).order_by("id").values_list("id", flat=True)
+        )
+    invalidate_staff()
+    return user_ids, staff_by_type
+
+
+class DemandGenerator:
+    """Builds Demand rows, as dicts keyed by attname, in arrival order.
+
+    The same config and seed always give the same rows. Times are aware UTC
+    datetimes.
+    """
+
+    def __init__(self, config, user_ids, staff_by_type):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.user_ids = user_ids
+        self.staff_by_type = staff_by_type
+        self.types = list(config.type_mix)
+        self.type_weights = [config.type_mix[name] for name in self.types]
+        locations = [value for value, _ in build_location_choices()]
+        self.tables = [value for value in locations if value.startswith("Table")] or locations
+        self.rooms = [value for value in locations if value.startswith("Room")] or locations
+        self.until = config.until.astimezone(dt_timezone.utc)
+        # Hour weights are looked up by local hour; the offset is taken once, so DST shifts are ignored
+        self.utc_offset = timezone.localtime(config.until).utcoffset()
+        self.max_weight = max(HOURLY_WEIGHTS)
+
+    def arrivals(self, start, end, count):
+        """``count`` sorted arrival times in [start, end), following HOURLY_WEIGHTS."""
+        span = (end - start).total_seconds()
+        times = []
+        while len(times) < count:
+            moment = start + timedelta(seconds=self.rng.random() * span)
+            hour = (moment + self.utc_offset).hour
+            if self.rng.random() * self.max_weight < HOURLY_WEIGHTS[hour]:
+                times.append(moment)
+        times.sort()
+        return times
+
+    def chunks(self, chunk_size):
+        """Yield lists of at most ``chunk_size`` rows, completed ones first, each in arrival order."""
+        config = self.config
+        num_open = round(config.count * config.open_fraction)
+        num_completed = config.count - num_open
+        open_start = self.until - timedelta(hours=config.open_hours)
+        completed_start = open_start - timedelta(days=config.days)
+        # Completed arrivals are drawn window by window so a chunk never needs the whole run in memory
+        windows = -(-num_completed // chunk_size)
+        window = (open_start - completed_start) / max(windows, 1)
+        for index in range(windows):
+            size = num_completed // windows + (index < num_completed % windows)
+            window_start = completed_start + window * index
+            yield [self.completed(created_at) for created_at in self.arrivals(window_start, window_start + window, size)]
+        for start in range(0, num_open, chunk_size):
+            size = min(chunk_size, num_open - start)
+            yield [self.open(created_at) for created_at in self.arrivals(open_start, self.until, size)]
+
+    def row(self, created_at):
+        rng = self.rng
+        demand_type = rng.choices(self.types, self.type_weights)[0]
+        expected_completion = None
+        if rng.random() < self.config.deadline_fraction:
+            expected_completion = created_at + timedelta(minutes=rng.uniform(15, 120))
+        staff_ids = self.staff_by_type.get(demand_type)
+        is_food = demand_type == "Food"
+        return {
+            "demand_type": demand_type,
+            "description": rng.choice(DESCRIPTIONS.get(demand_type, ["Request"])),
+            "created_at": created_at,
+            "expected_completion": expected_completion,
+            "due_at": queue_deadline(created_at, expected_completion),
+            "started_at": None,
+            "completed_at": None,
+            "created_by_id": rng.choice(self.user_ids),
+            "fulfilled_by_id": None,
+            "assigned_to_id": rng.choice(staff_ids) if staff_ids and rng.random() < self.config.assigned_fraction else None,
+            "quantity": rng.randint(1, 4) if is_food else None,
+            "room_or_table": rng.choice(self.tables if is_food else self.rooms),
+        }
+
+    def completed(self, created_at):
+        row = self.row(created_at)
+        started_at = created_at + timedelta(minutes=self.rng.expovariate(1 / self.config.wait_minutes))
+        completed_at = min(
+            started_at + timedelta(minutes=self.rng.expovariate(1 / self.config.service_minutes)), self.until,
+        )
+        row.update(
+            status="Completed", started_at=min(started_at, completed_at), completed_at=completed_at,
+            fulfilled_by_id=self.rng.choice(self.user_ids),
+        )
+        return row
+
+    def open(self, created_at):
+        row = self.row(created_at)
+        row["status"] = "Pending"
+        if self.rng.random() < self.config.in_progress_fraction:
+            row["status"] = "In Progress"
+            row["started_at"] = min(
+                created_at + timedelta(minutes=self.rng.expovariate(1 / self.config.wait_minutes)), self.until,
+            )
+        return row
+
+
+def insert_rows(rows, batch_size=INSERT_BATCH_SIZE):
+    """INSERT generated rows with executemany.
+
+    bulk_create spends far longer building model instances and preparing each
+    value than SQLite spends inserting, so the generator skips it. Datetimes
+    go in as Django's SQLite backend writes them: naive UTC text.
+    """
+    _insert(Demand, INSERT_FIELDS, ([row[name] for name in INSERT_FIELDS] for row in rows), DATETIME_FIELDS, batch_size)
+
+
+def event_rows(rows, first_id):
+    """The events the app logs for each generated row, the rows' ids running up from ``first_id``."""
+    for demand_id, row in enumerate(rows, first_id):
+        demand_type, staff_id = row["demand_type"], row["assigned_to_id"]
+        yield [demand_id, "created", row["created_at"], demand_type, row["created_by_id"], None]
+        if staff_id:
+            yield [demand_id, "assigned", row["created_at"], demand_type, row["created_by_id"], staff_id]
+        if row["started_at"]:
+            yield [demand_id, "started", row["started_at"], demand_type, row["fulfilled_by_id"], staff_id]
+        if row["completed_at"]:
+            yield [demand_id, "completed", row["completed_at"], demand_type, row["fulfilled_by_id"], staff_id]
+
+
+def insert_events(rows, first_id, batch_size=INSERT_BATCH_SIZE):
+    _insert(DemandEvent, EVENT_FIELDS, event_rows(rows, first_id), {"at"}, batch_size)
+
+
+def _insert(model, fields, rows, datetime_fields, batch_size):
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    datetime_positions = [index for index, name in enumerate(fields) if name in datetime_fields]
+    with connection.cursor() as cursor:
+        params = []
+        for values in rows:
+            for index in datetime_positions:
+                if values[index] is not None:
+                    values[index] = str(values[index].replace(tzinfo=None))
+            params.append(values)
+            if len(params) >= batch_size:
+                cursor.executemany(sql, params)
+                params = []
+        if params:
+            cursor.executemany(sql, params)
+
+
+@contextmanager
+def deferred_indexes():
+    """Drop the demand table's secondary indexes for the block and recreate them afterwards.
+
+    One index build over the loaded table costs less than keeping every
+    index up to date row by row. Nothing else should use the database
+    meanwhile, and a process killed inside the block leaves the indexes
+    missing.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+            [Demand._meta.db_table],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def generate_demands(config, transaction_rows=TRANSACTION_ROWS, batch_size=INSERT_BATCH_SIZE, rollups=True,
+                     defer_indexes=False):
+    """Insert ``config.count`` generated demands, yielding the running total after each transaction.
+
+    Each transaction inserts up to ``transaction_rows`` rows under one change
+    version, so delta sync picks them up, and adds the completed ones to the
+    service-time rollups unless ``rollups`` is False. Their events go into
+    the DemandEvent log as the app would have written them, so the log
+    still replays to the tables. Generated rows bypass capacity limits. With
+    ``defer_indexes`` the indexes are rebuilt once at the end (see
+    deferred_indexes). SQLite only.
+    """
+    user_ids, staff_by_type = ensure_people(config)
+    generator = DemandGenerator(config, user_ids, staff_by_type)
+    total = 0
+    with deferred_indexes() if defer_indexes else nullcontext():
+        for chunk in generator.chunks(transaction_rows):
+            with transaction.atomic():
+                version = next_version()
+                for row in chunk:
+                    row["version"] = version
+                insert_rows(chunk, batch_size)
+                # The chunk's ids are consecutive: nothing else can insert while this transaction writes
+                last_id = Demand.objects.order_by("-id").values_list("id", flat=True).first()
+                insert_events(chunk, last_id - len(chunk) + 1, batch_size)
+                if rollups:
+                    add_rollups(build_rollups(row for row in chunk if row["status"] == "Completed"))
+            total += len(chunk)
+            yield total
+    refresh_open_demands([staff_id for staff_ids in staff_by_type.values() for staff_id in staff_ids])
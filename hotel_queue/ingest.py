@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .caching import location_choices, staff
+from .capacity import REJECTED, Buffers, admit, full_message
+from .dispatch import demands_created, demands_removed, refresh_open_demands
+from .eventlog import log_created
+from .events import publish_demands
+from .forms import FOOD_CHOICES
+from .models import DEMAND_TYPE_ROLES, Demand
+from .sync import next_version
+from .writer import run_write
+
+
+# Largest batch accepted by one ingestion request
+MAX_INGEST_ITEMS = 5000
+
+class IngestError(ValueError):
+    """The request body could not be read as a list of demands."""
+
+
+def parse_ingest_body(body, content_type):
+    """Turn a JSON or CSV request body into a list of dicts, one per demand."""
+    if content_type.startswith("text/csv"):
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise IngestError("CSV body must be UTF-8.")
+        items = list(csv.DictReader(io.StringIO(text)))
+    else:
+        try:
+            items = json.loads(body)
+        except (UnicodeDecodeError, ValueError):
+            raise IngestError("Body is not valid JSON.")
+        if isinstance(items, dict):
+            items = items.get("demands")
+        if not isinstance(items, list):
+            raise IngestError('Expected a list of demands or {"demands": [...]}.')
+    if len(items) > MAX_INGEST_ITEMS:
+        raise IngestError(f"At most {MAX_INGEST_ITEMS} demands per request.")
+    return items
+
+
+class IngestContext:
+    """Lookup data loaded once per batch, so validating an item costs no queries."""
+
+    def __init__(self):
+        self.locations = {value for value, _ in location_choices()}
+        cached_staff = staff()
+        self.staff = cached_staff["members"]
+        self.role_names = cached_staff["roles"]
+        self.busy_staff_ids = {member.id for member in self.staff.values() if member.open_demands}
+        self.demand_types = dict(Demand.DEMAND_TYPES)
+        self.food_items = dict(FOOD_CHOICES)
+
+
+TEXT_FIELDS = ["demand_type", "description", "food_item", "room_or_table"]
+
+
+def clean_item(item, context):
+    """Validate one raw item the way DemandForm does; return (field values, errors)."""
+    if not isinstance(item, dict):
+        return None, {"__all__": "Each demand must be an object."}
+    errors = {}
+    # JSON may hold any type here; a non-string is that item's error, reported over the checks below
+    text_errors = {}
+    text = {}
+    for name in TEXT_FIELDS:
+        value = item.get(name) or ""
+        if not isinstance(value, str):
+            text_errors[name] = "Enter a text value."
+            value = ""
+        text[name] = value.strip()
+    demand_type = text["demand_type"]
+    description = text["description"]
+    food_item = text["food_item"]
+    room_or_table = text["room_or_table"]
+    quantity = item.get("quantity") or None
+    assigned_to = item.get("assigned_to") or None
+    expected_completion = item.get("expected_completion") or None
+
+    if demand_type not in context.demand_types:
+        errors["demand_type"] = "Select a valid choice."
+    if quantity is not None:
+        try:
+            quantity = int(quantity)
+            if quantity < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors["quantity"] = "Ensure this value is a whole number of at least 1."
+    if demand_type == "Food":
+        if food_item not in context.food_items:
+            errors["food_item"] = "Please choose a food item."
+        if not quantity:
+            quantity = 1
+        if food_item and "quantity" not in errors:
+            description = f"{food_item} (x{quantity})"
+    elif not description:
+        errors["description"] = "Please enter a short description."
+    if len(description) > 255:
+        errors["description"] = "Ensure this value has at most 255 characters."
+    if not room_or_table:
+        errors["room_or_table"] = "Please enter room/table number."
+    elif room_or_table not in context.locations:
+        errors["room_or_table"] = "Select a valid choice."
+
+    staff_member = None
+    if assigned_to is not None:
+        try:
+            staff_member = context.staff.get(int(assigned_to))
+        except (TypeError, ValueError):
+            pass
+        if staff_member is None or staff_member.id in context.busy_staff_ids:
+            errors["assigned_to"] = "Select a valid choice. That choice is not one of the available choices."
+        else:
+            role_name = DEMAND_TYPE_ROLES.get(demand_type)
+            if role_name in context.role_names and staff_member.role.name != role_name:
+                errors["assigned_to"] = f"Please choose a staff member with role {role_name}."
+
+    if expected_completion is not None:
+        parsed = parse_datetime(str(expected_completion))
+        if parsed is None:
+            errors["expected_completion"] = "Enter a valid date/time."
+        else:
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            expected_completion = parsed
+
+    errors.update(text_errors)
+    if errors:
+        return None, errors
+    if staff_member is not None:
+        # The member is busy from now on, also for later items in this batch
+        context.busy_staff_ids.add(staff_member.id)
+    return {
+        "demand_type": demand_type,
+        "description": description,
+        "quantity": quantity,
+        "room_or_table": room_or_table,
+        "assigned_to": staff_member,
+        "expected_completion": expected_completion,
+    }, None
+
+
+def ingest_demands(items, user):
+    """Validate ``items`` and insert the valid ones with a single bulk_create.
+
+    Returns ``(created, errors)`` where ``errors`` lists ``{"index", "errors"}``
+    for every item that was rejected, including by a full capacity limit
+    (``{"capacity": message}``). Created demands held back by a limit are
+    Waiting; demands shed to make room are gone.
+    """
+    context = IngestContext()
+    demands = []
+    errors = []
+    for index, item in enumerate(items):
+        values, item_errors = clean_item(item, context)
+        if item_errors:
+            errors.append({"index": index, "errors": item_errors})
+            continue
+        demands.append((index, Demand(created_by=user, **values)))
+    created, shed_ids, rejected = run_write(lambda: _insert(demands, user))
+    errors.extend(rejected)
+    errors.sort(key=lambda error: error["index"])
+    publish_demands(shed_ids)
+    demands_removed(shed_ids)
+    demands_created(created)
+    return created, errors
+
+
+def _insert(demands, user):
+    """Admit the validated ``(index, demand)`` pairs and insert them; return ``(created, shed_ids, errors)``."""
+    admitted = []
+    shed_ids = []
+    errors = []
+    if demands:
+        version = next_version()
+        # Capacity limits see the batch one item at a time, in order
+        buffers = Buffers()
+        for index, demand in demands:
+            outcome, limit, shed_id = admit(demand, buffers, version, user)
+            if outcome == REJECTED:
+                errors.append({"index": index, "errors": {"capacity": full_message(limit)}})
+                continue
+            if shed_id:
+                shed_ids.append(shed_id)
+            demand.version = version
+            admitted.append(demand)
+        buffers.save_counters()
+    created = Demand.objects.bulk_create(admitted)
+    log_created(created, user)
+    refresh_open_demands(demand.assigned_to_id for demand in created)
+    return created, shed_ids, errors
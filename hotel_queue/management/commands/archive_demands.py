@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from hotel_queue.archive import ARCHIVE_BATCH_SIZE, archive_completed
+from hotel_queue.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Move completed demands older than N hours from the live queue into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=settings.ARCHIVE_AFTER_HOURS, help="Archive demands completed more than this many hours ago")
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Rows moved per transaction")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        total = 0
+        for moved in archive_completed(cutoff, batch_size=options["batch_size"]):
+            total += moved
+            self.stdout.write(f"Archived {total} demands...")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} demands completed before {cutoff:%Y-%m-%d %H:%M}"))
+        pruned = prune_tombstones()
+        self.stdout.write(f"Pruned {pruned} delta-sync tombstones")
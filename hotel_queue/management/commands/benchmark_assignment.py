@@ -0,0 +1,173 @@
+import heapq
+import math
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from hotel_queue.assignment import AssignmentEngine
+from hotel_queue.dispatch import complete_demand, reset_assignment_engine
+from hotel_queue.ingest import ingest_demands
+from hotel_queue.management.scratch import scratch_database
+from hotel_queue.models import DEMAND_TYPE_ROLES, Demand, HotelSettings, StaffMember, StaffRole
+
+
+class NaiveDispatcher:
+    """What a dispatcher scanning every list does: O(n) per decision. The baseline the engine is compared with."""
+
+    def __init__(self):
+        self.demands = []
+        self.staff = []
+
+    def add_demand(self, demand_id, role, created_at, due_at=None):
+        due = due_at if due_at is not None else math.inf
+        self.demands.append((due, created_at, demand_id, role))
+
+    def add_staff(self, staff_id, role, free_since):
+        self.staff.append((free_since, staff_id, role))
+
+    def match_all(self, role):
+        pairs = []
+        while True:
+            demands = [entry for entry in self.demands if entry[3] == role]
+            staff = [entry for entry in self.staff if entry[2] == role]
+            if not demands or not staff:
+                return pairs
+            demand, member = min(demands), min(staff)
+            self.demands.remove(demand)
+            self.staff.remove(member)
+            pairs.append((demand[2], member[1]))
+
+
+def make_peak(num_demands, num_staff, peak_seconds, mean_service, seed):
+    """Arrival times, types, deadlines and service times for a burst of demands, plus staff per role."""
+    rng = random.Random(seed)
+    demand_types = list(DEMAND_TYPE_ROLES)
+    roles = sorted(set(DEMAND_TYPE_ROLES.values()))
+    staff = [(staff_id, roles[staff_id % len(roles)]) for staff_id in range(num_staff)]
+    arrivals = sorted(rng.uniform(0, peak_seconds) for _ in range(num_demands))
+    demands = []
+    for demand_id, arrived in enumerate(arrivals):
+        demand_type = rng.choice(demand_types)
+        # A third of the demands carry a deadline
+        due = arrived + rng.uniform(300, 3600) if rng.random() < 0.33 else None
+        demands.append((demand_id, demand_type, arrived, due, rng.expovariate(1 / mean_service)))
+    return demands, staff
+
+
+def simulate(dispatcher, demands, staff):
+    """Run the peak through ``dispatcher``; return (assignments, seconds spent deciding, waits)."""
+    events = []
+    for demand_id, demand_type, arrived, due, service in demands:
+        heapq.heappush(events, (arrived, 1, demand_id))
+    info = {demand[0]: demand for demand in demands}
+    roles = dict(staff)
+    for staff_id, role in staff:
+        dispatcher.add_staff(staff_id, role, 0.0)
+    assignments = []
+    waits = []
+    deciding = 0.0
+    while events:
+        now, kind, item_id = heapq.heappop(events)
+        began = time.perf_counter()
+        if kind == 1:
+            _, demand_type, arrived, due, _ = info[item_id]
+            role = DEMAND_TYPE_ROLES[demand_type]
+            dispatcher.add_demand(item_id, role, arrived, due)
+        else:
+            role = roles[item_id]
+            dispatcher.add_staff(item_id, role, now)
+        pairs = dispatcher.match_all(role)
+        deciding += time.perf_counter() - began
+        for demand_id, staff_id in pairs:
+            assignments.append((demand_id, staff_id))
+            waits.append(now - info[demand_id][2])
+            # Staff come free again once the demand's service time has passed
+            heapq.heappush(events, (now + info[demand_id][4], 0, staff_id))
+    return assignments, deciding, waits
+
+
+class Command(BaseCommand):
+    help = 'Benchmark automatic assignment on a simulated peak: the heap engine against a linear-scan dispatcher, optionally end to end on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--demands", type=int, default=5000, help="Demands arriving during the peak")
+        parser.add_argument("--staff", type=int, default=300, help="Staff members, spread over the roles")
+        parser.add_argument("--peak-minutes", type=float, default=30, help="Length of the arrival burst")
+        parser.add_argument("--mean-service-minutes", type=float, default=8, help="Mean time a demand keeps someone busy")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--skip-naive", action="store_true", help="Only time the engine (the baseline is slow at large sizes)")
+        parser.add_argument("--db", action="store_true", help="Also drive the real ingest/assign/complete path on a scratch SQLite database")
+        parser.add_argument("--db-demands", type=int, default=1000)
+        parser.add_argument("--db-staff", type=int, default=50)
+
+    def handle(self, *args, **options):
+        demands, staff = make_peak(options["demands"], options["staff"], options["peak_minutes"] * 60,
+                                   options["mean_service_minutes"] * 60, options["seed"])
+        assignments, deciding, waits = simulate(AssignmentEngine(), demands, staff)
+        self.report("engine", assignments, deciding, waits)
+        if not options["skip_naive"]:
+            naive_assignments, naive_deciding, naive_waits = simulate(NaiveDispatcher(), demands, staff)
+            self.report("linear scan", naive_assignments, naive_deciding, naive_waits)
+            if naive_assignments != assignments:
+                raise CommandError("Engine and linear-scan dispatcher disagree on the assignments")
+            self.stdout.write(f"Same {len(assignments)} assignments; engine decides {naive_deciding / deciding:.1f}x faster")
+        if len(assignments) != len(demands):
+            raise CommandError(f"Only {len(assignments)} of {len(demands)} demands were assigned")
+        if options["db"]:
+            with scratch_database(), override_settings(AUTO_ASSIGN=True):
+                try:
+                    self.run_db(options["db_demands"], options["db_staff"], options["seed"])
+                finally:
+                    # The engine holds scratch ids; never let them leak into real work
+                    reset_assignment_engine()
+        self.stdout.write(self.style.SUCCESS("Assignment benchmark PASSED"))
+
+    def report(self, name, assignments, deciding, waits):
+        waits = sorted(waits)
+        p95 = waits[int(len(waits) * 0.95)] if waits else 0
+        self.stdout.write(
+            f"{name:<12} {len(assignments)} assignments, {deciding * 1000:.1f} ms deciding "
+            f"({deciding / max(len(assignments), 1) * 1e6:.1f} us each); simulated wait mean "
+            f"{sum(waits) / max(len(waits), 1) / 60:.1f} min, p95 {p95 / 60:.1f} min"
+        )
+
+    def run_db(self, num_demands, num_staff, seed):
+        reset_assignment_engine()
+        rng = random.Random(seed)
+        HotelSettings.objects.create(id=1, num_tables=10, num_rooms=10)
+        roles = {name: StaffRole.objects.create(name=name) for name in sorted(set(DEMAND_TYPE_ROLES.values()))}
+        role_names = list(roles)
+        StaffMember.objects.bulk_create(
+            StaffMember(name=f"Bench {i}", role=roles[role_names[i % len(role_names)]]) for i in range(num_staff)
+        )
+        user = User.objects.create_user(username="bench-assign", is_staff=True)
+        items = [
+            {"demand_type": rng.choice(list(DEMAND_TYPE_ROLES)), "description": f"Bench {i}", "food_item": "Tea", "room_or_table": "Table 1"}
+            for i in range(num_demands)
+        ]
+        began = time.perf_counter()
+        for start in range(0, num_demands, 100):
+            created, errors = ingest_demands(items[start:start + 100], user)
+            if errors:
+                raise CommandError(f"Ingest rejected bench demands: {errors[:1]}")
+        ingested = time.perf_counter() - began
+        completions = 0
+        began = time.perf_counter()
+        # Whoever holds a demand finishes it, which hands them the next one
+        while True:
+            demand = Demand.objects.filter(status="Pending", assigned_to__isnull=False).order_by("id").first()
+            if demand is None:
+                break
+            complete_demand(demand, user)
+            completions += 1
+        drained = time.perf_counter() - began
+        left = Demand.objects.exclude(status="Completed").count()
+        self.stdout.write(
+            f"database     ingested {num_demands} in {ingested:.2f}s; {completions} completions with automatic "
+            f"hand-over in {drained:.2f}s ({completions / max(drained, 1e-9):.0f}/s), {left} left open"
+        )
+        if left:
+            raise CommandError(f"{left} demands were never assigned and completed")
@@ -0,0 +1,352 @@
+import http.cookiejar
+import json
+import random
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel_queue.dispatch import reset_assignment_engine
+from hotel_queue.management.scratch import scratch_database
+from hotel_queue.models import Demand, HotelSettings, StaffMember, StaffRole
+from hotel_queue.simulation.runner import quantile
+
+
+# Relative weight of each operation when a simulated staff member picks what to do next
+DEFAULT_MIX = {"add": 30, "start": 20, "complete": 20, "dashboard": 25, "export": 5}
+
+ADD_TYPES = ["Cleaning", "Maintenance", "Billing", "Room Service", "Food"]
+
+ROW_ID = re.compile(r'data-demand-id="(\d+)"')
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise CommandError(f"Unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Weight for {name} must be a number")
+    if not any(mix.values()):
+        raise CommandError("The mix needs at least one operation with a weight above 0")
+    return mix
+
+
+class ClientSession:
+    """One simulated staff member on Django's test client, on this thread's own database connection."""
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None):
+        """Return ``(status, body, queries, locked)``; status is None when the request raised."""
+        # Every alias, so reads routed to the reporting database still count
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            try:
+                response = getattr(self.client, method)(path, data)
+            except OperationalError as exc:
+                return None, b"", sum(len(capture) for capture in captures), "database is locked" in str(exc)
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, body, sum(len(capture) for capture in captures), False
+
+    def close(self):
+        connections.close_all()
+
+
+class NoRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        # A redirect after a write is reported as such instead of fetching the dashboard again
+        return None
+
+
+class ServerSession:
+    """One simulated staff member against a running server, logged in with a username and password."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirects)
+        self.request("get", reverse("login"))
+        status, _, _, _ = self.request("post", reverse("login"), {"username": username, "password": password})
+        if status != 302:
+            raise CommandError(f"Could not log in to {self.base_url} as {username}")
+
+    def csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == "csrftoken"), "")
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        if method == "get" and data:
+            url += "?" + urllib.parse.urlencode(data)
+        elif method == "post":
+            body = urllib.parse.urlencode({**(data or {}), "csrfmiddlewaretoken": self.csrf_token()}).encode()
+        request = urllib.request.Request(url, data=body, headers={"Referer": self.base_url + "/"})
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read(), None, False
+        except urllib.error.HTTPError as exc:
+            content = exc.read()
+            return exc.code, content, None, exc.code == 500 and b"database is locked" in content
+        except urllib.error.URLError:
+            return None, b"", None, False
+
+    def close(self):
+        pass
+
+
+class Worker:
+    """Picks operations from the mix and records what each request cost."""
+
+    def __init__(self, session, rng, mix, locations):
+        self.session = session
+        self.rng = rng
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.locations = locations
+        # Demand ids seen on the dashboard, for start and complete to act on
+        self.known = []
+        self.samples = []
+
+    def run(self, count):
+        self.dashboard()
+        for _ in range(count):
+            name = self.rng.choices(self.names, self.weights)[0]
+            if name in ("start", "complete") and not self.known:
+                name = "dashboard"
+            getattr(self, name)()
+
+    def record(self, name, method, path, data=None):
+        began = time.perf_counter()
+        status, body, queries, locked = self.session.request(method, path, data)
+        self.samples.append((name, time.perf_counter() - began, status, queries, locked))
+        return status, body
+
+    def add(self):
+        demand_type = self.rng.choice(ADD_TYPES)
+        data = {"demand_type": demand_type, "room_or_table": self.rng.choice(self.locations)}
+        if demand_type == "Food":
+            data.update(food_item="Tea", quantity=self.rng.randint(1, 4))
+        else:
+            data["description"] = f"Benchmark {demand_type.lower()}"
+        self.record("add", "post", reverse("add_demand"), data)
+
+    def start(self):
+        demand_id = self.rng.choice(self.known)
+        self.record("start", "get", reverse("mark_in_progress", args=[demand_id]))
+
+    def complete(self):
+        demand_id = self.known.pop(self.rng.randrange(len(self.known)))
+        self.record("complete", "get", reverse("mark_completed", args=[demand_id]))
+
+    def dashboard(self):
+        status, body = self.record("dashboard", "get", reverse("dashboard"))
+        if status == 200:
+            self.known = [int(demand_id) for demand_id in ROW_ID.findall(body.decode(errors="replace"))]
+
+    def export(self):
+        self.record("export", "get", reverse("export_completed"))
+
+
+def summarize_samples(samples, elapsed):
+    """Requests per second, latency percentiles, statuses, query counts and lock errors per operation."""
+    by_name = {}
+    for sample in samples:
+        by_name.setdefault(sample[0], []).append(sample)
+    by_name["total"] = samples
+    summary = {}
+    for name, group in by_name.items():
+        latencies = sorted(sample[1] for sample in group)
+        queries = [sample[3] for sample in group if sample[3] is not None]
+        statuses = Counter(str(sample[2]) for sample in group)
+        summary[name] = {
+            "requests": len(group),
+            "requests_per_second": len(group) / elapsed if elapsed else None,
+            "p50_ms": quantile(latencies, 0.5) * 1000,
+            "p99_ms": quantile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+            "errors": sum(1 for sample in group if sample[2] is None or sample[2] >= 500),
+            "database_locked": sum(1 for sample in group if sample[4]),
+            "statuses": dict(sorted(statuses.items())),
+            "queries_mean": sum(queries) / len(queries) if queries else None,
+            "queries_max": max(queries) if queries else None,
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Load-test the HTTP views with concurrent simulated staff (test client on a seeded scratch database, or a running server) and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent simulated staff members")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per worker")
+        parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                            help="Operation weights, e.g. add=30,start=20,complete=20,dashboard=25,export=5")
+        parser.add_argument("--seed-demands", type=int, default=2000, help="Demands seeded before the run (test client only)")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--url", help="Drive a running server at this URL instead of the test client; it uses its own database")
+        parser.add_argument("--username", help="Staff login for --url")
+        parser.add_argument("--password", help="Password for --url")
+        parser.add_argument("--output", help="Write the JSON report here")
+        parser.add_argument("--compare", help="A previous JSON report to compare requests per second and p99 with")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["requests"] < 1:
+            raise CommandError("--workers and --requests must be at least 1.")
+        if options["url"]:
+            if not (options["username"] and options["password"]):
+                raise CommandError("--url needs --username and --password for a staff account.")
+            report = self.run_server(options)
+        else:
+            with scratch_database():
+                try:
+                    report = self.run_client(options)
+                finally:
+                    reset_assignment_engine()
+        self.print_summary(report["operations"])
+        if options["compare"]:
+            self.print_comparison(report["operations"], options["compare"])
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        total = report["operations"]["total"]
+        if total["errors"]:
+            raise CommandError(f"{total['errors']} requests failed ({total['database_locked']} with database is locked)")
+
+    def run_client(self, options):
+        users = self.seed(options["seed_demands"], options["workers"], options["seed"])
+        locations = self.locations()
+        sessions = [ClientSession(user) for user in users]
+        return self.run_workers(sessions, locations, options, mode="client")
+
+    def run_server(self, options):
+        sessions = [
+            ServerSession(options["url"], options["username"], options["password"]) for _ in range(options["workers"])
+        ]
+        return self.run_workers(sessions, self.locations(), options, mode="server")
+
+    def locations(self):
+        settings_obj = HotelSettings.objects.first()
+        num_tables = settings_obj.num_tables if settings_obj else 10
+        num_rooms = settings_obj.num_rooms if settings_obj else 10
+        return [f"Table {i}" for i in range(1, num_tables + 1)] + [f"Room {100 + i}" for i in range(1, num_rooms + 1)]
+
+    def seed(self, num_demands, num_workers, seed):
+        rng = random.Random(seed)
+        HotelSettings.objects.create(id=1, num_tables=10, num_rooms=10)
+        for role_name in ["Waiter", "Cleaner", "Maintenance Staff", "Billing Staff", "Room Service Staff"]:
+            role = StaffRole.objects.create(name=role_name)
+            StaffMember.objects.bulk_create(StaffMember(name=f"{role_name} {i}", role=role) for i in range(5))
+        users = [User.objects.create_user(username=f"bench-http-{i}", is_staff=True) for i in range(num_workers)]
+        now = timezone.now()
+        locations = self.locations()
+        demands = []
+        for i in range(num_demands):
+            # Half already completed, so the completed list and export have rows to read
+            status = "Completed" if i % 2 else rng.choice(["Pending", "Pending", "In Progress"])
+            demands.append(Demand(
+                demand_type=rng.choice(ADD_TYPES), description=f"Seeded {i}", status=status,
+                room_or_table=rng.choice(locations), created_by=users[0],
+                completed_at=now if status == "Completed" else None,
+            ))
+        Demand.objects.bulk_create(demands, batch_size=1000)
+        return users
+
+    def run_workers(self, sessions, locations, options, mode):
+        workers = [
+            Worker(session, random.Random(options["seed"] * 1000 + i), options["mix"], locations)
+            for i, session in enumerate(sessions)
+        ]
+        start = threading.Barrier(len(workers) + 1)
+
+        def work(worker):
+            start.wait()
+            try:
+                worker.run(options["requests"])
+            finally:
+                worker.session.close()
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        samples = [sample for worker in workers for sample in worker.samples]
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "at": timezone.now().isoformat(),
+                "mode": mode,
+                "url": options["url"],
+                "workers": options["workers"],
+                "requests_per_worker": options["requests"],
+                "mix": options["mix"],
+                "seed_demands": options["seed_demands"] if mode == "client" else None,
+                "seed": options["seed"],
+                "django": django.get_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "elapsed_seconds": elapsed,
+            },
+            "operations": summarize_samples(samples, elapsed),
+        }
+
+    def print_summary(self, operations):
+        self.stdout.write(f"{'operation':<11}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}{'locked':>8}")
+        for name, row in operations.items():
+            queries = "-" if row["queries_mean"] is None else f"{row['queries_mean']:.1f}"
+            self.stdout.write(
+                f"{name:<11}{row['requests']:>9}{row['requests_per_second']:>9.1f}{row['p50_ms']:>9.1f}"
+                f"{row['p99_ms']:>9.1f}{queries:>9}{row['errors']:>8}{row['database_locked']:>8}"
+            )
+
+    def print_comparison(self, operations, path):
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)["operations"]
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Could not read the baseline report {path}: {exc}")
+        self.stdout.write(f"Against {path}:")
+        for name, row in operations.items():
+            old = baseline.get(name)
+            if not old:
+                continue
+            self.stdout.write(
+                f"{name:<11} req/s {old['requests_per_second']:.1f} -> {row['requests_per_second']:.1f} "
+                f"({row['requests_per_second'] / old['requests_per_second'] - 1:+.0%}), "
+                f"p99 {old['p99_ms']:.1f} -> {row['p99_ms']:.1f} ms"
+            )
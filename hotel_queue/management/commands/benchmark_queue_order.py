@@ -0,0 +1,99 @@
+import heapq
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_queue.management.commands.benchmark_assignment import make_peak
+from hotel_queue.models import DEMAND_TYPE_ROLES
+
+
+def queue_policies(aging_seconds):
+    """Heap keys for each queue discipline, from a demand's arrival time, deadline and id."""
+    return {
+        "fifo": lambda arrived, due, demand_id: (arrived, demand_id),
+        "lifo": lambda arrived, due, demand_id: (-arrived, demand_id),
+        # Same rule as models.queue_deadline: no deadline means due a fixed time after arriving
+        "edf": lambda arrived, due, demand_id: (due if due is not None else arrived + aging_seconds, demand_id),
+    }
+
+
+def run_queue(policy, demands, staff):
+    """Serve the peak with ``policy`` choosing the next demand for each free staff member of the right role.
+
+    Returns one ``(wait, due, finished)`` tuple per demand, in seconds.
+    """
+    events = [(arrived, 1, demand_id) for demand_id, _, arrived, _, _ in demands]
+    heapq.heapify(events)
+    info = {demand[0]: demand for demand in demands}
+    roles = dict(staff)
+    free = {role: [] for role in roles.values()}
+    for staff_id, role in staff:
+        free[role].append(staff_id)
+    queues = {role: [] for role in roles.values()}
+    outcomes = []
+    while events:
+        now, kind, item_id = heapq.heappop(events)
+        if kind == 1:
+            _, demand_type, arrived, due, _ = info[item_id]
+            role = DEMAND_TYPE_ROLES[demand_type]
+            heapq.heappush(queues.setdefault(role, []), (policy(arrived, due, item_id), item_id))
+        else:
+            role = roles[item_id]
+            free[role].append(item_id)
+        while queues.get(role) and free.get(role):
+            _, demand_id = heapq.heappop(queues[role])
+            staff_id = free[role].pop()
+            _, _, arrived, due, service = info[demand_id]
+            outcomes.append((now - arrived, due, now + service))
+            heapq.heappush(events, (now + service, 0, staff_id))
+    return outcomes
+
+
+def summarize_outcomes(outcomes):
+    waits = sorted(wait for wait, _, _ in outcomes)
+    with_deadline = [(due, finished) for _, due, finished in outcomes if due is not None]
+    return {
+        "served": len(outcomes),
+        "missed": sum(1 for due, finished in with_deadline if finished > due),
+        "with_deadline": len(with_deadline),
+        "wait_mean": sum(waits) / len(waits) if waits else 0,
+        "wait_p95": waits[math.ceil(len(waits) * 0.95) - 1] if waits else 0,
+        "no_deadline_max_wait": max((wait for wait, due, _ in outcomes if due is None), default=0),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Simulate a busy period under FIFO, LIFO and deadline-first queueing at the same staffing and compare missed deadlines and waits'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--demands", type=int, default=2000, help="Demands arriving during the period")
+        parser.add_argument("--staff", type=int, default=60, help="Staff members, spread over the roles")
+        parser.add_argument("--peak-minutes", type=float, default=120, help="Length of the arrival period")
+        parser.add_argument("--mean-service-minutes", type=float, default=4, help="Mean time a demand keeps someone busy")
+        parser.add_argument("--aging-minutes", type=float, default=settings.DEFAULT_DEADLINE_MINUTES,
+                            help="Deadline given to demands without one (DEFAULT_DEADLINE_MINUTES)")
+        parser.add_argument("--seeds", type=int, default=5, help="Independent runs to average over")
+
+    def handle(self, *args, **options):
+        policies = queue_policies(options["aging_minutes"] * 60)
+        totals = {name: [] for name in policies}
+        for seed in range(1, options["seeds"] + 1):
+            demands, staff = make_peak(options["demands"], options["staff"], options["peak_minutes"] * 60,
+                                       options["mean_service_minutes"] * 60, seed)
+            for name, policy in policies.items():
+                totals[name].append(summarize_outcomes(run_queue(policy, demands, staff)))
+        results = {}
+        for name, runs in totals.items():
+            results[name] = {key: sum(run[key] for run in runs) / len(runs) for key in runs[0]}
+            result = results[name]
+            self.stdout.write(
+                f"{name:<5} missed {result['missed']:.1f} of {result['with_deadline']:.0f} deadlines "
+                f"({result['missed'] / max(result['with_deadline'], 1):.1%}); wait mean {result['wait_mean'] / 60:.1f} min, "
+                f"p95 {result['wait_p95'] / 60:.1f} min; longest wait without a deadline "
+                f"{result['no_deadline_max_wait'] / 60:.1f} min"
+            )
+        worse = [name for name in ["fifo", "lifo"] if results["edf"]["missed"] > results[name]["missed"]]
+        if worse:
+            raise CommandError(f"Deadline-first missed more deadlines than {', '.join(worse)}")
+        self.stdout.write(self.style.SUCCESS("Queue order benchmark PASSED"))
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from hotel_queue.dispatch import reset_assignment_engine
+from hotel_queue.management.scratch import connection_options, scratch_database
+from hotel_queue.models import Demand
+from hotel_queue.simulation import Workload, run_simulation
+from hotel_queue.simulation.runner import quantile
+
+
+def configured_options():
+    return dict(settings.DATABASES["default"].get("OPTIONS", {}))
+
+
+# Connection OPTIONS compared; "configured" is whatever settings.DATABASES holds
+PROFILES = {
+    # Django's defaults: rollback journal, deferred BEGIN, Python's 5 second busy timeout
+    "stock": lambda: {},
+    # The configured pragmas and timeout, but transactions BEGIN DEFERRED
+    "wal": lambda: {name: value for name, value in configured_options().items() if name != "transaction_mode"},
+    "configured": configured_options,
+}
+
+# Journal mode of each profile's scratch database (migration 0017 switches it to WAL)
+JOURNAL_MODES = {"stock": "DELETE", "wal": "WAL", "configured": "WAL"}
+
+
+class Readers:
+    """Threads polling the dashboard query while the writers work, timing each read."""
+
+    def __init__(self, count, interval):
+        self.interval = interval
+        self.stop = threading.Event()
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self.read) for _ in range(count)]
+
+    def read(self):
+        latencies = []
+        errors = 0
+        try:
+            while not self.stop.is_set():
+                began = time.perf_counter()
+                try:
+                    list(Demand.objects.exclude(status="Completed").order_by("due_at", "id")[:50])
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - began)
+                self.stop.wait(self.interval)
+        finally:
+            connections.close_all()
+            with self._lock:
+                self.latencies.extend(latencies)
+                self.errors += errors
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+
+class Command(BaseCommand):
+    help = 'Compare SQLite connection settings (stock, WAL, WAL + BEGIN IMMEDIATE) under concurrent staff writes and dashboard reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=[*PROFILES, "all"], default="all")
+        parser.add_argument("--producers", type=int, default=4, help="Threads adding demands")
+        parser.add_argument("--consumers", type=int, default=4, help="Threads claiming and completing demands")
+        parser.add_argument("--readers", type=int, default=2, help="Threads reading the dashboard meanwhile")
+        parser.add_argument("--read-interval-ms", type=float, default=10, help="Pause between a reader's queries")
+        parser.add_argument("--items", type=int, default=100, help="Demands each producer adds")
+        parser.add_argument("--capacity", type=int, default=50, help="Most open demands at once")
+        parser.add_argument("--service-ms", type=float, default=1, help="Mean time a consumer spends on a demand")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+
+    def handle(self, *args, **options):
+        if min(options["producers"], options["consumers"], options["items"], options["capacity"]) < 1:
+            raise CommandError("--producers, --consumers, --items and --capacity must be at least 1.")
+        if connection.vendor != "sqlite":
+            raise CommandError("This command runs against SQLite only.")
+        workload = Workload(
+            producers=options["producers"], consumers=options["consumers"], items=options["items"],
+            capacity=options["capacity"], service_time=options["service_ms"] / 1000, seed=options["seed"],
+        )
+        profiles = PROFILES if options["profile"] == "all" else [options["profile"]]
+        reports = [
+            self.run_profile(name, workload, options["readers"], options["read_interval_ms"] / 1000) for name in profiles
+        ]
+        for report in reports:
+            expected = report["producers"] * options["items"]
+            if report["consumed"] != expected:
+                raise CommandError(f"{report['profile']}: served {report['consumed']} of {expected} demands")
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        self.stdout.write(
+            f"{'profile':<11}{'demands/s':>10}{'locked':>8}{'sojourn p95':>13}{'reads/s':>9}{'read p99':>10}{'read errors':>13}"
+        )
+        for report in reports:
+            read_p99 = "-" if report["read_p99_ms"] is None else f"{report['read_p99_ms']:.1f}"
+            self.stdout.write(
+                f"{report['profile']:<11}{report['throughput_per_second']:>10.0f}{report['lock']['lock_errors']:>8}"
+                f"{report['sojourn_p95_ms']:>13.1f}{report['reads_per_second']:>9.0f}{read_p99:>10}{report['read_errors']:>13}"
+            )
+        self.stdout.write("Times in ms. locked: writes that failed with \"database is locked\" and were retried.")
+
+    def run_profile(self, name, workload, num_readers, read_interval):
+        """Run the database queue simulation, plus readers, on a scratch database opened with profile ``name``."""
+        with connection_options(PROFILES[name]()), scratch_database(), override_settings(AUTO_ASSIGN=False):
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode = {JOURNAL_MODES[name]}")
+            try:
+                with Readers(num_readers, read_interval) as readers:
+                    began = time.perf_counter()
+                    report = run_simulation("database", workload)
+                    elapsed = time.perf_counter() - began
+            finally:
+                reset_assignment_engine()
+        latencies = sorted(readers.latencies)
+        report.update(
+            profile=name,
+            options=PROFILES[name](),
+            reads=len(latencies),
+            reads_per_second=len(latencies) / elapsed if elapsed else 0,
+            read_p50_ms=None if not latencies else quantile(latencies, 0.5) * 1000,
+            read_p99_ms=None if not latencies else quantile(latencies, 0.99) * 1000,
+            read_errors=readers.errors,
+        )
+        return report
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from hotel_queue.dispatch import complete_demand, create_demand, reset_assignment_engine, start_demand
+from hotel_queue.management.commands.benchmark_sqlite import PROFILES
+from hotel_queue.management.scratch import connection_options, scratch_database
+from hotel_queue.models import Demand, DemandEvent, HotelSettings
+from hotel_queue.simulation.runner import quantile
+from hotel_queue.writer import stop_batch_writer
+
+
+class Staff:
+    """One simulated staff member: adds demands, then starts and completes each, timing every write."""
+
+    def __init__(self, index, user, demands):
+        self.index = index
+        self.user = user
+        self.demands = demands
+        self.latencies = []
+        self.errors = 0
+        self.locked = 0
+
+    def timed(self, write):
+        began = time.perf_counter()
+        try:
+            result = write()
+        except OperationalError as exc:
+            self.errors += 1
+            self.locked += "database is locked" in str(exc)
+            return None
+        except Exception:
+            self.errors += 1
+            return None
+        self.latencies.append(time.perf_counter() - began)
+        return result
+
+    def run(self):
+        try:
+            for seq in range(self.demands):
+                demand = Demand(
+                    demand_type="Cleaning", description=f"Burst {self.index}-{seq}", room_or_table="Room 101",
+                    created_by=self.user,
+                )
+                if self.timed(lambda: create_demand(demand, self.user)) is None:
+                    continue
+                if self.timed(lambda: start_demand(demand.id, self.user)):
+                    self.timed(lambda: complete_demand(demand, self.user))
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Burst demand writes (add, start, complete) from many threads, each in its own transaction and through the batch writer, and compare'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["direct", "coalesced", "all"], default="all")
+        parser.add_argument("--profile", choices=list(PROFILES), default="configured", help="Connection settings, as in benchmark_sqlite")
+        parser.add_argument("--threads", type=int, default=16, help="Staff writing at once")
+        parser.add_argument("--demands", type=int, default=50, help="Demands each thread adds, starts and completes")
+        parser.add_argument("--batch-size", type=int, default=None, help="WRITE_BATCH_SIZE for the coalesced run")
+        parser.add_argument("--window-ms", type=float, default=None, help="WRITE_BATCH_WINDOW_MS for the coalesced run")
+        parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["demands"] < 1:
+            raise CommandError("--threads and --demands must be at least 1.")
+        if connection.vendor != "sqlite":
+            raise CommandError("This command runs against SQLite only.")
+        modes = ["direct", "coalesced"] if options["mode"] == "all" else [options["mode"]]
+        reports = [self.run_mode(mode, options) for mode in modes]
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            self.stdout.write(f"{'mode':<11}{'writes/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'locked':>8}{'batch':>8}")
+            for report in reports:
+                batch = "-" if report["mean_batch"] is None else f"{report['mean_batch']:.1f}"
+                self.stdout.write(
+                    f"{report['mode']:<11}{report['writes_per_second']:>10.0f}{report['p50_ms']:>9.1f}{report['p99_ms']:>9.1f}"
+                    f"{report['errors']:>8}{report['locked']:>8}{batch:>8}"
+                )
+            self.stdout.write("batch: mean operations per transaction in the writer thread.")
+        for report in reports:
+            if not report["consistent"]:
+                raise CommandError(f"{report['mode']}: completed demands and the event log do not match the successful writes")
+
+    def run_mode(self, mode, options):
+        overrides = {"AUTO_ASSIGN": False, "COALESCE_WRITES": mode == "coalesced"}
+        if options["batch_size"]:
+            overrides["WRITE_BATCH_SIZE"] = options["batch_size"]
+        if options["window_ms"] is not None:
+            overrides["WRITE_BATCH_WINDOW_MS"] = options["window_ms"]
+        with connection_options(PROFILES[options["profile"]]()), scratch_database(), override_settings(**overrides):
+            try:
+                HotelSettings.objects.create(id=1)
+                users = [User.objects.create_user(username=f"burst-{i}", is_staff=True) for i in range(options["threads"])]
+                staff = [Staff(i, user, options["demands"]) for i, user in enumerate(users)]
+                threads = [threading.Thread(target=member.run) for member in staff]
+                began = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - began
+                batch_writer = stop_batch_writer()
+                completed = Demand.objects.filter(status="Completed").count()
+                consistent = DemandEvent.objects.filter(kind="completed").count() == completed
+            finally:
+                reset_assignment_engine()
+        latencies = sorted(latency for member in staff for latency in member.latencies)
+        return {
+            "mode": mode,
+            "profile": options["profile"],
+            "threads": options["threads"],
+            "writes": len(latencies),
+            "elapsed_seconds": elapsed,
+            "writes_per_second": len(latencies) / elapsed if elapsed else None,
+            "p50_ms": quantile(latencies, 0.5) * 1000 if latencies else 0,
+            "p99_ms": quantile(latencies, 0.99) * 1000 if latencies else 0,
+            "errors": sum(member.errors for member in staff),
+            "locked": sum(member.locked for member in staff),
+            "completed": completed,
+            "mean_batch": batch_writer.operations / batch_writer.batches if batch_writer and batch_writer.batches else None,
+            "consistent": consistent,
+        }
@@ -0,0 +1,186 @@
+import json
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel_queue.archive import archive_completed
+from hotel_queue.dispatch import refresh_open_demands, reset_assignment_engine
+from hotel_queue.exports import request_export, run_export_job
+from hotel_queue.management.scratch import scratch_database
+from hotel_queue.models import CapacityLimit, Demand, ExportJob, HotelSettings, StaffMember, StaffRole
+
+
+# Most queries each URL may run, whatever the number of rows. Session and user
+# lookups for the logged-in request are included, and so are the BEGIN/COMMIT,
+# sync version reservation and event log rows every demand write makes. The
+# first write of a round also loads the assignment engine (two queries) and the
+# capacity limits; admitting demands counts each matching buffer once, and
+# completing them checks for Waiting demands to release.
+QUERY_BUDGETS = {
+    "dashboard": 3,
+    "dashboard (due first)": 3,
+    "demand_events": 0,
+    "demand_changes": 5,
+    "add_demand": 12,
+    "ingest_demands": 9,
+    "claim_next": 11,
+    "bulk_update_status": 9,
+    "mark_in_progress": 10,
+    "mark_completed": 18,
+    # The last page also reads the rows without a completed_at, live and archived
+    "completed_list": 8,
+    "export_completed": 6,
+    "start_export": 8,
+    "export_status": 3,
+    "download_export": 3,
+    "clear_completed": 4,
+    "settings_page": 6,
+    "stats_page": 3,
+    "metrics": 2,
+    "login": 0,
+    "logout": 4,
+    "reset_viewer_credentials": 5,
+    "debug_whoami": 2,
+    "debug_check_viewer": 2,
+}
+
+
+def request_specs():
+    """(url name, method, path, data, content type) for every route in hotel_queue/urls.py."""
+    # The bulk update takes the first five, so the single-demand actions get their own
+    pending = list(Demand.objects.filter(status="Pending").values_list("id", flat=True)[:7])
+    job = ExportJob.objects.filter(status="Done").first()
+    ingest_items = [
+        {"demand_type": "Cleaning", "description": f"Budget {i}", "room_or_table": "Room 101"}
+        for i in range(5)
+    ]
+    return [
+        ("dashboard", "get", reverse("dashboard"), None, None),
+        ("dashboard (due first)", "get", reverse("dashboard"), {"order": "deadline"}, None),
+        # Under the test client (WSGI) the stream answers 204 straight away
+        ("demand_events", "get", reverse("demand_events"), None, None),
+        ("demand_changes", "get", reverse("demand_changes"), {"cursor": "1-0"}, None),
+        ("add_demand", "post", reverse("add_demand"), {"demand_type": "Cleaning", "description": "Budget", "room_or_table": "Room 101"}, None),
+        ("ingest_demands", "post", reverse("ingest_demands"), json.dumps(ingest_items), "application/json"),
+        ("claim_next", "post", reverse("claim_next"), {"demand_type": "Cleaning"}, None),
+        ("bulk_update_status", "post", reverse("bulk_update_status"), {"action": "start", "demand_ids": pending[:5]}, None),
+        ("mark_in_progress", "get", reverse("mark_in_progress", args=[pending[5]]), None, None),
+        ("mark_completed", "get", reverse("mark_completed", args=[pending[6]]), None, None),
+        ("completed_list", "get", reverse("completed_list"), None, None),
+        ("export_completed", "get", reverse("export_completed"), None, None),
+        ("start_export", "post", reverse("start_export"), {"format": "csv"}, None),
+        ("export_status", "get", reverse("export_status", args=[job.id]), None, None),
+        ("download_export", "get", reverse("download_export", args=[job.id]), None, None),
+        ("clear_completed", "get", reverse("clear_completed"), None, None),
+        ("settings_page", "get", reverse("settings_page"), None, None),
+        ("stats_page", "get", reverse("stats_page"), None, None),
+        ("metrics", "get", reverse("metrics"), None, None),
+        ("reset_viewer_credentials", "get", reverse("reset_viewer_credentials"), None, None),
+        ("debug_whoami", "get", reverse("debug_whoami"), None, None),
+        ("debug_check_viewer", "get", reverse("debug_check_viewer"), None, None),
+        ("logout", "post", reverse("logout"), None, None),
+        ("login", "get", reverse("login"), None, None),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Check that every hotel_queue URL stays within its query budget as the number of demands grows (uses a throwaway SQLite database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--small", type=int, default=20, help="Demands per status in the first round")
+        parser.add_argument("--large", type=int, default=300, help="Demands per status in the second round")
+        parser.add_argument("--verbose-sql", action="store_true", help="Print the SQL of any URL over budget")
+
+    def handle(self, *args, **options):
+        with scratch_database() as scratch_dir, override_settings(EXPORT_ROOT=scratch_dir, EXPORT_JOBS_IN_THREAD=False, DEBUG=True):
+            self.admin = User.objects.create_user(username="budget-admin", password="budget", is_staff=True)
+            self.seed_static()
+            small = self.run_round(options["small"])
+            large = self.run_round(options["large"])
+        failures = []
+        self.stdout.write(f"{'URL name':<26}{'small':>7}{'large':>7}{'budget':>8}")
+        for name, budget in QUERY_BUDGETS.items():
+            small_count, _ = small[name]
+            large_count, large_sql = large[name]
+            over = large_count > budget or small_count > budget
+            grows = large_count > small_count
+            line = f"{name:<26}{small_count:>7}{large_count:>7}{budget:>8}"
+            if over or grows:
+                failures.append(name)
+                reason = "grows with rows" if grows else "over budget"
+                self.stdout.write(self.style.ERROR(f"{line}  {reason}"))
+                if options["verbose_sql"]:
+                    for sql in large_sql:
+                        self.stdout.write(f"    {sql}")
+            else:
+                self.stdout.write(line)
+        if failures:
+            raise CommandError(f"Query budget check FAILED for: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Query budget check PASSED"))
+
+    def seed_static(self):
+        HotelSettings.objects.create(id=1, num_tables=10, num_rooms=10)
+        for role_name in ["Waiter", "Cleaner", "Maintenance Staff", "Billing Staff", "Room Service Staff"]:
+            role = StaffRole.objects.create(name=role_name)
+            StaffMember.objects.bulk_create(StaffMember(name=f"{role_name} {i}", role=role) for i in range(10))
+        # Roomy enough never to fill, so admission control is counted but never turns a request away
+        CapacityLimit.objects.create(demand_type="Cleaning", max_open=1_000_000, policy="queue")
+
+    def seed_demands(self, per_status):
+        staff = list(StaffMember.objects.all())
+        now = timezone.now()
+        demands = []
+        for status in ["Pending", "In Progress", "Completed"]:
+            for i in range(per_status):
+                demands.append(Demand(
+                    demand_type="Cleaning",
+                    description=f"{status} {i}",
+                    status=status,
+                    room_or_table="Room 101",
+                    created_by=self.admin,
+                    fulfilled_by=self.admin if status != "Pending" else None,
+                    assigned_to=staff[i % len(staff)],
+                    completed_at=now - timedelta(days=2) if status == "Completed" and i % 2 else (now if status == "Completed" else None),
+                ))
+        Demand.objects.bulk_create(demands)
+        refresh_open_demands()
+        # Half of the completed demands go to the archive so both tables are read
+        list(archive_completed(now - timedelta(days=1)))
+        run_export_job(request_export(self.admin, "xlsx"))
+
+    def run_round(self, per_status):
+        Demand.objects.all().delete()
+        self.seed_demands(per_status)
+        client = Client()
+        client.force_login(self.admin)
+        # Start each round from the same warm cache and a freshly loaded assignment
+        # engine so counts compare like for like
+        cache.clear()
+        reset_assignment_engine()
+        client.get(reverse("dashboard"))
+        counts = {}
+        for name, method, path, data, content_type in request_specs():
+            if name == "login":
+                client.logout()
+            kwargs = {"content_type": content_type} if content_type else {}
+            # Every alias, so reads routed to the reporting database still count
+            with ExitStack() as stack:
+                captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                response = getattr(client, method)(path, data, **kwargs)
+                if hasattr(response, "streaming_content"):
+                    b"".join(response.streaming_content)
+            if response.status_code >= 400:
+                raise CommandError(f"{name} returned {response.status_code}")
+            queries = [query["sql"] for capture in captures for query in capture.captured_queries]
+            counts[name] = (len(queries), queries)
+            if name == "logout":
+                client.force_login(self.admin)
+        return counts
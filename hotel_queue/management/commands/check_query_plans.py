@@ -0,0 +1,72 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from hotel_queue.archive import completed_sources
+from hotel_queue.dispatch import BUSY_STATES, claim_order
+from hotel_queue.models import CapacityLimit, Demand, DemandEvent, DemandTombstone, ServiceRollup
+
+
+# Plan lines that mean a queue table is read in full or sorted on every request
+# (U0, T3... are the aliases Django gives tables in subqueries and joins)
+BAD_PLAN_LINES = [
+    re.compile(r"SCAN (TABLE )?(hotel_queue_demand(archive)?|[TU]\d+)\b(?!.*USING)"),
+    re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+]
+
+
+def hot_queries():
+    """The queries behind the dashboard, completed list, claiming, staff availability and housekeeping."""
+    live_completed, archived = completed_sources()
+    now = timezone.now()
+    return {
+        "dashboard": Demand.objects.exclude(status="Completed"),
+        "dashboard (later page)": Demand.objects.exclude(status="Completed").filter(created_at__lte=now).exclude(created_at=now, id__lte=1).order_by("-created_at", "id")[:51],
+        "completed_list (live)": live_completed,
+        "completed_list (archive)": archived,
+        "completed_list (later page, live)": live_completed.filter(completed_at__lte=now).exclude(completed_at=now, id__gte=1).order_by("-completed_at", "-id")[:51],
+        "completed_list (later page, archive)": archived.filter(completed_at__lte=now).exclude(completed_at=now, id__gte=1).order_by("-completed_at", "-id")[:51],
+        "export (live)": live_completed.select_related("created_by", "fulfilled_by"),
+        "dashboard (deadline order)": Demand.objects.exclude(status="Completed").order_by("due_at", "id")[:51],
+        "dashboard (deadline order, later page)": Demand.objects.exclude(status="Completed").filter(due_at__gte=now).exclude(due_at=now, id__lte=1).order_by("due_at", "id")[:51],
+        "claim_next": Demand.objects.filter(status="Pending").order_by(*claim_order()).values_list("id", flat=True)[:1],
+        "refresh_open_demands count": Demand.objects.filter(assigned_to_id=1, status__in=BUSY_STATES).order_by().values("assigned_to").annotate(total=Count("id")),
+        "archive_demands batch": Demand.objects.filter(status="Completed", completed_at__lt=now).order_by().values("id")[:1000],
+        "clear_completed chunk": live_completed.order_by().values_list("id", flat=True)[:500],
+        "demand_changes (live)": Demand.objects.filter(version__gte=5).exclude(version=5, id__lte=1).order_by("version", "id")[:201],
+        "event log: rows changed by a version": Demand.objects.filter(version=5).order_by().values_list("id", "demand_type", "assigned_to_id"),
+        "event log: batch read": DemandEvent.objects.order_by("id").filter(id__gt=1)[:2000],
+        "assignment engine load": Demand.objects.filter(status="Pending", assigned_to__isnull=True).order_by().values_list("id", "demand_type", "created_at", "expected_completion", "due_at"),
+        "stats_page rollups": ServiceRollup.objects.filter(hour__gte=now),
+        # Counted with COUNT(*); the plan is the same as for the ids
+        "capacity: open demands per type and location": CapacityLimit(demand_type="Cleaning", room_or_table="Room 101").open_demands().values("id"),
+        "capacity: open demands per type": CapacityLimit(demand_type="Cleaning").open_demands().values("id"),
+        "capacity: least urgent demand to shed": CapacityLimit(demand_type="Cleaning").open_demands().filter(status="Pending", assigned_to__isnull=True, due_at__gt=now).order_by("-due_at", "-id").values_list("id", "demand_type", "room_or_table")[:1],
+        "capacity: waiting demands to release": Demand.objects.filter(status="Waiting").order_by("due_at", "id")[:200],
+        "demand_changes (tombstones)": DemandTombstone.objects.filter(version__gte=5).exclude(version=5, demand_id__lte=1).order_by("version", "demand_id")[:201],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN on the hot queue queries and fail if any of them scans or sorts the demand tables'
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans reads SQLite query plans only.")
+        failures = []
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            bad = [line for line in plan.splitlines() if any(pattern.search(line) for pattern in BAD_PLAN_LINES)]
+            if bad:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: table scan or sort"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: uses an index"))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+        if failures:
+            raise CommandError(f"Query plan check FAILED for: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Query plan check PASSED"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from hotel_queue.archive import CLEAR_BATCH_SIZE, clear_completed
+
+
+class Command(BaseCommand):
+    help = 'Delete completed demands (live and archived) in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=CLEAR_BATCH_SIZE, help="Rows deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        verb = "Would delete" if dry_run else "Deleted"
+        total = 0
+        for deleted in clear_completed(batch_size=options["batch_size"], dry_run=dry_run):
+            total += deleted
+            self.stdout.write(f"{verb} {total} completed demands...")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} completed demands"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from hotel_queue.exports import run_export_job
+from hotel_queue.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'Build the files for pending export jobs'
+
+    def handle(self, *args, **options):
+        pending = ExportJob.objects.filter(status="Pending").order_by("created_at")
+        if not pending.exists():
+            self.stdout.write("No pending export jobs")
+            return
+        for job in pending:
+            job = run_export_job(job)
+            if job.status == "Done":
+                self.stdout.write(self.style.SUCCESS(f"Export {job.id}: {job.row_count} rows -> {job.file_name}"))
+            elif job.status == "Failed":
+                self.stdout.write(self.style.ERROR(f"Export {job.id} failed: {job.error}"))
@@ -0,0 +1,95 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from hotel_queue.dispatch import reset_assignment_engine
+from hotel_queue.management.scratch import scratch_database
+from hotel_queue.simulation import BACKENDS, Workload, run_simulation
+
+
+ALL_BACKENDS = [*BACKENDS, "database"]
+
+
+def number_list(value):
+    try:
+        numbers = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise CommandError(f"Expected comma-separated whole numbers, got {value!r}")
+    if not numbers or min(numbers) < 1:
+        raise CommandError(f"Expected numbers of at least 1, got {value!r}")
+    return numbers
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+class Command(BaseCommand):
+    help = 'Run producers and consumers over a bounded buffer (queue.Queue, deque + Condition, asyncio.Queue, multiprocessing or the Demand table) and report throughput, latency and contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=[*ALL_BACKENDS, "all"], default="all")
+        parser.add_argument("--producers", type=int, default=2)
+        parser.add_argument("--consumers", default="4", help="Consumer count, or a comma-separated list to compare staffing levels")
+        parser.add_argument("--items", type=int, default=500, help="Items each producer puts")
+        parser.add_argument("--capacity", type=int, default=50, help="Buffer size")
+        parser.add_argument("--produce-interval-ms", type=float, default=0, help="Mean time between a producer's items (0: flat out)")
+        parser.add_argument("--service-ms", type=float, default=2, help="Mean time a consumer spends on an item")
+        parser.add_argument("--order", choices=["deadline", "fifo"], default=None, help="QUEUE_ORDER for the database backend")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+
+    def handle(self, *args, **options):
+        if options["producers"] < 1 or options["items"] < 1 or options["capacity"] < 1:
+            raise CommandError("--producers, --items and --capacity must be at least 1.")
+        backends = ALL_BACKENDS if options["backend"] == "all" else [options["backend"]]
+        reports = []
+        for consumers in number_list(options["consumers"]):
+            workload = Workload(
+                producers=options["producers"], consumers=consumers, items=options["items"],
+                capacity=options["capacity"], produce_interval=options["produce_interval_ms"] / 1000,
+                service_time=options["service_ms"] / 1000, seed=options["seed"],
+            )
+            for backend in backends:
+                if backend == "database":
+                    reports.append(self.run_database(workload, options["order"]))
+                else:
+                    reports.append(run_simulation(backend, workload))
+        for report in reports:
+            expected = report["producers"] * options["items"]
+            if report["consumed"] != expected:
+                raise CommandError(f"{report['backend']}: served {report['consumed']} of {expected} items")
+        if options["json"]:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        self.stdout.write(
+            f"{'backend':<9}{'cons':>5}{'items/s':>10}{'wait p50':>10}{'p95':>8}{'p99':>8}"
+            f"{'sojourn p95':>13}{'full':>7}{'empty':>7}  lock"
+        )
+        for report in reports:
+            self.stdout.write(
+                f"{report['backend']:<9}{report['consumers']:>5}{report['throughput_per_second']:>10.0f}"
+                f"{format_ms(report['queue_wait_p50_ms']):>10}{format_ms(report['queue_wait_p95_ms']):>8}"
+                f"{format_ms(report['queue_wait_p99_ms']):>8}{format_ms(report['sojourn_p95_ms']):>13}"
+                f"{report['full_waits']:>7}{report['empty_waits']:>7}  {self.format_lock(report['lock'])}"
+            )
+        self.stdout.write("Times in ms. full/empty: puts and gets that had to wait for room or for an item.")
+
+    def format_lock(self, lock):
+        if lock is None:
+            return "-"
+        if "lock_errors" in lock:
+            return f"{lock['lock_errors']} database is locked"
+        share = lock["contended"] / lock["acquisitions"] if lock["acquisitions"] else 0
+        return f"{lock['contended']}/{lock['acquisitions']} contended ({share:.1%}), {lock['wait_seconds'] * 1000:.1f} ms waiting"
+
+    def run_database(self, workload, order):
+        overrides = {"AUTO_ASSIGN": False}
+        if order:
+            overrides["QUEUE_ORDER"] = order
+        with scratch_database(), override_settings(**overrides):
+            try:
+                return run_simulation("database", workload)
+            finally:
+                reset_assignment_engine()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from hotel_queue.dispatch import claim_next_demand
+from hotel_queue.management.scratch import scratch_database
+from hotel_queue.models import Demand
+
+
+class Command(BaseCommand):
+    help = 'Check that concurrent claim_next consumers never claim the same demand (uses a throwaway SQLite database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--demands", type=int, default=500, help="Pending demands to create")
+        parser.add_argument("--consumers", type=int, default=8, help="Concurrent consumer threads")
+
+    def handle(self, *args, **options):
+        # Build a scratch copy of the schema so real demands are never claimed
+        with scratch_database():
+            self.run_stress(options["demands"], options["consumers"])
+
+    def run_stress(self, num_demands, num_consumers):
+        producer = User.objects.create_user(username="stress-producer")
+        Demand.objects.bulk_create(
+            Demand(demand_type="Cleaning", description=f"Stress {i}", room_or_table="Room 101", created_by=producer)
+            for i in range(num_demands)
+        )
+        staff = [User.objects.create_user(username=f"stress-consumer-{i}", is_staff=True) for i in range(num_consumers)]
+        claimed = [[] for _ in range(num_consumers)]
+        locked = [0] * num_consumers
+        # Pending demands a consumer still saw after its claim came back empty
+        missed = [0] * num_consumers
+        start = threading.Barrier(num_consumers)
+
+        def consume(index):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        demand = claim_next_demand(staff[index])
+                    except OperationalError:
+                        # "database is locked": count it and try again
+                        locked[index] += 1
+                        continue
+                    if demand is None:
+                        missed[index] = Demand.objects.filter(status="Pending").count()
+                        return
+                    claimed[index].append(demand.id)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=consume, args=(i,)) for i in range(num_consumers)]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        all_claims = [demand_id for ids in claimed for demand_id in ids]
+        duplicates = len(all_claims) - len(set(all_claims))
+        still_pending = Demand.objects.filter(status="Pending").count()
+        lost_updates = Demand.objects.filter(status="In Progress", fulfilled_by__isnull=True).count()
+
+        for index, ids in enumerate(claimed):
+            self.stdout.write(f"consumer {index}: {len(ids)} claims, {locked[index]} lock errors")
+        self.stdout.write(f"{len(all_claims)} claims in {elapsed:.2f}s ({len(all_claims) / elapsed:.0f}/s)")
+        if duplicates or still_pending or lost_updates or any(missed) or len(all_claims) != num_demands:
+            raise CommandError(
+                f"Claim check FAILED: {duplicates} duplicate claims, {still_pending} left pending, "
+                f"{lost_updates} lost updates, {sum(1 for count in missed if count)} consumers told "
+                f"nothing was pending while demands were"
+            )
+        self.stdout.write(self.style.SUCCESS("Claim check PASSED: every demand claimed exactly once"))
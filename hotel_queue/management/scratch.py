@@ -0,0 +1,54 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+from django.db import connection, connections
+
+from hotel_queue.writer import stop_batch_writer
+
+
+@contextmanager
+def scratch_database():
+    """Run the block against a freshly migrated, throwaway SQLite database.
+
+    Used by the checking and benchmark commands so they never touch real demands.
+    """
+    if connection.vendor != "sqlite":
+        raise CommandError("This command runs against SQLite only.")
+    scratch_dir = tempfile.mkdtemp()
+    connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(scratch_dir, "scratch.sqlite3")
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    # Aliases mirroring the default one (the reporting connection) read the scratch database too
+    mirrors = [
+        other for other in connections.all()
+        if other.settings_dict.get("TEST", {}).get("MIRROR") == connection.alias
+    ]
+    mirrored_names = [other.settings_dict["NAME"] for other in mirrors]
+    for other in mirrors:
+        other.close()
+        other.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield scratch_dir
+    finally:
+        # The batch writer's connection points at the scratch database
+        stop_batch_writer()
+        for other, name in zip(mirrors, mirrored_names):
+            other.close()
+            other.settings_dict["NAME"] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def connection_options(options):
+    """Open connections made inside the block, in every thread, with these database OPTIONS."""
+    saved = connection.settings_dict["OPTIONS"]
+    connection.close()
+    # Every thread's connection is built from this same settings dict
+    connection.settings_dict["OPTIONS"] = options
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict["OPTIONS"] = saved
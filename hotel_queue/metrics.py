@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+logger = logging.getLogger("hotel_queue.performance")
+
+# Upper bounds of the histogram buckets, Prometheus style ("+Inf" is implied)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+# Statements kept for the slow-request log; a runaway loop should not fill the memory
+MAX_LOGGED_STATEMENTS = 200
+
+METRICS = [
+    ("hotel_queue_request_seconds", "Wall time per request, including a streamed body", SECONDS_BUCKETS),
+    ("hotel_queue_request_queries", "Database queries per request, on every alias", QUERY_BUCKETS),
+    ("hotel_queue_request_query_seconds", "Time spent in database queries per request", SECONDS_BUCKETS),
+    ("hotel_queue_request_template_seconds", "Time spent rendering templates per request", SECONDS_BUCKETS),
+    ("hotel_queue_response_bytes", "Response body size", BYTES_BUCKETS),
+]
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, for one metric and view."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """The histograms of this process, keyed by metric name and view.
+
+    Each worker process keeps its own; Prometheus scrapes them one by one, or
+    sums them when the processes sit behind one address.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name, _, _ in METRICS}
+        self._buckets = {name: buckets for name, _, buckets in METRICS}
+
+    def observe(self, view, values):
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                by_view = self._histograms[name]
+                if view not in by_view:
+                    by_view[view] = Histogram(self._buckets[name])
+                by_view[view].observe(value)
+
+    def reset(self):
+        with self._lock:
+            for by_view in self._histograms.values():
+                by_view.clear()
+
+    def render(self):
+        """The histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, help_text, _ in METRICS:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for view, histogram in sorted(self._histograms[name].items()):
+                    label = f'view="{escape_label(view)}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """What one request spent on queries and templates, filled in as it runs."""
+
+    def __init__(self, keep_statements=False):
+        self.queries = 0
+        self.query_seconds = 0
+        self.template_seconds = 0
+        self.keep_statements = keep_statements
+        self.statements = []
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.query_seconds += seconds
+        if self.keep_statements and len(self.statements) < MAX_LOGGED_STATEMENTS:
+            self.statements.append((sql, seconds))
+
+
+_current = ContextVar("hotel_queue_request_stats", default=None)
+
+
+@contextmanager
+def measuring(stats):
+    """Charge the queries and template renders inside the block to ``stats``."""
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def timed_query(execute, sql, params, many, context):
+    """An execute wrapper, installed on every connection, charging each query to the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - began)
+
+
+def instrument(connection):
+    # Connections outlive requests (CONN_MAX_AGE), so the wrapper stays on and looks
+    # up the request itself; the context variable follows sync_to_async into its thread
+    if timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_query)
+
+
+def add_template_time(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.template_seconds += seconds
+
+
+def slow_request_seconds():
+    slow_ms = getattr(settings, "SLOW_REQUEST_MS", None)
+    return None if slow_ms is None else slow_ms / 1000
+
+
+def record(request, view, status, stats, elapsed, size):
+    registry.observe(view, {
+        "hotel_queue_request_seconds": elapsed,
+        "hotel_queue_request_queries": stats.queries,
+        "hotel_queue_request_query_seconds": stats.query_seconds,
+        "hotel_queue_request_template_seconds": stats.template_seconds,
+        "hotel_queue_response_bytes": size,
+    })
+    threshold = slow_request_seconds()
+    if threshold is not None and elapsed >= threshold:
+        log_slow_request(request, view, status, stats, elapsed)
+
+
+def log_slow_request(request, view, status, stats, elapsed):
+    lines = [
+        f"Slow request: {request.method} {request.get_full_path()} ({view}) {status} in {elapsed * 1000:.0f} ms, "
+        f"{stats.queries} queries in {stats.query_seconds * 1000:.0f} ms, templates {stats.template_seconds * 1000:.0f} ms"
+    ]
+    lines.extend(f"  {seconds * 1000:8.1f} ms  {sql}" for sql, seconds in stats.statements)
+    if stats.queries > len(stats.statements):
+        lines.append(f"  ... {stats.queries - len(stats.statements)} more queries")
+    logger.warning("\n".join(lines))
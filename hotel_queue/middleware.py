@@ -0,0 +1,133 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .metrics import RequestStats, measuring, record, slow_request_seconds
+
+
+# Bytes of a synchronous stream read per trip to the worker thread under ASGI
+ASYNC_STREAM_CHUNK = 64 * 1024
+
+
+def view_label(request):
+    # URL name, namespaced ("admin:hotel_queue_demand_changelist"), else the view's dotted path
+    match = getattr(request, "resolver_match", None)
+    return "unmatched" if match is None else match.view_name
+
+
+class PerformanceMiddleware:
+    """Time every request and record it, per URL name, in hotel_queue.metrics.
+
+    Records the wall time, the queries and their time (through the execute
+    wrapper every connection gets), the template render time and the body
+    size. A streamed body is measured until its last chunk has been sent,
+    except an async stream such as /events/, which only counts up to the
+    response. Requests slower than SLOW_REQUEST_MS are logged with their SQL.
+    Put it near the top of MIDDLEWARE so it also counts the other middleware's queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, began = self.start()
+        with measuring(stats):
+            response = self.get_response(request)
+        return self.finish(request, response, stats, began)
+
+    async def __acall__(self, request):
+        stats, began = self.start()
+        with measuring(stats):
+            response = await self.get_response(request)
+        return self.finish(request, response, stats, began)
+
+    def start(self):
+        return RequestStats(keep_statements=slow_request_seconds() is not None), time.perf_counter()
+
+    def finish(self, request, response, stats, began):
+        view = view_label(request)
+        # FileResponse hands its file to the server (wsgi.file_wrapper) when it can, so
+        # its chunks may never pass through here; it has a Content-Length instead
+        if response.streaming and not response.is_async and getattr(response, "file_to_stream", None) is None:
+            response.streaming_content = self.timed_chunks(
+                response.streaming_content, request, response.status_code, view, stats, began,
+            )
+            return response
+        if response.streaming:
+            size = int(response["Content-Length"]) if response.has_header("Content-Length") else None
+        else:
+            size = len(response.content)
+        record(request, view, response.status_code, stats, time.perf_counter() - began, size)
+        return response
+
+    def timed_chunks(self, chunks, request, status, view, stats, began):
+        chunks = iter(chunks)
+        size = 0
+        try:
+            while True:
+                with measuring(stats):
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Also when the client goes away and the server closes the stream early
+            record(request, view, status, stats, time.perf_counter() - began, size)
+
+
+async def async_chunks(chunks, size=ASYNC_STREAM_CHUNK):
+    """Serve a synchronous stream asynchronously, reading about ``size`` bytes at a time in the request's sync thread."""
+    chunks = iter(chunks)
+
+    def read():
+        parts, total = [], 0
+        for chunk in chunks:
+            parts.append(chunk)
+            total += len(chunk)
+            if total >= size:
+                break
+        return b"".join(parts)
+
+    while True:
+        data = await sync_to_async(read, thread_sensitive=True)()
+        if not data:
+            return
+        yield data
+
+
+class AsyncStreamingMiddleware:
+    """Under ASGI, give synchronous streamed bodies (the CSV and Excel exports) an async iterator.
+
+    Django 4.2's ASGI handler otherwise reads a synchronous stream into a list
+    before sending any of it, so an export would sit in memory whole and its
+    first bytes would wait for the last row. Under WSGI it does nothing. Put it
+    first in MIDDLEWARE, outside anything that wraps the stream.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = async_chunks(response.streaming_content)
+        return response
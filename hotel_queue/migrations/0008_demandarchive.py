@@ -0,0 +1,37 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hotel_queue', '0007_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('demand_type', models.CharField(choices=[('Food', 'Food'), ('Cleaning', 'Cleaning'), ('Maintenance', 'Maintenance'), ('Billing', 'Billing'), ('Room Service', 'Room Service')], max_length=32)),
+                ('description', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('In Progress', 'In Progress'), ('Completed', 'Completed')], default='Completed', max_length=16)),
+                ('created_at', models.DateTimeField()),
+                ('expected_completion', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('room_or_table', models.CharField(blank=True, max_length=32, null=True)),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_demands', to='hotel_queue.staffmember')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_demands_created', to=settings.AUTH_USER_MODEL)),
+                ('fulfilled_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_demands_fulfilled', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-completed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0008_demandarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(condition=models.Q(('status', 'Completed'), _negated=True), fields=['-created_at'], name='demand_open_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['status', 'created_at'], name='demand_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['status', 'completed_at'], name='demand_status_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['status', 'assigned_to'], name='demand_status_staff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandarchive',
+            index=models.Index(fields=['completed_at'], name='archive_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0009_demand_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='demandarchive',
+            name='archive_completed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='demandarchive',
+            index=models.Index(fields=['completed_at', 'id'], name='archive_completed_idx'),
+        ),
+    ]
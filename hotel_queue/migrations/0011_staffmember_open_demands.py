@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:01
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_open_demands(apps, schema_editor):
+    Demand = apps.get_model("hotel_queue", "Demand")
+    StaffMember = apps.get_model("hotel_queue", "StaffMember")
+    open_counts = (
+        Demand.objects.filter(assigned_to=models.OuterRef("pk"), status__in=["Pending", "In Progress"])
+        .order_by()
+        .values("assigned_to")
+        .annotate(total=models.Count("id"))
+        .values("total")
+    )
+    StaffMember.objects.update(open_demands=Coalesce(models.Subquery(open_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0010_archive_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staffmember',
+            name='open_demands',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_open_demands, migrations.RunPython.noop),
+    ]
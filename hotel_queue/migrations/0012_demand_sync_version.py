@@ -0,0 +1,53 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+def create_sync_state(apps, schema_editor):
+    SyncState = apps.get_model("hotel_queue", "SyncState")
+    SyncState.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0011_staffmember_open_demands'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demand_id', models.BigIntegerField()),
+                ('version', models.BigIntegerField()),
+                ('removed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_version', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='demand',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['version', 'id'], name='demand_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandtombstone',
+            index=models.Index(fields=['version', 'demand_id'], name='tombstone_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandtombstone',
+            index=models.Index(fields=['removed_at'], name='tombstone_removed_idx'),
+        ),
+        migrations.RunPython(create_sync_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    # Start times were never recorded, so demands already in progress are
+    # logged as started when they were created
+    DemandEvent = apps.get_model("hotel_queue", "DemandEvent")
+    events = []
+    for model_name in ["Demand", "DemandArchive"]:
+        model = apps.get_model("hotel_queue", model_name)
+        for demand in model.objects.order_by().iterator():
+            common = {"demand_id": demand.id, "demand_type": demand.demand_type}
+            events.append(DemandEvent(kind="created", at=demand.created_at, actor_id=demand.created_by_id, **common))
+            if demand.assigned_to_id:
+                events.append(DemandEvent(kind="assigned", at=demand.created_at, staff_id=demand.assigned_to_id, **common))
+            if demand.status == "In Progress":
+                events.append(DemandEvent(kind="started", at=demand.created_at, actor_id=demand.fulfilled_by_id, **common))
+            elif demand.status == "Completed":
+                events.append(DemandEvent(kind="completed", at=demand.completed_at or demand.created_at, actor_id=demand.fulfilled_by_id, **common))
+    events.sort(key=lambda event: event.at)
+    DemandEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0012_demand_sync_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demand_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('assigned', 'Assigned'), ('started', 'Started'), ('completed', 'Completed'), ('cleared', 'Cleared')], max_length=16)),
+                ('at', models.DateTimeField()),
+                ('demand_type', models.CharField(blank=True, max_length=32)),
+                ('actor_id', models.IntegerField(blank=True, null=True)),
+                ('staff_id', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['demand_id', 'id'], name='demandevent_demand_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
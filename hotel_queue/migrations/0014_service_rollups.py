@@ -0,0 +1,41 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0013_demandevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('demand_type', models.CharField(max_length=32)),
+                ('staff_id', models.IntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('wait_seconds', models.FloatField(default=0)),
+                ('service_seconds', models.FloatField(default=0)),
+                ('wait_histogram', models.JSONField(default=list)),
+                ('service_histogram', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='demand',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='demandarchive',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='servicerollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'demand_type', 'staff_id'), name='rollup_hour_type_staff_uniq'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:18
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_due_at(apps, schema_editor):
+    # Same rule as models.queue_deadline; historical models do not have it
+    Demand = apps.get_model("hotel_queue", "Demand")
+    aging = timedelta(minutes=settings.DEFAULT_DEADLINE_MINUTES)
+    batch = []
+    for demand in Demand.objects.order_by().only("id", "created_at", "expected_completion").iterator():
+        demand.due_at = demand.expected_completion or demand.created_at + aging
+        batch.append(demand)
+        if len(batch) >= 1000:
+            Demand.objects.bulk_update(batch, ["due_at"])
+            batch = []
+    Demand.objects.bulk_update(batch, ["due_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0014_service_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demand',
+            name='due_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_due_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='demand',
+            name='due_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(condition=models.Q(('status', 'Completed'), _negated=True), fields=['due_at'], name='demand_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['status', 'due_at'], name='demand_status_due_idx'),
+        ),
+    ]
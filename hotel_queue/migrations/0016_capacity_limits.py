@@ -0,0 +1,49 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_queue', '0015_demand_due_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacityLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demand_type', models.CharField(blank=True, choices=[('Food', 'Food'), ('Cleaning', 'Cleaning'), ('Maintenance', 'Maintenance'), ('Billing', 'Billing'), ('Room Service', 'Room Service')], max_length=32)),
+                ('room_or_table', models.CharField(blank=True, max_length=32)),
+                ('max_open', models.PositiveIntegerField()),
+                ('policy', models.CharField(choices=[('reject', 'Reject the new demand'), ('queue', 'Hold it as Waiting until there is room'), ('shed', 'Shed the least urgent pending demand')], default='reject', max_length=8)),
+                ('rejected_count', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('queued_count', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('shed_count', models.PositiveBigIntegerField(default=0, editable=False)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='demand',
+            name='status',
+            field=models.CharField(choices=[('Waiting', 'Waiting'), ('Pending', 'Pending'), ('In Progress', 'In Progress'), ('Completed', 'Completed')], default='Pending', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='demandarchive',
+            name='status',
+            field=models.CharField(choices=[('Waiting', 'Waiting'), ('Pending', 'Pending'), ('In Progress', 'In Progress'), ('Completed', 'Completed')], default='Completed', max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='demandevent',
+            name='kind',
+            field=models.CharField(choices=[('created', 'Created'), ('assigned', 'Assigned'), ('started', 'Started'), ('completed', 'Completed'), ('cleared', 'Cleared'), ('queued', 'Queued'), ('released', 'Released'), ('shed', 'Shed')], max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['status', 'demand_type', 'room_or_table'], name='demand_status_type_loc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='capacitylimit',
+            constraint=models.UniqueConstraint(fields=('demand_type', 'room_or_table'), name='capacity_type_location_uniq'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def journal_mode(mode):
+    def set_mode(apps, schema_editor):
+        # WAL is stored in the database file, so it is set once here rather than on every connection
+        if schema_editor.connection.vendor == "sqlite":
+            schema_editor.execute(f"PRAGMA journal_mode = {mode}")
+    return set_mode
+
+
+class Migration(migrations.Migration):
+
+    # SQLite cannot change the journal mode inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('hotel_queue', '0016_capacity_limits'),
+    ]
+
+    operations = [
+        migrations.RunPython(journal_mode("WAL"), journal_mode("DELETE")),
+    ]
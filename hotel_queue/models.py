@@ -1,5 +1,28 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+def queue_deadline(created_at, expected_completion):
+    """When a demand is due for deadline-first ordering.
+
+    Demands without an expected completion are treated as due a fixed time
+    after creation, so they age towards the front instead of starving.
+    """
+    if expected_completion is not None:
+        return expected_completion
+    return created_at + timedelta(minutes=settings.DEFAULT_DEADLINE_MINUTES)
+
+
+class DemandQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), so fill in due_at here as well
+        objs = list(objs)
+        for obj in objs:
+            obj.set_due_at()
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class Demand(models.Model):
@@ -12,6 +35,8 @@ class Demand(models.Model):
     ]
 
     STATUS_CHOICES = [
+        # Held back by a full capacity limit until there is room (see capacity.py)
+        ("Waiting", "Waiting"),
         ("Pending", "Pending"),
         ("In Progress", "In Progress"),
         ("Completed", "Completed"),
@@ -22,6 +47,7 @@ class Demand(models.Model):
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="Pending")
     created_at = models.DateTimeField(auto_now_add=True)
     expected_completion = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="demands_created", on_delete=models.CASCADE)
     fulfilled_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="demands_fulfilled", on_delete=models.SET_NULL, null=True, blank=True)
@@ -29,13 +55,65 @@ class Demand(models.Model):
     quantity = models.PositiveIntegerField(null=True, blank=True)
     room_or_table = models.CharField(max_length=32, null=True, blank=True)
     # No food-specific fields in the simplified version
+    # Change version from sync.next_version, bumped by every create and status change
+    version = models.BigIntegerField(default=0, editable=False)
+    # expected_completion, or the aging deadline for demands without one (see queue_deadline)
+    due_at = models.DateTimeField(editable=False)
+
+    objects = DemandQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Dashboard: open demands, newest first
+            models.Index(fields=["-created_at"], condition=~models.Q(status="Completed"), name="demand_open_created_idx"),
+            # Claiming the oldest pending demand
+            models.Index(fields=["status", "created_at"], name="demand_status_created_idx"),
+            # Completed list, exports and archiving
+            models.Index(fields=["status", "completed_at"], name="demand_status_completed_idx"),
+            # DemandForm's busy-staff lookup
+            models.Index(fields=["status", "assigned_to"], name="demand_status_staff_idx"),
+            # Delta sync: rows changed after a (version, id) cursor
+            models.Index(fields=["version", "id"], name="demand_version_idx"),
+            # Dashboard in deadline order: open demands, earliest due first
+            models.Index(fields=["due_at"], condition=~models.Q(status="Completed"), name="demand_open_due_idx"),
+            # Claiming the most urgent pending demand
+            models.Index(fields=["status", "due_at"], name="demand_status_due_idx"),
+            # Open demands per capacity limit
+            models.Index(fields=["status", "demand_type", "room_or_table"], name="demand_status_type_loc_idx"),
+        ]
 
     def __str__(self):
         return f"{self.demand_type} - {self.status}: {self.description[:30]}"
 
+    def set_due_at(self):
+        self.due_at = queue_deadline(self.created_at or timezone.now(), self.expected_completion)
+
+    def save(self, *args, **kwargs):
+        self.set_due_at()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "expected_completion" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "due_at"}
+        super().save(*args, **kwargs)
+
+    @property
+    def is_overdue(self):
+        return (
+            self.expected_completion is not None
+            and self.status != "Completed"
+            and self.expected_completion < timezone.now()
+        )
+
+
+# Which staff role handles each demand type
+DEMAND_TYPE_ROLES = {
+    "Food": "Waiter",
+    "Cleaning": "Cleaner",
+    "Maintenance": "Maintenance Staff",
+    "Billing": "Billing Staff",
+    "Room Service": "Room Service Staff",
+}
+
 
 class HotelSettings(models.Model):
     num_tables = models.PositiveIntegerField(default=10)
@@ -45,6 +123,51 @@ class HotelSettings(models.Model):
         return f"Settings (tables={self.num_tables}, rooms={self.num_rooms})"
 
 
+class CapacityLimit(models.Model):
+    """Most open (Pending or In Progress) demands allowed for a demand type and/or location.
+
+    A blank demand type or location matches any. What happens to a demand
+    arriving at a full buffer is set by ``policy``; capacity.py enforces it and
+    counts each outcome here.
+    """
+
+    POLICY_CHOICES = [
+        ("reject", "Reject the new demand"),
+        ("queue", "Hold it as Waiting until there is room"),
+        ("shed", "Shed the least urgent pending demand"),
+    ]
+
+    demand_type = models.CharField(max_length=32, choices=Demand.DEMAND_TYPES, blank=True)
+    room_or_table = models.CharField(max_length=32, blank=True)
+    max_open = models.PositiveIntegerField()
+    policy = models.CharField(max_length=8, choices=POLICY_CHOICES, default="reject")
+    rejected_count = models.PositiveBigIntegerField(default=0, editable=False)
+    queued_count = models.PositiveBigIntegerField(default=0, editable=False)
+    shed_count = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["demand_type", "room_or_table"], name="capacity_type_location_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.demand_type or 'Any type'} at {self.room_or_table or 'any location'}: {self.max_open} open"
+
+    def applies_to(self, demand):
+        return (
+            self.demand_type in ("", demand.demand_type)
+            and self.room_or_table in ("", demand.room_or_table)
+        )
+
+    def open_demands(self):
+        demands = Demand.objects.filter(status__in=["Pending", "In Progress"])
+        if self.demand_type:
+            demands = demands.filter(demand_type=self.demand_type)
+        if self.room_or_table:
+            demands = demands.filter(room_or_table=self.room_or_table)
+        return demands.order_by()
+
+
 class StaffRole(models.Model):
     name = models.CharField(max_length=64, unique=True)
 
@@ -55,6 +178,9 @@ class StaffRole(models.Model):
 class StaffMember(models.Model):
     name = models.CharField(max_length=64)
     role = models.ForeignKey(StaffRole, on_delete=models.CASCADE, related_name="members")
+    # Waiting, Pending and In Progress demands assigned to this member, kept up to date by
+    # dispatch.refresh_open_demands so availability needs no subquery over Demand
+    open_demands = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.name} ({self.role.name})"
@@ -64,3 +190,152 @@ class StaffMember(models.Model):
 Demand.add_to_class("assigned_to", models.ForeignKey(StaffMember, on_delete=models.SET_NULL, null=True, blank=True))
 
 
+class ExportJob(models.Model):
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Running", "Running"),
+        ("Done", "Done"),
+        ("Failed", "Failed"),
+    ]
+
+    FORMAT_CHOICES = [
+        ("xlsx", "Excel"),
+        ("csv", "CSV"),
+    ]
+
+    file_format = models.CharField(max_length=8, choices=FORMAT_CHOICES, default="xlsx")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="Pending")
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="export_jobs", on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Snapshot of the completed demands the file was built from; a finished file
+    # is reused for as long as both still match
+    row_count = models.PositiveIntegerField(default=0)
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    file_name = models.CharField(max_length=128, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Export {self.id} ({self.file_format}) - {self.status}"
+
+
+class DemandArchive(models.Model):
+    """Completed demands moved out of the live Demand table, keeping their original id."""
+
+    id = models.BigIntegerField(primary_key=True)
+    demand_type = models.CharField(max_length=32, choices=Demand.DEMAND_TYPES)
+    description = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=Demand.STATUS_CHOICES, default="Completed")
+    created_at = models.DateTimeField()
+    expected_completion = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="archived_demands_created", on_delete=models.SET_NULL, null=True, blank=True)
+    fulfilled_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="archived_demands_fulfilled", on_delete=models.SET_NULL, null=True, blank=True)
+    assigned_to = models.ForeignKey(StaffMember, related_name="archived_demands", on_delete=models.SET_NULL, null=True, blank=True)
+    quantity = models.PositiveIntegerField(null=True, blank=True)
+    room_or_table = models.CharField(max_length=32, null=True, blank=True)
+
+    class Meta:
+        ordering = ["-completed_at"]
+        indexes = [
+            # id is not the rowid here, so it is listed for (completed_at, id) keyset paging
+            models.Index(fields=["completed_at", "id"], name="archive_completed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.demand_type} - {self.status} (archived): {self.description[:30]}"
+
+
+class SyncState(models.Model):
+    """Single row holding the last change version handed out, for delta sync."""
+
+    last_version = models.BigIntegerField(default=0)
+    # Tombstones up to this version were pruned; older cursors must resync
+    pruned_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Sync state (version {self.last_version})"
+
+
+class DemandTombstone(models.Model):
+    """Marks a demand that left the live table (cleared or archived), for delta sync clients."""
+
+    demand_id = models.BigIntegerField()
+    version = models.BigIntegerField()
+    removed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["version", "demand_id"], name="tombstone_version_idx"),
+            models.Index(fields=["removed_at"], name="tombstone_removed_idx"),
+        ]
+
+    def __str__(self):
+        return f"Demand {self.demand_id} removed (version {self.version})"
+
+
+class DemandEvent(models.Model):
+    """Append-only log of demand state changes, written in the same transaction as the change.
+
+    Rows are never updated. Ids only (no foreign keys), so the log outlives
+    demands that are archived or cleared and the staff and users they name.
+    """
+
+    KIND_CHOICES = [
+        ("created", "Created"),
+        ("assigned", "Assigned"),
+        ("started", "Started"),
+        ("completed", "Completed"),
+        ("cleared", "Cleared"),
+        ("queued", "Queued"),
+        ("released", "Released"),
+        ("shed", "Shed"),
+    ]
+
+    demand_id = models.BigIntegerField()
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    at = models.DateTimeField()
+    demand_type = models.CharField(max_length=32, blank=True)
+    actor_id = models.IntegerField(null=True, blank=True)
+    staff_id = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # One demand's history; ranges of the log itself are read by id
+            models.Index(fields=["demand_id", "id"], name="demandevent_demand_idx"),
+        ]
+
+    def __str__(self):
+        return f"Demand {self.demand_id} {self.kind} at {self.at:%Y-%m-%d %H:%M}"
+
+
+class ServiceRollup(models.Model):
+    """Wait and service times of demands completed in one hour, per demand type and staff member.
+
+    Updated as demands complete (see rollups.py), so SLA figures come from a
+    handful of rows instead of the whole history. Histograms hold counts per
+    rollups.BUCKET_EDGES bucket, with a last bucket for anything longer.
+    """
+
+    hour = models.DateTimeField()
+    demand_type = models.CharField(max_length=32)
+    # 0 for demands nobody was assigned to
+    staff_id = models.IntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+    wait_seconds = models.FloatField(default=0)
+    service_seconds = models.FloatField(default=0)
+    wait_histogram = models.JSONField(default=list)
+    service_histogram = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hour", "demand_type", "staff_id"], name="rollup_hour_type_staff_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.demand_type} / staff {self.staff_id} at {self.hour:%Y-%m-%d %H:00}: {self.count}"
@@ -0,0 +1,84 @@
+import base64
+import binascii
+import heapq
+
+from django.utils.dateparse import parse_datetime
+
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(value, pk):
+    # A NULL value (a completed row without completed_at) is written as nothing
+    raw = f"{'' if value is None else value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return ``(datetime or None, pk)`` for a cursor from encode_cursor, or None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        raw_value, pk = raw.rsplit("|", 1)
+        value = parse_datetime(raw_value) if raw_value else None
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if raw_value and value is None:
+        return None
+    return value, pk
+
+
+def keyset_page(sources, field, cursor=None, page_size=PAGE_SIZE, id_descending=True, descending=True):
+    """Return one page of rows ordered by ``field``, plus the cursor for the next page.
+
+    Rows are ordered by ``(-field, -id)``, or ``(-field, id)`` when
+    ``id_descending`` is False, to follow the index the table has; with
+    ``descending`` False the ``field`` order flips to earliest first. Instead of
+    an OFFSET the page starts after the ``(field, id)`` of the last row seen, so
+    every page is an index range read of ``page_size`` rows however deep it is.
+    ``sources`` may hold several querysets (live and archived demands); each is
+    read the same way and the results are merged. Rows where a nullable
+    ``field`` is NULL come after all the others, in ``id`` order.
+    """
+    position = decode_cursor(cursor)
+    field_order = f"-{field}" if descending else field
+    id_order = "-id" if id_descending else "id"
+    past_value = f"{field}__lte" if descending else f"{field}__gte"
+    past_cursor = "id__gte" if id_descending else "id__lte"
+    past_null = "id__lt" if id_descending else "id__gt"
+    pages = []
+    for queryset in sources:
+        nullable = queryset.model._meta.get_field(field).null
+        rows = []
+        if position is None or position[0] is not None:
+            ranged = queryset.order_by(field_order, id_order)
+            if position:
+                value, pk = position
+                ranged = ranged.filter(**{past_value: value}).exclude(**{field: value, past_cursor: pk})
+            elif nullable:
+                ranged = ranged.filter(**{f"{field}__isnull": False})
+            rows = list(ranged[:page_size + 1])
+        # The NULL rows are only read once the others have run out, i.e. on the last pages
+        if nullable and len(rows) <= page_size:
+            nulls = queryset.filter(**{f"{field}__isnull": True}).order_by(id_order)
+            if position and position[0] is None:
+                nulls = nulls.filter(**{past_null: position[1]})
+            rows += list(nulls[:page_size + 1 - len(rows)])
+        pages.append(rows)
+
+    def sort_key(row):
+        # heapq.merge sorts one way only, so the id is negated when it runs against the field,
+        # and NULLs get the rank that puts them last whichever way it runs
+        value = getattr(row, field)
+        null_rank = value is not None if descending else value is None
+        return null_rank, value, row.id if id_descending == descending else -row.id
+
+    rows = list(heapq.merge(*pages, key=sort_key, reverse=descending))[:page_size + 1]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.id)
+    return rows, next_cursor
@@ -0,0 +1,171 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Demand, ServiceRollup
+
+
+# Upper edges, in seconds, of the histogram buckets; one more bucket holds anything longer
+BUCKET_EDGES = [60, 120, 300, 600, 900, 1200, 1800, 2700, 3600, 5400, 7200, 14400, 28800, 86400]
+
+ROLLUP_FIELDS = ["demand_type", "assigned_to_id", "created_at", "started_at", "completed_at"]
+
+# What a rollup accumulates
+ROLLUP_TOTALS = ["count", "wait_seconds", "service_seconds", "wait_histogram", "service_histogram"]
+
+
+def empty_histogram():
+    return [0] * (len(BUCKET_EDGES) + 1)
+
+
+def timings(row):
+    """Return ``(wait, service)`` seconds for a completed demand row.
+
+    Wait runs from creation to start, service from start to completion. A
+    demand completed without being started counts the whole time as service,
+    as replay_analytics does.
+    """
+    started_at = row["started_at"] or row["created_at"]
+    wait = max((started_at - row["created_at"]).total_seconds(), 0)
+    service = max((row["completed_at"] - started_at).total_seconds(), 0)
+    return wait, service
+
+
+def local_hour(value):
+    # Hours in TIME_ZONE, so buckets line up with the clock the hotel reads
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_key(row):
+    hour = local_hour(row["completed_at"])
+    return hour, row["demand_type"], row["assigned_to_id"] or 0
+
+
+def _add(rollup, wait, service):
+    rollup.count += 1
+    rollup.wait_seconds += wait
+    rollup.service_seconds += service
+    rollup.wait_histogram[bisect_left(BUCKET_EDGES, wait)] += 1
+    rollup.service_histogram[bisect_left(BUCKET_EDGES, service)] += 1
+
+
+def build_rollups(rows):
+    """Group completed demand rows into unsaved ServiceRollup objects keyed by (hour, type, staff)."""
+    rollups = {}
+    for row in rows:
+        key = _rollup_key(row)
+        rollup = rollups.get(key)
+        if rollup is None:
+            hour, demand_type, staff_id = key
+            rollup = rollups[key] = ServiceRollup(
+                hour=hour, demand_type=demand_type, staff_id=staff_id,
+                wait_histogram=empty_histogram(), service_histogram=empty_histogram(),
+            )
+        _add(rollup, *timings(row))
+    return rollups
+
+
+def record_completions(version):
+    """Fold the demands completed under ``version`` into the rollups, inside that transaction.
+
+    One read of the changed rows, then one locked read-modify-write per
+    (hour, type, staff) group touched, usually a single row.
+    """
+    rows = Demand.objects.filter(version=version).order_by().values(*ROLLUP_FIELDS)
+    for (hour, demand_type, staff_id), fresh in build_rollups(rows).items():
+        rollup, created = ServiceRollup.objects.select_for_update().get_or_create(
+            hour=hour, demand_type=demand_type, staff_id=staff_id,
+            defaults={
+                "count": fresh.count, "wait_seconds": fresh.wait_seconds, "service_seconds": fresh.service_seconds,
+                "wait_histogram": fresh.wait_histogram, "service_histogram": fresh.service_histogram,
+            },
+        )
+        if created:
+            continue
+        _merge(rollup, fresh)
+        rollup.save(update_fields=ROLLUP_TOTALS)
+
+
+def add_rollups(fresh):
+    """Add unsaved rollups from build_rollups to the stored ones, for bulk loads.
+
+    Reads the stored rows for the hours covered in one query and writes with
+    bulk_update and bulk_create, without record_completions' row locks, so
+    nothing else may be completing demands in those hours meanwhile.
+    """
+    if not fresh:
+        return
+    hours = [hour for hour, _, _ in fresh]
+    stored = {
+        (rollup.hour, rollup.demand_type, rollup.staff_id): rollup
+        for rollup in ServiceRollup.objects.filter(hour__gte=min(hours), hour__lte=max(hours))
+    }
+    changed = []
+    for key, rollup in fresh.items():
+        if key in stored:
+            _merge(stored[key], rollup)
+            changed.append(stored[key])
+    ServiceRollup.objects.bulk_update(changed, ROLLUP_TOTALS, batch_size=500)
+    ServiceRollup.objects.bulk_create([rollup for key, rollup in fresh.items() if key not in stored], batch_size=500)
+
+
+def _merge(rollup, fresh):
+    rollup.count += fresh.count
+    rollup.wait_seconds += fresh.wait_seconds
+    rollup.service_seconds += fresh.service_seconds
+    rollup.wait_histogram = [a + b for a, b in zip(rollup.wait_histogram, fresh.wait_histogram)]
+    rollup.service_histogram = [a + b for a, b in zip(rollup.service_histogram, fresh.service_histogram)]
+
+
+def percentile(histogram, fraction):
+    """Estimate a percentile in seconds from bucket counts, interpolating inside the bucket."""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = fraction * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= target:
+            lower = BUCKET_EDGES[index - 1] if index else 0
+            if index == len(BUCKET_EDGES):
+                # Open-ended last bucket: all we know is "longer than the last edge"
+                return lower
+            return lower + (BUCKET_EDGES[index] - lower) * (target - seen) / count
+        seen += count
+    return BUCKET_EDGES[-1]
+
+
+def summarize(rollups, key):
+    """Merge rollups sharing ``key(rollup)`` into count, means and p50/p95 of wait and service."""
+    merged = {}
+    for rollup in rollups:
+        group = merged.setdefault(key(rollup), {
+            "count": 0, "wait_seconds": 0, "service_seconds": 0,
+            "wait_histogram": empty_histogram(), "service_histogram": empty_histogram(),
+        })
+        group["count"] += rollup.count
+        group["wait_seconds"] += rollup.wait_seconds
+        group["service_seconds"] += rollup.service_seconds
+        for name in ["wait_histogram", "service_histogram"]:
+            group[name] = [a + b for a, b in zip(group[name], getattr(rollup, name))]
+    summary = []
+    for group_key, group in sorted(merged.items(), key=lambda item: item[0]):
+        count = group["count"]
+        summary.append({
+            "key": group_key,
+            "count": count,
+            "wait_mean": group["wait_seconds"] / count if count else None,
+            "wait_p50": percentile(group["wait_histogram"], 0.5),
+            "wait_p95": percentile(group["wait_histogram"], 0.95),
+            "service_mean": group["service_seconds"] / count if count else None,
+            "service_p50": percentile(group["service_histogram"], 0.5),
+            "service_p95": percentile(group["service_histogram"], 0.95),
+        })
+    return summary
+
+
+def rollups_since(hours):
+    """Rollup rows for demands completed in the last ``hours`` hours (whole hour buckets)."""
+    start = local_hour(timezone.now() - timedelta(hours=hours))
+    return list(ServiceRollup.objects.filter(hour__gte=start))
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Read-only connection to the same SQLite file, with its own page cache (see settings.DATABASES)
+REPORTING_DB = "reporting"
+
+_reporting = ContextVar("hotel_queue_reporting", default=False)
+
+
+@contextmanager
+def reporting_reads():
+    """Send the reads made inside the block to the reporting database; writes still go to the primary."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def _reporting_chunks(chunks):
+    # Only while each chunk is produced, so the flag never leaks into the server between chunks
+    chunks = iter(chunks)
+    while True:
+        with reporting_reads():
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def reporting_view(view):
+    """Run a read-only report view, including a streamed body and a lazily rendered template, on the reporting database."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reporting_reads():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+        if response.streaming:
+            response.streaming_content = _reporting_chunks(response.streaming_content)
+        return response
+    return wrapper
+
+
+def reporting_available():
+    # Under the test runner REPORTING_DB mirrors the in-memory test database; a second
+    # connection to that would not see the test's uncommitted rows, so reads stay on default
+    return REPORTING_DB in settings.DATABASES and not connections[REPORTING_DB].is_in_memory_db()
+
+
+class ReportingRouter:
+    """Route reads inside reporting_reads() to REPORTING_DB, when it is usable, and every write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and reporting_available():
+            return REPORTING_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance read from REPORTING_DB does not follow it there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPORTING_DB
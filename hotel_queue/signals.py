@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import invalidate_capacity, invalidate_locations, invalidate_staff
+from .dispatch import demands_removed, refresh_open_demands, staff_freed, staff_removed, staff_role_changed
+from .eventlog import log_events
+from .metrics import instrument
+from .models import CapacityLimit, Demand, HotelSettings, StaffMember, StaffRole
+from .sync import record_tombstones, touch_staff_demands
+
+
+@receiver([post_save, post_delete], sender=HotelSettings)
+def hotel_settings_changed(sender, **kwargs):
+    invalidate_locations()
+
+
+@receiver([post_save, post_delete], sender=StaffMember)
+@receiver([post_save, post_delete], sender=StaffRole)
+def staff_changed(sender, **kwargs):
+    invalidate_staff()
+
+
+# Keep the assignment engine's free-staff heaps in step; a busy member is not in them.
+# A new member starts free, so they can take queued demands straight away.
+@receiver(post_save, sender=StaffMember)
+def staff_member_saved(sender, instance, created, **kwargs):
+    if created:
+        staff_freed([instance.id])
+    else:
+        staff_role_changed(instance.id, instance.role.name)
+
+
+@receiver(post_delete, sender=StaffMember)
+def staff_member_deleted(sender, instance, **kwargs):
+    staff_removed([instance.id])
+
+
+# Demands show their assignee's name, so a rename or delete is a change delta-sync
+# clients must see. Deleting clears assigned_to after pre_delete, in the same transaction.
+@receiver(post_save, sender=StaffMember)
+def staff_member_renamed(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or "name" in update_fields):
+        touch_staff_demands(instance.id)
+
+
+@receiver(pre_delete, sender=StaffMember)
+def staff_member_deleting(sender, instance, **kwargs):
+    touch_staff_demands(instance.id)
+
+
+# Deleting a user cascades to the demands they created; record them as cleared, in the
+# same transaction, so delta-sync clients drop them, then free their assignees
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleting(sender, instance, **kwargs):
+    demands = Demand.objects.filter(created_by=instance)
+    instance._cleared_demands = list(demands.values_list("id", "assigned_to_id"))
+    demand_ids = [demand_id for demand_id, _ in instance._cleared_demands]
+    if demand_ids:
+        record_tombstones(demand_ids)
+        log_events("cleared", demand_ids)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    cleared = getattr(instance, "_cleared_demands", [])
+    if cleared:
+        staff_ids = {staff_id for _, staff_id in cleared}
+        refresh_open_demands(staff_ids)
+        demands_removed(demand_id for demand_id, _ in cleared)
+        staff_freed(staff_ids)
+
+
+@receiver([post_save, post_delete], sender=CapacityLimit)
+def capacity_changed(sender, **kwargs):
+    invalidate_capacity()
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrument(connection)
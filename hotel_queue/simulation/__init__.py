@@ -0,0 +1,9 @@
+"""Producer-consumer simulations of the demand queue over pluggable buffers.
+
+Producers put items into a bounded buffer and consumers take and serve them,
+over queue.Queue, a deque with conditions, asyncio.Queue, a multiprocessing
+queue, or the real Demand table. See ``manage.py simulate_queue``.
+"""
+
+from .backends import BACKENDS  # noqa: F401
+from .runner import Workload, run_simulation  # noqa: F401
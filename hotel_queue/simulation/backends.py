@@ -0,0 +1,229 @@
+import asyncio
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+
+class CountingLock:
+    """A threading.Lock that counts how often a thread had to wait for it.
+
+    Counters are only touched while the lock is held, so they need no lock of
+    their own. Non-blocking attempts (Condition uses them to check ownership)
+    are passed straight through and not counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not blocking:
+            return self._lock.acquire(False)
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        began = time.perf_counter()
+        if not self._lock.acquire(True, timeout):
+            return False
+        self.acquisitions += 1
+        self.contended += 1
+        self.wait_seconds += time.perf_counter() - began
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def stats(self):
+        return {"acquisitions": self.acquisitions, "contended": self.contended, "wait_seconds": self.wait_seconds}
+
+
+class QueueBackend:
+    """queue.Queue, with its mutex swapped for a CountingLock."""
+
+    kind = "thread"
+
+    def __init__(self, capacity):
+        self.queue = queue.Queue(capacity)
+        self.lock = CountingLock()
+        # The conditions must share the mutex, so all four are replaced together
+        self.queue.mutex = self.lock
+        self.queue.not_empty = threading.Condition(self.lock)
+        self.queue.not_full = threading.Condition(self.lock)
+        self.queue.all_tasks_done = threading.Condition(self.lock)
+
+    def put(self, item):
+        """Add ``item``, blocking while the buffer is full; return True if it had to wait."""
+        try:
+            self.queue.put_nowait(item)
+            return False
+        except queue.Full:
+            self.queue.put(item)
+            return True
+
+    def get(self):
+        """Return ``(item, waited)``, blocking while the buffer is empty. None means stop."""
+        try:
+            return self.queue.get_nowait(), False
+        except queue.Empty:
+            return self.queue.get(), True
+
+    def done(self, item):
+        pass
+
+    def close(self, consumers):
+        for _ in range(consumers):
+            self.queue.put(None)
+
+    def worker_done(self):
+        pass
+
+    def lock_stats(self):
+        return self.lock.stats()
+
+
+class DequeBackend(QueueBackend):
+    """The textbook bounded buffer: a deque guarded by one lock and two conditions (full and empty)."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = deque()
+        self.lock = CountingLock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+
+    def put(self, item):
+        waited = False
+        with self.not_full:
+            while len(self.items) >= self.capacity:
+                waited = True
+                self.not_full.wait()
+            self.items.append(item)
+            self.not_empty.notify()
+        return waited
+
+    def get(self):
+        waited = False
+        with self.not_empty:
+            while not self.items:
+                waited = True
+                self.not_empty.wait()
+            item = self.items.popleft()
+            self.not_full.notify()
+        return item, waited
+
+    def close(self, consumers):
+        for _ in range(consumers):
+            self.put(None)
+
+
+class AsyncioBackend:
+    """asyncio.Queue: producers and consumers are coroutines on one event loop, so nothing contends for a lock."""
+
+    kind = "asyncio"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.queue = None
+
+    def start(self):
+        # Created inside the running loop it will belong to
+        self.queue = asyncio.Queue(self.capacity)
+
+    async def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+            return False
+        except asyncio.QueueFull:
+            await self.queue.put(item)
+            return True
+
+    async def get(self):
+        try:
+            return self.queue.get_nowait(), False
+        except asyncio.QueueEmpty:
+            return await self.queue.get(), True
+
+    async def close(self, consumers):
+        for _ in range(consumers):
+            await self.queue.put(None)
+
+    def lock_stats(self):
+        return None
+
+
+class ProcessBackend:
+    """multiprocessing.Queue between producer and consumer processes.
+
+    Its locks live in the operating system, so only full and empty waits are
+    counted. get_nowait() can report Empty for an item still in the feeder
+    thread, which counts as an empty wait.
+    """
+
+    kind = "process"
+
+    def __init__(self, capacity):
+        self.context = multiprocessing.get_context()
+        self.queue = self.context.Queue(capacity)
+
+    def lock_stats(self):
+        return None
+
+
+def produce_in_process(items, index, count, interval, seed, results):
+    """Producer process for ProcessBackend: put ``count`` items and report how often the buffer was full."""
+    rng = random.Random(seed * 1000 + index)
+    full_waits = 0
+    for seq in range(count):
+        if interval:
+            time.sleep(rng.expovariate(1 / interval))
+        item = (index, seq, time.perf_counter())
+        try:
+            items.put_nowait(item)
+        except queue.Full:
+            full_waits += 1
+            items.put(item)
+    results.put({"produced": count, "full_waits": full_waits})
+
+
+def consume_in_process(items, index, service_time, seed, results):
+    """Consumer process for ProcessBackend: serve items until a None arrives, then report timings."""
+    rng = random.Random(seed * 1000 + 500 + index)
+    waits = []
+    sojourns = []
+    empty_waits = 0
+    while True:
+        try:
+            item = items.get_nowait()
+        except queue.Empty:
+            empty_waits += 1
+            item = items.get()
+        if item is None:
+            break
+        # perf_counter is system-wide on the platforms we run on, so times compare across processes
+        waits.append(time.perf_counter() - item[2])
+        if service_time:
+            time.sleep(rng.expovariate(1 / service_time))
+        sojourns.append(time.perf_counter() - item[2])
+    results.put({"consumed": len(waits), "empty_waits": empty_waits, "waits": waits, "sojourns": sojourns})
+
+
+# In-memory backends by name; "database" (simulation.database) needs Django set up and is loaded on demand
+BACKENDS = {
+    "queue": QueueBackend,
+    "deque": DequeBackend,
+    "asyncio": AsyncioBackend,
+    "process": ProcessBackend,
+}
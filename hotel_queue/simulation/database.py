@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+
+from hotel_queue.caching import invalidate_capacity
+from hotel_queue.dispatch import claim_next_demand, complete_demand
+from hotel_queue.ingest import ingest_demands
+from hotel_queue.models import CapacityLimit, Demand
+
+
+class DatabaseBackend:
+    """The real queue: producers ingest Demand rows, consumers claim and complete them.
+
+    The buffer bound is a CapacityLimit with the reject policy, so a full
+    buffer is ingest turning the demand away and the producer retrying, and
+    demands being served count towards it until they complete. Lock contention
+    is SQLite answering "database is locked". Run it on a scratch database.
+    """
+
+    kind = "thread"
+
+    # Seconds to back off when the buffer is full or empty
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, capacity):
+        CapacityLimit.objects.create(max_open=capacity, policy="reject")
+        invalidate_capacity()
+        self.producer = User.objects.create_user(username="simulation-producer", is_staff=True)
+        self.staff = User.objects.create_user(username="simulation-staff", is_staff=True)
+        # Producer item by demand description, set before the insert so a consumer always finds it
+        self.items = {}
+        self.closed = False
+        self.lock_errors = 0
+        self._errors_lock = threading.Lock()
+
+    def _locked(self):
+        with self._errors_lock:
+            self.lock_errors += 1
+
+    def put(self, item):
+        description = f"Simulated {item[0]}-{item[1]}"
+        self.items[description] = item
+        waited = False
+        while True:
+            try:
+                created, _ = ingest_demands(
+                    [{"demand_type": "Cleaning", "description": description, "room_or_table": "Room 101"}], self.producer
+                )
+            except OperationalError:
+                self._locked()
+                continue
+            if created:
+                return waited
+            waited = True
+            time.sleep(self.POLL_INTERVAL)
+
+    def get(self):
+        waited = False
+        while True:
+            try:
+                demand = claim_next_demand(self.staff)
+                if demand is None and self.closed and not Demand.objects.filter(status="Pending").exists():
+                    return None, waited
+            except OperationalError:
+                self._locked()
+                continue
+            if demand is not None:
+                return self.items.pop(demand.description) + (demand,), waited
+            waited = True
+            time.sleep(self.POLL_INTERVAL)
+
+    def done(self, item):
+        while True:
+            try:
+                complete_demand(item[3], self.staff)
+                return
+            except OperationalError:
+                self._locked()
+
+    def close(self, consumers):
+        self.closed = True
+
+    def worker_done(self):
+        connections.close_all()
+
+    def lock_stats(self):
+        return {"lock_errors": self.lock_errors}
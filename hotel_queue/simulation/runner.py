@@ -0,0 +1,220 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+from .backends import BACKENDS, consume_in_process, produce_in_process
+
+
+class Workload:
+    """How many producers and consumers run, how much each produces and how long an item takes to serve.
+
+    ``produce_interval`` and ``service_time`` are mean seconds (exponentially
+    distributed); a ``produce_interval`` of 0 produces flat out.
+    """
+
+    def __init__(self, producers=2, consumers=4, items=500, capacity=50, produce_interval=0.0,
+                 service_time=0.002, seed=1):
+        self.producers = producers
+        self.consumers = consumers
+        self.items = items
+        self.capacity = capacity
+        self.produce_interval = produce_interval
+        self.service_time = service_time
+        self.seed = seed
+
+    def producer_rng(self, index):
+        return random.Random(self.seed * 1000 + index)
+
+    def consumer_rng(self, index):
+        return random.Random(self.seed * 1000 + 500 + index)
+
+
+class Tally:
+    """What one producer or consumer saw; merged into the report at the end."""
+
+    def __init__(self):
+        self.produced = 0
+        self.consumed = 0
+        self.full_waits = 0
+        self.empty_waits = 0
+        self.waits = []
+        self.sojourns = []
+
+
+def get_backend(name):
+    if name == "database":
+        # Imported here: it needs Django set up, and the process workers must import without it
+        from .database import DatabaseBackend
+        return DatabaseBackend
+    return BACKENDS[name]
+
+
+def quantile(sorted_values, fraction):
+    """Nearest-rank quantile of an already sorted list, or None if it is empty."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(len(sorted_values) * fraction) - 1, 0)]
+
+
+def run_simulation(backend_name, workload):
+    """Run ``workload`` over the named backend and return the report dict.
+
+    Every producer puts ``workload.items`` items; consumers serve them until
+    the producers are done and the buffer is drained. Queue wait runs from
+    put to get, sojourn from put to the end of service.
+    """
+    backend = get_backend(backend_name)(workload.capacity)
+    runners = {"thread": _run_threads, "asyncio": _run_asyncio, "process": _run_processes}
+    began = time.perf_counter()
+    tallies = runners[backend.kind](backend, workload)
+    elapsed = time.perf_counter() - began
+    return build_report(backend_name, backend, workload, tallies, elapsed)
+
+
+def build_report(backend_name, backend, workload, tallies, elapsed):
+    waits = sorted(wait for tally in tallies for wait in tally.waits)
+    sojourns = sorted(sojourn for tally in tallies for sojourn in tally.sojourns)
+    consumed = sum(tally.consumed for tally in tallies)
+    report = {
+        "backend": backend_name,
+        "producers": workload.producers,
+        "consumers": workload.consumers,
+        "capacity": workload.capacity,
+        "produced": sum(tally.produced for tally in tallies),
+        "consumed": consumed,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": consumed / elapsed if elapsed else None,
+        "full_waits": sum(tally.full_waits for tally in tallies),
+        "empty_waits": sum(tally.empty_waits for tally in tallies),
+        "lock": backend.lock_stats(),
+    }
+    for name, values in [("queue_wait", waits), ("sojourn", sojourns)]:
+        for label, fraction in [("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0)]:
+            report[f"{name}_{label}_ms"] = None if not values else quantile(values, fraction) * 1000
+    return report
+
+
+def _run_threads(backend, workload):
+    producers = [Tally() for _ in range(workload.producers)]
+    consumers = [Tally() for _ in range(workload.consumers)]
+    start = threading.Barrier(workload.producers + workload.consumers)
+
+    def produce(index, tally):
+        rng = workload.producer_rng(index)
+        start.wait()
+        try:
+            for seq in range(workload.items):
+                if workload.produce_interval:
+                    time.sleep(rng.expovariate(1 / workload.produce_interval))
+                if backend.put((index, seq, time.perf_counter())):
+                    tally.full_waits += 1
+                tally.produced += 1
+        finally:
+            backend.worker_done()
+
+    def consume(index, tally):
+        rng = workload.consumer_rng(index)
+        start.wait()
+        try:
+            while True:
+                item, waited = backend.get()
+                if waited:
+                    tally.empty_waits += 1
+                if item is None:
+                    return
+                tally.waits.append(time.perf_counter() - item[2])
+                if workload.service_time:
+                    time.sleep(rng.expovariate(1 / workload.service_time))
+                backend.done(item)
+                tally.sojourns.append(time.perf_counter() - item[2])
+                tally.consumed += 1
+        finally:
+            backend.worker_done()
+
+    producer_threads = [threading.Thread(target=produce, args=(i, tally)) for i, tally in enumerate(producers)]
+    consumer_threads = [threading.Thread(target=consume, args=(i, tally)) for i, tally in enumerate(consumers)]
+    for thread in producer_threads + consumer_threads:
+        thread.start()
+    for thread in producer_threads:
+        thread.join()
+    backend.close(workload.consumers)
+    for thread in consumer_threads:
+        thread.join()
+    return producers + consumers
+
+
+def _run_asyncio(backend, workload):
+    producers = [Tally() for _ in range(workload.producers)]
+    consumers = [Tally() for _ in range(workload.consumers)]
+
+    async def produce(index, tally):
+        rng = workload.producer_rng(index)
+        for seq in range(workload.items):
+            if workload.produce_interval:
+                await asyncio.sleep(rng.expovariate(1 / workload.produce_interval))
+            if await backend.put((index, seq, time.perf_counter())):
+                tally.full_waits += 1
+            tally.produced += 1
+
+    async def consume(index, tally):
+        rng = workload.consumer_rng(index)
+        while True:
+            item, waited = await backend.get()
+            if waited:
+                tally.empty_waits += 1
+            if item is None:
+                return
+            tally.waits.append(time.perf_counter() - item[2])
+            if workload.service_time:
+                await asyncio.sleep(rng.expovariate(1 / workload.service_time))
+            tally.sojourns.append(time.perf_counter() - item[2])
+            tally.consumed += 1
+
+    async def main():
+        backend.start()
+        consumer_tasks = [asyncio.create_task(consume(i, tally)) for i, tally in enumerate(consumers)]
+        await asyncio.gather(*(produce(i, tally) for i, tally in enumerate(producers)))
+        await backend.close(workload.consumers)
+        await asyncio.gather(*consumer_tasks)
+
+    asyncio.run(main())
+    return producers + consumers
+
+
+def _run_processes(backend, workload):
+    context = backend.context
+    results = context.Queue()
+    processes = [
+        context.Process(target=produce_in_process, args=(
+            backend.queue, i, workload.items, workload.produce_interval, workload.seed, results,
+        ))
+        for i in range(workload.producers)
+    ]
+    processes += [
+        context.Process(target=consume_in_process, args=(
+            backend.queue, i, workload.service_time, workload.seed, results,
+        ))
+        for i in range(workload.consumers)
+    ]
+    for process in processes:
+        process.start()
+    tallies = []
+    # Drain the results before joining: a process cannot exit while its result is still buffered
+    for _ in range(workload.producers):
+        tallies.append(_tally_from(results.get()))
+    for _ in range(workload.consumers):
+        backend.queue.put(None)
+    for _ in range(workload.consumers):
+        tallies.append(_tally_from(results.get()))
+    for process in processes:
+        process.join()
+    return tallies
+
+
+def _tally_from(result):
+    tally = Tally()
+    for name, value in result.items():
+        setattr(tally, name, value)
+    return tally
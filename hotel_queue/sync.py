@@ -0,0 +1,121 @@
+import heapq
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Demand, DemandTombstone, SyncState
+
+
+CHANGES_PAGE_SIZE = 200
+
+# Tombstones older than this are pruned; clients that last synced before that start over
+TOMBSTONE_RETENTION = timedelta(days=7)
+
+# Fields sent for every changed demand
+SYNC_FIELDS = [
+    "id", "version", "demand_type", "description", "status", "quantity", "room_or_table",
+    "assigned_to_id", "assigned_to__name", "created_at", "expected_completion", "completed_at",
+]
+
+
+def next_version():
+    """Reserve the next change version; call it inside the transaction that writes the change.
+
+    The counter UPDATE takes the write lock first, so versions become visible
+    to readers in the order they were handed out and a client never skips a
+    change that commits after it read a higher version.
+    """
+    if not SyncState.objects.filter(pk=1).update(last_version=F("last_version") + 1):
+        SyncState.objects.get_or_create(pk=1)
+        SyncState.objects.filter(pk=1).update(last_version=F("last_version") + 1)
+    return SyncState.objects.values_list("last_version", flat=True).get(pk=1)
+
+
+def record_tombstones(demand_ids, version=None):
+    """Record that these demands left the live table, inside the transaction that removes them."""
+    demand_ids = list(demand_ids)
+    if not demand_ids:
+        return
+    version = version or next_version()
+    DemandTombstone.objects.bulk_create(DemandTombstone(demand_id=demand_id, version=version) for demand_id in demand_ids)
+
+
+def touch_staff_demands(staff_id):
+    """Give the live demands assigned to a staff member a new version, so delta sync resends their assignee."""
+    demands = Demand.objects.filter(assigned_to_id=staff_id)
+    if demands.exists():
+        with transaction.atomic():
+            demands.update(version=next_version())
+
+
+def prune_tombstones(older_than=TOMBSTONE_RETENTION):
+    """Delete old tombstones and remember the newest version dropped; return how many went."""
+    old = DemandTombstone.objects.filter(removed_at__lt=timezone.now() - older_than)
+    newest = old.order_by("-version").values_list("version", flat=True).first()
+    if newest is None:
+        return 0
+    deleted, _ = old.filter(version__lte=newest).delete()
+    SyncState.objects.filter(pk=1, pruned_through__lt=newest).update(pruned_through=newest)
+    return deleted
+
+
+def encode_sync_cursor(version, pk):
+    return f"{version}-{pk}"
+
+
+def decode_sync_cursor(cursor):
+    """Return ``(version, pk)`` for a cursor, ``(0, 0)`` when there is none, or None if it is malformed."""
+    if not cursor:
+        return 0, 0
+    try:
+        version, pk = (int(part) for part in cursor.split("-"))
+    except ValueError:
+        return None
+    return version, pk
+
+
+def _after(queryset, id_field, version, pk):
+    # Same shape as keyset_page: a range on the (version, id) index, then the ties before the cursor dropped
+    return (
+        queryset.filter(version__gte=version)
+        .exclude(**{"version": version, f"{id_field}__lte": pk})
+        .order_by("version", id_field)
+    )
+
+
+def changes_since(version, pk, page_size=CHANGES_PAGE_SIZE):
+    """Return demands changed and removed after the ``(version, pk)`` cursor.
+
+    Both tables are read as a range of their (version, id) index, so a poll
+    costs the number of changes, not the size of the queue. Returns a dict
+    with ``changes``, ``removed``, the next ``cursor`` and ``has_more``, or
+    ``{"reset": True}`` when tombstones the client needs were pruned.
+    """
+    pruned_through = SyncState.objects.values_list("pruned_through", flat=True).filter(pk=1).first() or 0
+    if (version or pk) and version < pruned_through:
+        return {"reset": True}
+    changed = list(_after(Demand.objects.values(*SYNC_FIELDS), "id", version, pk)[:page_size + 1])
+    removed = list(_after(DemandTombstone.objects.values("demand_id", "version"), "demand_id", version, pk)[:page_size + 1])
+    for row in removed:
+        row["id"] = row["demand_id"]
+    rows = list(heapq.merge(changed, removed, key=lambda row: (row["version"], row["id"])))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if rows:
+        version, pk = rows[-1]["version"], rows[-1]["id"]
+    changes = []
+    removed_ids = []
+    for row in rows:
+        if "demand_id" in row:
+            removed_ids.append(row["id"])
+            continue
+        row["assigned_to_name"] = row.pop("assigned_to__name")
+        changes.append(row)
+    return {
+        "changes": changes,
+        "removed": removed_ids,
+        "cursor": encode_sync_cursor(version, pk),
+        "has_more": has_more,
+    }
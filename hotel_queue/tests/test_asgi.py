@@ -0,0 +1,65 @@
+import warnings
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from hotel_demandflow.asgi import application
+from hotel_queue.metrics import registry
+from hotel_queue.middleware import ASYNC_STREAM_CHUNK
+from hotel_queue.models import Demand
+
+
+class AsgiExportTests(TransactionTestCase):
+    """Exports stream through the ASGI application rather than being read into memory first.
+
+    A TransactionTestCase, as the ASGI app serves the request on its own
+    thread and connection.
+    """
+
+    def setUp(self):
+        registry.reset()
+        user = User.objects.create_user(username="exporter", is_staff=True)
+        self.client.force_login(user)
+        now = timezone.now()
+        Demand.objects.bulk_create(
+            Demand(demand_type="Cleaning", description=f"Exported demand number {i}", status="Completed",
+                   room_or_table="Room 101", created_by=user, fulfilled_by=user, completed_at=now)
+            for i in range(2000)
+        )
+
+    async def get(self, path, query_string):
+        cookie = f"{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        communicator = ApplicationCommunicator(application, {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query_string,
+            "root_path": "", "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 1000), "server": ("testserver", 80),
+        })
+        await communicator.send_input({"type": "http.request", "body": b"", "more_body": False})
+        start = await communicator.receive_output(timeout=30)
+        bodies = []
+        while True:
+            message = await communicator.receive_output(timeout=30)
+            bodies.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        await communicator.wait(timeout=30)
+        return start, bodies
+
+    def test_csv_export_streams_without_buffering(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            start, bodies = async_to_sync(self.get)("/completed/export/", b"format=csv")
+        self.assertEqual(start["status"], 200)
+        self.assertEqual([str(warning.message) for warning in caught if "synchronous iterators" in str(warning.message)], [])
+        body = b"".join(bodies)
+        self.assertEqual(body.count(b"Exported demand number"), 2000)
+        # Sent as it is written, one batch at a time
+        self.assertGreater(len([part for part in bodies if part]), 1)
+        self.assertTrue(all(len(part) < 2 * ASYNC_STREAM_CHUNK for part in bodies))
+        # The timing wrapper still sees every chunk
+        self.assertIn(f'hotel_queue_response_bytes_sum{{view="export_completed"}} {len(body)}', registry.render())
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from hotel_queue.assignment import AssignmentEngine
+from hotel_queue.dispatch import assignment_engine, reset_assignment_engine
+from hotel_queue.models import CapacityLimit, Demand, StaffMember, StaffRole
+
+
+class AssignmentEngineTests(TestCase):
+    def test_removed_entries_are_never_matched(self):
+        engine = AssignmentEngine()
+        engine.add_demand(1, "Cleaner", 10.0)
+        engine.add_demand(2, "Cleaner", 20.0)
+        engine.add_staff(7, "Cleaner", 0.0)
+        engine.add_staff(8, "Cleaner", 5.0)
+        engine.remove_demand(1)
+        engine.remove_staff(7)
+        self.assertEqual(engine.match_all("Cleaner"), [(2, 8)])
+
+    def test_moved_staff_keep_their_place(self):
+        engine = AssignmentEngine()
+        engine.add_staff(7, "Cleaner", 0.0)
+        engine.add_staff(8, "Waiter", 5.0)
+        engine.move_staff(7, "Waiter")
+        engine.add_demand(1, "Waiter", 10.0)
+        engine.add_demand(2, "Waiter", 20.0)
+        engine.add_demand(3, "Cleaner", 30.0)
+        self.assertEqual(engine.match_all("Waiter"), [(1, 7), (2, 8)])
+        self.assertEqual(engine.match_all("Cleaner"), [])
+
+
+@override_settings(AUTO_ASSIGN=True)
+class EngineCleanupTests(TestCase):
+    """Deleting, shedding or re-roling things takes them out of a loaded engine straight away."""
+
+    def setUp(self):
+        cache.clear()
+        reset_assignment_engine()
+        self.user = User.objects.create_superuser(username="cleanup", password="x")
+        self.client.force_login(self.user)
+        self.cleaner = StaffRole.objects.create(name="Cleaner")
+
+    def tearDown(self):
+        reset_assignment_engine()
+
+    def demand(self, **fields):
+        return Demand.objects.create(
+            demand_type="Cleaning", description="Queued", room_or_table="Room 101", created_by=self.user, **fields
+        )
+
+    def test_admin_delete_removes_the_demand(self):
+        demand = self.demand()
+        engine = assignment_engine()
+        self.assertEqual(len(engine), 1)
+        self.client.post(f"/admin/hotel_queue/demand/{demand.id}/delete/", {"post": "yes"})
+        self.assertEqual(len(engine), 0)
+
+    def test_shed_demand_is_removed(self):
+        CapacityLimit.objects.create(demand_type="Cleaning", max_open=1, policy="shed")
+        shed = self.demand()
+        engine = assignment_engine()
+        self.client.post("/add/", {"demand_type": "Cleaning", "description": "Urgent", "room_or_table": "Room 101",
+                                   "expected_completion": "2000-01-01T00:00"})
+        self.assertFalse(Demand.objects.filter(id=shed.id).exists())
+        # Only the new demand is left queued
+        self.assertEqual(len(engine), 1)
+
+    def test_deleted_staff_member_is_removed(self):
+        member = StaffMember.objects.create(name="Ana", role=self.cleaner)
+        engine = assignment_engine()
+        member.delete()
+        engine.add_demand(999, "Cleaner", 0.0)
+        self.assertIsNone(engine.pop_match("Cleaner"))
+
+    def test_new_staff_member_takes_queued_work(self):
+        demand = self.demand()
+        assignment_engine()
+        member = StaffMember.objects.create(name="Ana", role=self.cleaner)
+        demand.refresh_from_db()
+        self.assertEqual(demand.assigned_to_id, member.id)
+
+    def test_role_change_moves_a_free_member(self):
+        member = StaffMember.objects.create(name="Ana", role=self.cleaner)
+        engine = assignment_engine()
+        member.role = StaffRole.objects.create(name="Waiter")
+        member.save()
+        engine.add_demand(1, "Cleaner", 0.0)
+        engine.add_demand(2, "Waiter", 0.0)
+        self.assertIsNone(engine.pop_match("Cleaner"))
+        self.assertEqual(engine.pop_match("Waiter")[1][1], member.id)
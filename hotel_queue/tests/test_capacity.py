@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_queue.dispatch import assign_demand, complete_demand
+from hotel_queue.models import CapacityLimit, Demand, StaffMember, StaffRole
+
+
+class ShedPolicyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shedder", is_staff=True)
+        self.client.force_login(self.user)
+        self.limit = CapacityLimit.objects.create(demand_type="Cleaning", max_open=1, policy="shed")
+
+    def add(self, minutes_until_due):
+        expected = timezone.localtime() + timedelta(minutes=minutes_until_due)
+        return self.client.post("/add/", {
+            "demand_type": "Cleaning", "description": "Towels", "room_or_table": "Room 101",
+            "expected_completion": expected.strftime("%Y-%m-%dT%H:%M"),
+        })
+
+    def test_nothing_less_urgent_to_shed_counts_as_rejected(self):
+        self.add(30)
+        response = self.add(120)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Demand.objects.count(), 1)
+        self.limit.refresh_from_db()
+        self.assertEqual((self.limit.shed_count, self.limit.rejected_count), (0, 1))
+
+    def test_less_urgent_demand_is_shed(self):
+        self.add(120)
+        self.add(30)
+        self.assertEqual(Demand.objects.count(), 1)
+        self.limit.refresh_from_db()
+        self.assertEqual((self.limit.shed_count, self.limit.rejected_count), (1, 0))
+
+
+@override_settings(AUTO_ASSIGN=False)
+class QueuePolicyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="queuer", is_staff=True)
+        self.client.force_login(self.user)
+        CapacityLimit.objects.create(demand_type="Cleaning", max_open=1, policy="queue")
+        self.member = StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+
+    def add(self, **fields):
+        self.client.post("/add/", {"demand_type": "Cleaning", "description": "Towels", "room_or_table": "Room 101", **fields})
+        return Demand.objects.latest("id")
+
+    def test_waiting_demand_keeps_its_assignee_busy(self):
+        first = self.add()
+        waiting = self.add(assigned_to=self.member.id)
+        self.assertEqual((waiting.status, waiting.assigned_to_id), ("Waiting", self.member.id))
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.open_demands, 1)
+        self.assertEqual(assign_demand(first.id, self.member.id), "staff_busy")
+
+        # Let in once the first demand is done, and still theirs
+        complete_demand(first, self.user)
+        waiting.refresh_from_db()
+        self.member.refresh_from_db()
+        self.assertEqual((waiting.status, self.member.open_demands), ("Pending", 1))
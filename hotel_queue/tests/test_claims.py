@@ -0,0 +1,137 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from hotel_queue.dispatch import claim_next_demand, start_demand
+from hotel_queue.models import Demand
+
+
+def pending_demands(user, count):
+    return Demand.objects.bulk_create(
+        Demand(demand_type="Cleaning", description=f"Claim {i}", room_or_table="Room 101", created_by=user)
+        for i in range(count)
+    )
+
+
+@override_settings(AUTO_ASSIGN=False)
+class ClaimTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.producer = User.objects.create_user(username="producer")
+        self.first = User.objects.create_user(username="first", is_staff=True)
+        self.second = User.objects.create_user(username="second", is_staff=True)
+
+    def test_only_one_start_wins(self):
+        demand = pending_demands(self.producer, 1)[0]
+        self.assertTrue(start_demand(demand.id, self.first))
+        self.assertFalse(start_demand(demand.id, self.second))
+        demand.refresh_from_db()
+        self.assertEqual((demand.status, demand.fulfilled_by), ("In Progress", self.first))
+
+    def test_claims_take_different_demands_until_none_are_left(self):
+        pending_demands(self.producer, 2)
+        claimed = [claim_next_demand(self.first), claim_next_demand(self.second)]
+        self.assertNotEqual(claimed[0].id, claimed[1].id)
+        self.assertIsNone(claim_next_demand(self.first))
+
+    def test_claim_endpoint(self):
+        demand = pending_demands(self.producer, 1)[0]
+        self.client.force_login(self.first)
+        response = self.client.post("/claim-next/", {"demand_type": "Cleaning"}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Demand.objects.get(id=demand.id).status, "In Progress")
+
+    def test_start_refusal_gives_the_real_reason(self):
+        demand = pending_demands(self.producer, 1)[0]
+        self.client.force_login(self.first)
+
+        def refusal():
+            response = self.client.get(f"/{demand.id}/in-progress/", HTTP_ACCEPT="application/json")
+            self.assertEqual(response.status_code, 409)
+            return response.json()["error"]
+
+        Demand.objects.filter(id=demand.id).update(status="Waiting")
+        self.assertIn("Waiting", refusal())
+        Demand.objects.filter(id=demand.id).update(status="Completed")
+        self.assertEqual(refusal(), "This task is already completed.")
+        Demand.objects.filter(id=demand.id).update(status="In Progress", fulfilled_by=self.second)
+        self.assertEqual(refusal(), "This task has already been started by someone else.")
+        Demand.objects.filter(id=demand.id).update(fulfilled_by=self.first)
+        self.assertEqual(refusal(), "This task is already In Progress.")
+
+
+@override_settings(AUTO_ASSIGN=False)
+class ConcurrentClaimTests(TransactionTestCase):
+    """Consumers on their own threads and connections never win the same demand twice."""
+
+    def test_every_demand_has_exactly_one_winner(self):
+        producer = User.objects.create_user(username="producer")
+        ids = [demand.id for demand in pending_demands(producer, 40)]
+        consumers = [User.objects.create_user(username=f"consumer-{i}", is_staff=True) for i in range(4)]
+        won = [[] for _ in consumers]
+        start = threading.Barrier(len(consumers))
+
+        def consume(index):
+            # Every consumer races for every demand, in the same order
+            start.wait()
+            try:
+                for demand_id in ids:
+                    while True:
+                        try:
+                            if start_demand(demand_id, consumers[index]):
+                                won[index].append(demand_id)
+                            break
+                        except OperationalError:
+                            # The write lock was busy and the update rolled back; try again
+                            continue
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=consume, args=(i,)) for i in range(len(consumers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(demand_id for ids_won in won for demand_id in ids_won), ids)
+        self.assertFalse(Demand.objects.filter(status="Pending").exists())
+        for index, consumer in enumerate(consumers):
+            self.assertEqual(sorted(Demand.objects.filter(fulfilled_by=consumer).values_list("id", flat=True)),
+                             sorted(won[index]))
+
+    def test_claimers_get_a_demand_while_any_are_pending(self):
+        # More claimers than the old bounded retry allowed for, all after the same rows
+        producer = User.objects.create_user(username="producer")
+        pending_demands(producer, 160)
+        consumers = [User.objects.create_user(username=f"claimer-{i}", is_staff=True) for i in range(16)]
+        claimed = [[] for _ in consumers]
+        missed = [0] * len(consumers)
+        start = threading.Barrier(len(consumers))
+
+        def consume(index):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        demand = claim_next_demand(consumers[index])
+                        if demand is None:
+                            missed[index] = Demand.objects.filter(status="Pending").count()
+                            return
+                    except OperationalError:
+                        # The write lock was busy and the claim rolled back; try again
+                        continue
+                    claimed[index].append(demand.id)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=consume, args=(i,)) for i in range(len(consumers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(missed, [0] * len(consumers))
+        all_claims = [demand_id for ids in claimed for demand_id in ids]
+        self.assertEqual(len(all_claims), 160)
+        self.assertEqual(len(set(all_claims)), 160)
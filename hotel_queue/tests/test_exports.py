@@ -0,0 +1,39 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
+
+from hotel_queue.exports import request_export
+from hotel_queue.models import ExportJob
+
+
+@override_settings(EXPORT_JOBS_IN_THREAD=False)
+class RequestExportTests(TransactionTestCase):
+    """Requests for the same export made at once share one job."""
+
+    def test_simultaneous_requests_queue_one_job(self):
+        user = User.objects.create_user(username="exporter", is_staff=True)
+        jobs = []
+        start = threading.Barrier(8)
+
+        def request():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        jobs.append(request_export(user, "csv").id)
+                        return
+                    except OperationalError:
+                        # The write lock was busy and the request rolled back; try again
+                        continue
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(ExportJob.objects.count(), 1)
+        self.assertEqual(set(jobs), {ExportJob.objects.get().id})
@@ -0,0 +1,15 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_queue.eventlog import iter_events, replay_queue_state
+from hotel_queue.generator import GeneratorConfig, generate_demands
+from hotel_queue.models import Demand
+
+
+class GeneratorEventTests(TestCase):
+    def test_generated_demands_replay_from_the_log(self):
+        config = GeneratorConfig(count=300, until=timezone.now(), open_fraction=0.2)
+        list(generate_demands(config, transaction_rows=100, batch_size=40))
+        replayed = {demand_id: state["status"] for demand_id, state in replay_queue_state(iter_events()).items()}
+        self.assertEqual(replayed, dict(Demand.objects.values_list("id", "status")))
+        self.assertEqual(len(replayed), 300)
@@ -0,0 +1,40 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from hotel_queue.models import Demand
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="ingester", is_staff=True)
+        self.client.force_login(self.user)
+
+    def ingest(self, items):
+        return self.client.post("/ingest/", json.dumps(items), content_type="application/json")
+
+    def test_non_string_fields_are_item_errors(self):
+        response = self.ingest([
+            {"demand_type": "Cleaning", "description": 5, "room_or_table": "Room 101"},
+            {"demand_type": ["Cleaning"], "description": "Towels", "room_or_table": "Room 101"},
+            {"demand_type": "Food", "food_item": {"name": "Tea"}, "room_or_table": 101},
+            {"demand_type": "Cleaning", "description": "Towels", "room_or_table": "Room 101"},
+        ])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["created"], 1)
+        self.assertEqual([error["index"] for error in body["errors"]], [0, 1, 2])
+        self.assertEqual(body["errors"][0]["errors"], {"description": "Enter a text value."})
+        self.assertEqual(body["errors"][1]["errors"]["demand_type"], "Enter a text value.")
+        self.assertEqual(body["errors"][2]["errors"]["food_item"], "Enter a text value.")
+        self.assertEqual(body["errors"][2]["errors"]["room_or_table"], "Enter a text value.")
+        self.assertEqual(Demand.objects.get().description, "Towels")
+
+    def test_only_bad_items_is_a_400(self):
+        response = self.ingest([{"demand_type": "Cleaning", "description": True, "room_or_table": "Room 101"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["errors"], {"description": "Enter a text value."})
+        self.assertFalse(Demand.objects.exists())
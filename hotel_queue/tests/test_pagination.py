@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_queue.archive import completed_sources
+from hotel_queue.models import Demand, DemandArchive
+from hotel_queue.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="pager")
+        cls.now = timezone.now().replace(microsecond=0)
+
+    def completed(self, minutes_ago, **fields):
+        completed_at = None if minutes_ago is None else self.now - timedelta(minutes=minutes_ago)
+        return Demand.objects.create(
+            demand_type="Cleaning", description="Paged", room_or_table="Room 101", created_by=self.user,
+            status="Completed", completed_at=completed_at, **fields,
+        )
+
+    def archived(self, pk, minutes_ago):
+        return DemandArchive.objects.create(
+            id=pk, demand_type="Food", description="Archived", status="Completed", created_at=self.now,
+            completed_at=None if minutes_ago is None else self.now - timedelta(minutes=minutes_ago),
+            created_by_id=self.user.id,
+        )
+
+    def all_pages(self, sources, field, page_size, **kwargs):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page, cursor = keyset_page(sources, field, cursor, page_size=page_size, **kwargs)
+            self.assertLessEqual(len(page), page_size)
+            rows.extend(page)
+            pages += 1
+            if cursor is None:
+                return rows, pages
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(self.now, 42)), (self.now, 42))
+        self.assertEqual(decode_cursor(encode_cursor(None, 42)), (None, 42))
+        self.assertIsNone(decode_cursor("not a cursor"))
+        self.assertIsNone(decode_cursor(""))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        # Ties on completed_at page by id, so a boundary inside a tie neither repeats nor skips a row
+        live = [self.completed(minutes) for minutes in [1, 2, 2, 2, 3, 5, 8]]
+        archived = [self.archived(1000 + i, minutes) for i, minutes in enumerate([2, 4, 6])]
+        rows, pages = self.all_pages(completed_sources(), "completed_at", page_size=3)
+        self.assertEqual(pages, 4)
+        self.assertEqual(sorted(row.id for row in rows), sorted(row.id for row in live + archived))
+        keys = [(row.completed_at, row.id) for row in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_exact_multiple_of_page_size_has_no_empty_last_page(self):
+        for minutes in range(6):
+            self.completed(minutes)
+        page, cursor = keyset_page(completed_sources(), "completed_at", page_size=3)
+        page, cursor = keyset_page(completed_sources(), "completed_at", cursor, page_size=3)
+        self.assertEqual(len(page), 3)
+        self.assertIsNone(cursor)
+
+    def test_null_completed_at_is_paged_last(self):
+        dated = [self.completed(minutes) for minutes in [1, 2, 3]]
+        undated = [self.completed(None) for _ in range(3)] + [self.archived(1000, None)]
+        rows, pages = self.all_pages(completed_sources(), "completed_at", page_size=2)
+        self.assertEqual([row.id for row in rows[:3]], [row.id for row in dated])
+        self.assertEqual([row.id for row in rows[3:]], sorted((row.id for row in undated), reverse=True))
+        self.assertEqual(pages, 4)
+
+    def test_cursor_on_a_null_row_round_trips(self):
+        self.completed(1)
+        undated = [self.completed(None) for _ in range(3)]
+        page, cursor = keyset_page(completed_sources(), "completed_at", page_size=2)
+        self.assertEqual(decode_cursor(cursor), (None, page[-1].id))
+        page, cursor = keyset_page(completed_sources(), "completed_at", cursor, page_size=2)
+        self.assertEqual([row.id for row in page], [undated[1].id, undated[0].id])
+        self.assertIsNone(cursor)
+
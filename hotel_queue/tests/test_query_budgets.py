@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel_queue.archive import archive_completed
+from hotel_queue.dispatch import refresh_open_demands, reset_assignment_engine
+from hotel_queue.models import Demand, HotelSettings, StaffMember, StaffRole
+
+
+# Exact queries per request, including the session and user lookups and, for
+# writes, the savepoints the test transaction turns atomic blocks into. The
+# first write of a round also loads the assignment engine.
+READ_QUERIES = [
+    ("dashboard", None, 3),
+    ("completed_list", None, 6),
+    ("export_completed", None, 6),
+    ("demand_changes", {"cursor": "1-0"}, 5),
+    ("stats_page", None, 3),
+    ("settings_page", None, 6),
+]
+
+
+class QueryBudgetTests(TestCase):
+    """Request query counts stay the same as the number of demands grows."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="budget", is_staff=True)
+        HotelSettings.objects.create(id=1, num_tables=10, num_rooms=10)
+        role = StaffRole.objects.create(name="Cleaner")
+        self.staff = StaffMember.objects.bulk_create(StaffMember(name=f"Cleaner {i}", role=role) for i in range(5))
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        reset_assignment_engine()
+
+    def seed(self, per_status):
+        now = timezone.now()
+        Demand.objects.bulk_create(
+            Demand(
+                demand_type="Cleaning", description=f"{status} {i}", status=status, room_or_table="Room 101",
+                created_by=self.admin, assigned_to=self.staff[i % len(self.staff)],
+                completed_at=(now - timedelta(days=2) if i % 2 else now) if status == "Completed" else None,
+            )
+            for status in ["Pending", "In Progress", "Completed"]
+            for i in range(per_status)
+        )
+        refresh_open_demands()
+        # Half of the completed demands go to the archive so both tables are read
+        list(archive_completed(now - timedelta(days=1)))
+        # Start each round from the same warm cache and an unloaded assignment engine
+        cache.clear()
+        reset_assignment_engine()
+        self.client.get(reverse("dashboard"))
+
+    def check_round(self):
+        for name, data, queries in READ_QUERIES:
+            with self.subTest(name), self.assertNumQueries(queries):
+                response = self.client.get(reverse(name), data)
+                if hasattr(response, "streaming_content"):
+                    b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, 200)
+        pending = list(Demand.objects.filter(status="Pending").values_list("id", flat=True)[:5])
+        writes = [
+            ("add_demand", {"demand_type": "Cleaning", "description": "Budget", "room_or_table": "Room 101"}, 11),
+            ("claim_next", {"demand_type": "Cleaning"}, 11),
+            ("bulk_update_status", {"action": "start", "demand_ids": pending}, 9),
+        ]
+        for name, data, queries in writes:
+            with self.subTest(name), self.assertNumQueries(queries):
+                response = self.client.post(reverse(name), data)
+            self.assertEqual(response.status_code, 302)
+
+    def test_counts_do_not_grow_with_rows(self):
+        for per_status in [5, 60]:
+            Demand.objects.all().delete()
+            with self.subTest(per_status=per_status):
+                self.seed(per_status)
+                self.check_round()
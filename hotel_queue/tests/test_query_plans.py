@@ -0,0 +1,21 @@
+from django.test import TestCase
+
+from hotel_queue.management.commands.check_query_plans import BAD_PLAN_LINES, hot_queries
+from hotel_queue.models import Demand
+
+
+def bad_lines(queryset):
+    return [line for line in queryset.explain().splitlines() if any(pattern.search(line) for pattern in BAD_PLAN_LINES)]
+
+
+class QueryPlanTests(TestCase):
+    """The hot queue queries are served from indexes, without scanning or sorting the demand tables."""
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(bad_lines(queryset), [])
+
+    def test_unindexed_query_is_caught(self):
+        self.assertTrue(bad_lines(Demand.objects.filter(description="Towels")))
+        self.assertTrue(bad_lines(Demand.objects.order_by("description")))
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hotel_queue.dispatch import build_assignment_engine, claim_next_demand, reset_assignment_engine
+from hotel_queue.models import Demand, StaffMember, StaffRole
+
+
+@override_settings(AUTO_ASSIGN=False)
+class QueueOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_assignment_engine()
+        self.user = User.objects.create_user(username="claimer", is_staff=True)
+        now = timezone.now()
+        # Oldest first: no deadline; then a far deadline; then the nearest deadline
+        self.oldest = self.pending(now - timedelta(minutes=50), None)
+        self.far = self.pending(now - timedelta(minutes=40), now + timedelta(hours=3))
+        self.urgent = self.pending(now - timedelta(minutes=30), now + timedelta(minutes=5))
+
+    def pending(self, created_at, expected_completion):
+        demand = Demand.objects.create(
+            demand_type="Cleaning", description="Ordered", room_or_table="Room 101", created_by=self.user,
+            expected_completion=expected_completion,
+        )
+        # created_at is auto_now_add, so back-date it (and the due_at derived from it) afterwards
+        demand.created_at = created_at
+        demand.set_due_at()
+        Demand.objects.filter(id=demand.id).update(created_at=demand.created_at, due_at=demand.due_at)
+        return demand
+
+    def claims(self):
+        return [claim_next_demand(self.user).id for _ in range(3)]
+
+    def engine_order(self):
+        # One free cleaner, put back after each match, takes every queued demand in turn
+        engine = build_assignment_engine()
+        order = []
+        while True:
+            match = engine.pop_match("Cleaner")
+            if match is None:
+                return order
+            demand, staff = match
+            order.append(demand[2])
+            engine.restore_staff(staff)
+
+    def test_fifo_is_the_default_and_claims_the_oldest(self):
+        self.assertEqual(self.claims(), [self.oldest.id, self.far.id, self.urgent.id])
+
+    def test_fifo_assigns_by_expected_completion_then_age(self):
+        StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+        self.assertEqual(self.engine_order(), [self.urgent.id, self.far.id, self.oldest.id])
+
+    @override_settings(QUEUE_ORDER="deadline")
+    def test_deadline_claims_and_assigns_the_soonest_due(self):
+        # The demand without a deadline is due 60 minutes after it arrived, i.e. in 10 minutes
+        StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+        self.assertEqual(self.engine_order(), [self.urgent.id, self.oldest.id, self.far.id])
+        self.assertEqual(self.claims(), [self.urgent.id, self.oldest.id, self.far.id])
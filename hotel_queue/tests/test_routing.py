@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase
+from django.utils import timezone
+
+from hotel_queue.models import Demand
+from hotel_queue.routers import ReportingRouter, reporting_reads
+
+
+class ReportingUnderTestRunnerTests(TestCase):
+    """The reporting alias mirrors the in-memory test database, so report views read from default."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reporter", is_staff=True)
+        self.client.force_login(self.user)
+        for completed_at in [timezone.now(), None]:
+            Demand.objects.create(
+                demand_type="Cleaning", description="Reported", room_or_table="Room 101", created_by=self.user,
+                status="Completed", completed_at=completed_at,
+            )
+
+    def test_router_falls_back_to_default(self):
+        router = ReportingRouter()
+        with reporting_reads():
+            self.assertIsNone(router.db_for_read(Demand))
+            self.assertEqual(router.db_for_write(Demand), DEFAULT_DB_ALIAS)
+
+    def test_csv_export(self):
+        response = self.client.get("/completed/export/", {"format": "csv"})
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Reported", lines[1])
+
+    def test_excel_export(self):
+        response = self.client.get("/completed/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"PK"))
+
+    def test_completed_list_and_stats(self):
+        response = self.client.get("/completed/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["demands"]), 2)
+        self.assertEqual(self.client.get("/stats/").status_code, 200)
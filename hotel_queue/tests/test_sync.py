@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from hotel_queue.dispatch import refresh_open_demands
+from hotel_queue.models import Demand, StaffMember, StaffRole
+from hotel_queue.sync import changes_since, decode_sync_cursor
+
+
+class StaffChangeSyncTests(TestCase):
+    """Renaming or deleting a staff member resends the demands assigned to them."""
+
+    def setUp(self):
+        user = User.objects.create_user(username="syncer")
+        self.member = StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+        self.assigned = Demand.objects.create(
+            demand_type="Cleaning", description="Assigned", room_or_table="Room 101", created_by=user,
+            assigned_to=self.member,
+        )
+        self.other = Demand.objects.create(
+            demand_type="Cleaning", description="Unassigned", room_or_table="Room 102", created_by=user,
+        )
+        self.cursor = changes_since(0, 0)["cursor"]
+
+    def changes(self):
+        return changes_since(*decode_sync_cursor(self.cursor))["changes"]
+
+    def test_rename_resends_assigned_demands(self):
+        self.member.name = "Ana B."
+        self.member.save()
+        changes = self.changes()
+        self.assertEqual([row["id"] for row in changes], [self.assigned.id])
+        self.assertEqual(changes[0]["assigned_to_name"], "Ana B.")
+
+    def test_delete_resends_assigned_demands(self):
+        self.member.delete()
+        changes = self.changes()
+        self.assertEqual([row["id"] for row in changes], [self.assigned.id])
+        self.assertIsNone(changes[0]["assigned_to_id"])
+
+    def test_saving_other_fields_resends_nothing(self):
+        self.member.open_demands = 1
+        self.member.save(update_fields=["open_demands"])
+        self.assertEqual(self.changes(), [])
+
+
+class UserDeleteSyncTests(TestCase):
+    def test_deleting_a_user_tombstones_their_demands(self):
+        keeper = User.objects.create_user(username="keeper")
+        leaver = User.objects.create_user(username="leaver")
+        member = StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+        gone = Demand.objects.create(
+            demand_type="Cleaning", description="Gone", room_or_table="Room 101", created_by=leaver, assigned_to=member,
+        )
+        kept = Demand.objects.create(
+            demand_type="Cleaning", description="Kept", room_or_table="Room 102", created_by=keeper,
+        )
+        refresh_open_demands([member.id])
+        cursor = changes_since(0, 0)["cursor"]
+
+        leaver.delete()
+        changes = changes_since(*decode_sync_cursor(cursor))
+        self.assertEqual(changes["removed"], [gone.id])
+        self.assertEqual(changes["changes"], [])
+        self.assertTrue(Demand.objects.filter(id=kept.id).exists())
+        member.refresh_from_db()
+        self.assertEqual(member.open_demands, 0)
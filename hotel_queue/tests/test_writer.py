@@ -0,0 +1,46 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from hotel_queue.dispatch import bulk_transition, reset_assignment_engine
+from hotel_queue.models import Demand, StaffMember, StaffRole
+from hotel_queue.writer import batch_writer, stop_batch_writer
+
+
+@override_settings(COALESCE_WRITES=True, AUTO_ASSIGN=True)
+class BatchWriterPathTests(TransactionTestCase):
+    """With COALESCE_WRITES, bulk transitions, ingestion and auto-assignment run on the writer thread.
+
+    A TransactionTestCase, because inside a TestCase's transaction run_write
+    always writes inline.
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_assignment_engine()
+        self.user = User.objects.create_user(username="batcher", is_staff=True)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        stop_batch_writer()
+        reset_assignment_engine()
+
+    def test_ingest_assignment_and_bulk_complete_go_through_the_writer(self):
+        StaffMember.objects.create(name="Ana", role=StaffRole.objects.create(name="Cleaner"))
+        writer = batch_writer()
+        items = [{"demand_type": "Cleaning", "description": f"Batch {i}", "room_or_table": "Room 101"} for i in range(3)]
+        response = self.client.post("/ingest/", json.dumps(items), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        # The ingest itself, then assigning the first demand to the free cleaner
+        self.assertEqual(writer.operations, 2)
+        self.assertEqual(Demand.objects.filter(assigned_to__isnull=False).count(), 1)
+
+        ids = list(Demand.objects.values_list("id", flat=True))
+        self.assertEqual(bulk_transition(ids, "complete", self.user), 3)
+        # The bulk update, then the freed cleaner is matched with the two demands the
+        # engine still held, which the writer finds already taken
+        self.assertEqual(writer.operations, 5)
+        self.assertEqual(Demand.objects.filter(status="Completed").count(), 3)
+        self.assertEqual(Demand.objects.filter(assigned_to__isnull=False).count(), 1)
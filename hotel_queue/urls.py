@@ -5,12 +5,22 @@ from . import views
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("events/", views.demand_events, name="demand_events"),
+    path("changes/", views.demand_changes, name="demand_changes"),
     path("add/", views.add_demand, name="add_demand"),
+    path("ingest/", views.ingest_demands_view, name="ingest_demands"),
+    path("claim-next/", views.claim_next, name="claim_next"),
+    path("bulk-status/", views.bulk_update_status, name="bulk_update_status"),
     path("<int:pk>/in-progress/", views.mark_in_progress, name="mark_in_progress"),
     path("<int:pk>/complete/", views.mark_completed, name="mark_completed"),
     path("completed/", views.completed_list, name="completed_list"),
     path("completed/export/", views.export_completed_to_excel, name="export_completed"),
+    path("completed/export/start/", views.start_export, name="start_export"),
+    path("completed/export/<int:pk>/status/", views.export_status, name="export_status"),
+    path("completed/export/<int:pk>/download/", views.download_export, name="download_export"),
     path("completed/clear/", views.clear_completed_tasks, name="clear_completed"),
+    path("stats/", views.stats_page, name="stats_page"),
+    path("metrics/", views.metrics, name="metrics"),
     path("settings/", views.settings_page, name="settings_page"),
     # Authentication routes
     path("login/", auth_views.LoginView.as_view(template_name="auth/login.html", redirect_authenticated_user=True), name="login"),
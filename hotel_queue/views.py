@@ -1,30 +1,131 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
-from django.http import HttpResponse
+from django.urls import reverse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.utils import timezone
 from datetime import datetime
+import hmac
+import os
+import tempfile
+
+from .archive import clear_completed, completed_sources
+from .caching import location_choices, staff as cached_staff
+from .capacity import QUEUED, REJECTED, RETRY_AFTER_SECONDS, SHED, buffer_name, full_message
+from .dispatch import (
+    TRANSITIONS, bulk_transition, claim_next_demand, complete_demand, create_demand, demands_created,
+    demands_removed, refresh_open_demands, release_waiting_demands, start_demand,
+)
+from .events import event_stream, publish_demands, row_html
+from .exports import export_path, request_export, stream_completed_csv, write_completed_workbook
+from .forms import DemandFilterForm, DemandForm
+from .ingest import IngestError, ingest_demands, parse_ingest_body
+from .metrics import registry
+from .models import CapacityLimit, Demand, ExportJob, HotelSettings, StaffRole, StaffMember
+from .pagination import keyset_page
+from .rollups import rollups_since, summarize
+from .routers import reporting_view
+from .sync import changes_since, decode_sync_cursor
+
+
+def paged_context(request, sources, field, id_descending=True, descending=True, date_field=None):
+    """Filter ``sources`` by the GET filters and return one keyset page plus its links.
+
+    The date filters apply to ``date_field``, by default the ordering ``field``.
+    """
+    filter_form = DemandFilterForm(request.GET or None)
+    sources = [filter_form.apply(queryset, date_field or field) for queryset in sources]
+    demands, next_cursor = keyset_page(sources, field, request.GET.get("cursor"),
+                                       id_descending=id_descending, descending=descending)
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    first_query = query.urlencode()
+    next_query = None
+    if next_cursor:
+        query["cursor"] = next_cursor
+        next_query = query.urlencode()
+    return {
+        "demands": demands,
+        "filter_form": filter_form,
+        "is_first_page": "cursor" not in request.GET,
+        "is_filtered": any(request.GET.get(name) for name in filter_form.fields),
+        "first_query": first_query,
+        "next_query": next_query,
+    }
+
+
+# Dashboard orderings: newest first, or earliest due first (see Demand.due_at)
+DASHBOARD_ORDERS = {"newest": "Newest first", "deadline": "Due first"}
+
+
+def order_links(request, current):
+    """Links switching the dashboard ordering, keeping the filters but starting from the first page."""
+    links = []
+    for order, label in DASHBOARD_ORDERS.items():
+        query = request.GET.copy()
+        query.pop("cursor", None)
+        query["order"] = order
+        links.append({"label": label, "query": query.urlencode(), "active": order == current})
+    return links
+
+
+def dashboard_context(request, form):
+    # Only show pending and in-progress demands in the dashboard, newest first
+    # or due soonest first. Ties go by ascending id to follow
+    # demand_open_created_idx / demand_open_due_idx.
+    open_demands = Demand.objects.exclude(status="Completed").select_related("assigned_to")
+    order = request.GET.get("order")
+    if order not in DASHBOARD_ORDERS:
+        order = "newest"
+    if order == "deadline":
+        context = paged_context(request, [open_demands], "due_at", id_descending=False, descending=False,
+                                date_field="created_at")
+        context.update({"first_label": "Most urgent", "next_label": "Later"})
+    else:
+        context = paged_context(request, [open_demands], "created_at", id_descending=False)
+    context.update({
+        "form": form, "demand_types": Demand.DEMAND_TYPES,
+        "order": order, "order_links": order_links(request, order),
+    })
+    return context
 
-from .forms import DemandForm
-from .models import Demand, HotelSettings, StaffRole, StaffMember
+
+def wants_json(request):
+    return "application/json" in request.headers.get("Accept", "")
+
+
+def demand_row_payload(pk):
+    """JSON for a status action: the row's new markup, or that it left the dashboard."""
+    demand = Demand.objects.select_related("assigned_to").get(pk=pk)
+    if demand.status == "Completed":
+        return {"id": demand.pk, "removed": True}
+    return {"id": demand.pk, "html": row_html(demand, True)}
 
 
 @login_required
 def dashboard(request):
-    # Only show pending and in-progress demands in the dashboard
-    demands = Demand.objects.exclude(status="Completed")
-    form = DemandForm()
-    settings_obj = HotelSettings.objects.first()
-    return render(
-        request,
-        "hotel_queue/dashboard.html",
-        {"demands": demands, "form": form, "settings": settings_obj},
-    )
+    context = dashboard_context(request, DemandForm())
+    return render(request, "hotel_queue/dashboard.html", context)
+
+
+async def demand_events(request):
+    """Server-Sent Events stream of demand changes, read by the dashboard to patch rows in place."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would tie up a worker for good; 204 tells
+        # EventSource not to reconnect, and the page works as before
+        return HttpResponse(status=204)
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=403)
+    response = StreamingHttpResponse(event_stream(user.is_staff), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @login_required
@@ -37,18 +138,131 @@ def add_demand(request):
         if form.is_valid():
             demand = form.save(commit=False)
             demand.created_by = request.user
-            demand.save()
-            messages.success(request, "Demand added.")
+            outcome, limit, shed_id = create_demand(demand, request.user)
+            if outcome == REJECTED:
+                messages.error(request, full_message(limit))
+                response = render(request, "hotel_queue/dashboard.html", dashboard_context(request, form), status=429)
+                response["Retry-After"] = str(RETRY_AFTER_SECONDS)
+                return response
+            refresh_open_demands([demand.assigned_to_id])
+            publish_demands([demand.pk, shed_id] if shed_id else [demand.pk])
+            if shed_id:
+                demands_removed([shed_id])
+            demands_created([demand])
+            if outcome == QUEUED:
+                messages.info(request, f"{buffer_name(limit)} is at capacity, so the demand is Waiting until there is room.")
+            else:
+                messages.success(request, "Demand added.")
+            if outcome == SHED:
+                messages.info(request, f"Demand #{shed_id} was shed to make room: it was the least urgent one waiting.")
             return redirect("dashboard")
         # Re-render dashboard with errors, only showing pending and in-progress demands
-        demands = Demand.objects.exclude(status="Completed")
         messages.error(request, "Please correct the errors below.")
         # We no longer need to set different choices based on demand type
         # as we now use a combined dropdown for all locations
-        return render(request, "hotel_queue/dashboard.html", {"demands": demands, "form": form})
+        return render(request, "hotel_queue/dashboard.html", dashboard_context(request, form))
     return redirect("dashboard")
 
 
+@login_required
+def ingest_demands_view(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Only staff can add demands."}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required."}, status=405)
+    try:
+        items = parse_ingest_body(request.body, request.content_type or "")
+    except IngestError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    created, errors = ingest_demands(items, request.user)
+    publish_demands(demand.id for demand in created)
+    # Nothing created and only full buffers to blame: tell the client to back off
+    full = bool(errors) and all("capacity" in error["errors"] for error in errors)
+    status = 201 if created else 429 if full else 400
+    response = JsonResponse({
+        "created": len(created),
+        "ids": [demand.id for demand in created],
+        "waiting": [demand.id for demand in created if demand.status == "Waiting"],
+        "errors": errors,
+    }, status=status)
+    if status == 429:
+        response["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
+@login_required
+def demand_changes(request):
+    """Delta sync: demands created, changed or removed since the client's cursor.
+
+    Start without a cursor to get every live demand, then pass back the
+    returned cursor each poll (and again at once while has_more is true).
+    On {"reset": true} drop local state and start over without a cursor.
+    """
+    position = decode_sync_cursor(request.GET.get("cursor"))
+    if position is None:
+        return JsonResponse({"error": "Invalid cursor."}, status=400)
+    return JsonResponse(changes_since(*position))
+
+
+# Windows offered on the stats page, in hours
+STATS_WINDOWS = [(1, "Last hour"), (24, "Last 24 hours"), (168, "Last 7 days")]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def stats_rows(summary, label):
+    rows = []
+    for group in summary:
+        row = {"label": label(group["key"]), "count": group["count"]}
+        for name in ["wait_mean", "wait_p50", "wait_p95", "service_mean", "service_p50", "service_p95"]:
+            row[name] = format_duration(group[name])
+        rows.append(row)
+    return rows
+
+
+@login_required
+@reporting_view
+def stats_page(request):
+    if not request.user.is_staff:
+        messages.error(request, "Stats are for staff only.")
+        return redirect("dashboard")
+    # SLA figures come from the hourly rollups, never from the demand history
+    hours = request.GET.get("hours", "24")
+    hours = int(hours) if hours in {str(value) for value, _ in STATS_WINDOWS} else 24
+    rollups = rollups_since(hours)
+    members = cached_staff()["members"]
+
+    def staff_label(staff_id):
+        member = members.get(staff_id)
+        return member.name if member else ("Unassigned" if not staff_id else f"Staff #{staff_id}")
+
+    context = {
+        "windows": STATS_WINDOWS,
+        "hours": hours,
+        "sections": [
+            ("By task type", stats_rows(summarize(rollups, lambda rollup: rollup.demand_type), str)),
+            ("By staff member", stats_rows(summarize(rollups, lambda rollup: rollup.staff_id), staff_label)),
+            ("By hour", stats_rows(summarize(rollups, lambda rollup: rollup.hour), lambda hour: timezone.localtime(hour).strftime("%b %d, %H:00"))),
+        ],
+    }
+    return render(request, "hotel_queue/stats.html", context)
+
+
+def metrics(request):
+    # Prometheus scrapes with "Authorization: Bearer <METRICS_TOKEN>"; staff can also look while logged in
+    token = settings.METRICS_TOKEN
+    scraper = bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not scraper and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @login_required
 def settings_page(request):
     if not request.user.is_staff:
@@ -96,10 +310,60 @@ def settings_page(request):
             if staff_id:
                 StaffMember.objects.filter(id=staff_id).delete()
                 messages.success(request, "Staff deleted.")
+        elif action == "set_limit":
+            demand_type = request.POST.get("limit_demand_type") or ""
+            room_or_table = request.POST.get("limit_room_or_table") or ""
+            policy = request.POST.get("limit_policy")
+            try:
+                max_open = int(request.POST.get("limit_max_open", ""))
+            except ValueError:
+                max_open = -1
+            valid = (
+                (not demand_type or demand_type in dict(Demand.DEMAND_TYPES))
+                and (not room_or_table or room_or_table in dict(location_choices()))
+                and policy in dict(CapacityLimit.POLICY_CHOICES)
+                and max_open >= 0
+            )
+            if valid:
+                CapacityLimit.objects.update_or_create(
+                    demand_type=demand_type, room_or_table=room_or_table,
+                    defaults={"max_open": max_open, "policy": policy},
+                )
+                release_waiting_demands(request.user)
+                messages.success(request, "Capacity limit saved.")
+            else:
+                messages.error(request, "Capacity limit needs a valid type, location, policy and a limit of 0 or more.")
+        elif action == "delete_limit":
+            limit_id = request.POST.get("limit_id")
+            if limit_id:
+                CapacityLimit.objects.filter(id=limit_id).delete()
+                release_waiting_demands(request.user)
+                messages.success(request, "Capacity limit deleted.")
         return redirect("settings_page")
     roles = StaffRole.objects.all()
     staff = StaffMember.objects.select_related("role").all()
-    return render(request, "hotel_queue/settings.html", {"settings": settings_obj, "roles": roles, "staff": staff})
+    return render(request, "hotel_queue/settings.html", {
+        "settings": settings_obj, "roles": roles, "staff": staff,
+        "limits": CapacityLimit.objects.order_by("demand_type", "room_or_table"),
+        "demand_types": Demand.DEMAND_TYPES,
+        "locations": location_choices(),
+        "policies": CapacityLimit.POLICY_CHOICES,
+    })
+
+
+def unchanged_reason(pk, user):
+    """Why starting or completing demand ``pk`` changed nothing, from its status now."""
+    current = Demand.objects.filter(pk=pk).values_list("status", "fulfilled_by_id").first()
+    if current is None:
+        return "This task no longer exists."
+    status, fulfilled_by_id = current
+    if status == "Waiting":
+        return "This task is Waiting for room in its queue and cannot be worked on yet."
+    if status == "Completed":
+        return "This task is already completed."
+    if status == "In Progress" and fulfilled_by_id != user.id:
+        return "This task has already been started by someone else."
+    return "This task is already In Progress."
 
 
 @login_required
@@ -108,104 +372,174 @@ def mark_in_progress(request, pk):
         messages.error(request, "Only staff can update demand status.")
         return redirect("dashboard")
     demand = get_object_or_404(Demand, pk=pk)
-    demand.status = "In Progress"
-    demand.fulfilled_by = request.user
-    demand.save(update_fields=["status", "fulfilled_by"])
+    if not start_demand(demand.pk, request.user):
+        reason = unchanged_reason(demand.pk, request.user)
+        if wants_json(request):
+            return JsonResponse({"error": reason}, status=409)
+        messages.error(request, reason)
+        return redirect("dashboard")
+    publish_demands([demand.pk])
+    if wants_json(request):
+        return JsonResponse(demand_row_payload(demand.pk))
     messages.info(request, "Marked as In Progress.")
     return redirect("dashboard")
 
 
+@login_required
+def claim_next(request):
+    if not request.user.is_staff:
+        messages.error(request, "Only staff can update demand status.")
+        return redirect("dashboard")
+    if request.method != "POST":
+        return redirect("dashboard")
+    demand = claim_next_demand(
+        request.user,
+        demand_type=request.POST.get("demand_type") or None,
+        role=request.POST.get("role") or None,
+    )
+    if demand is None:
+        if wants_json(request):
+            return JsonResponse({"demand": None}, status=404)
+        messages.info(request, "No pending tasks to claim.")
+        return redirect("dashboard")
+    publish_demands([demand.id])
+    if wants_json(request):
+        return JsonResponse({"demand": {
+            "id": demand.id,
+            "demand_type": demand.demand_type,
+            "description": demand.description,
+            "status": demand.status,
+            "room_or_table": demand.room_or_table,
+            "assigned_to": demand.assigned_to.name if demand.assigned_to else None,
+            "created_at": demand.created_at.isoformat(),
+        }})
+    messages.info(request, f"Claimed: {demand.demand_type} - {demand.description}")
+    return redirect("dashboard")
+
+
 @login_required
 def mark_completed(request, pk):
     if not request.user.is_staff:
         messages.error(request, "Only staff can update demand status.")
         return redirect("dashboard")
     demand = get_object_or_404(Demand, pk=pk)
-    demand.status = "Completed"
-    demand.fulfilled_by = request.user
-    demand.completed_at = timezone.now()
-    demand.save(update_fields=["status", "fulfilled_by", "completed_at"])
+    if not complete_demand(demand, request.user):
+        reason = unchanged_reason(demand.pk, request.user)
+        if wants_json(request):
+            return JsonResponse({"error": reason}, status=409)
+        messages.info(request, reason)
+        return redirect("dashboard")
+    publish_demands([demand.pk])
+    if wants_json(request):
+        return JsonResponse({"id": demand.pk, "removed": True})
     messages.success(request, "Marked as Completed.")
     return redirect("dashboard")
 
 
 @login_required
+def bulk_update_status(request):
+    if not request.user.is_staff:
+        messages.error(request, "Only staff can update demand status.")
+        return redirect("dashboard")
+    if request.method != "POST":
+        return redirect("dashboard")
+    action = request.POST.get("action")
+    if action not in TRANSITIONS:
+        messages.error(request, "Unknown action.")
+        return redirect("dashboard")
+    demand_ids = {int(pk) for pk in request.POST.getlist("demand_ids") if pk.isdigit()}
+    if not demand_ids:
+        messages.error(request, "Select at least one task.")
+        return redirect("dashboard")
+    changed = bulk_transition(demand_ids, action, request.user)
+    if changed:
+        publish_demands(demand_ids)
+    skipped = len(demand_ids) - changed
+    label = TRANSITIONS[action][1]
+    messages.success(request, f"Marked {changed} task{'s' if changed != 1 else ''} as {label}.")
+    if skipped:
+        messages.info(request, f"{skipped} selected task{'s were' if skipped != 1 else ' was'} already past that step and left unchanged.")
+    return redirect("dashboard")
+
+
+@login_required
+@reporting_view
 def completed_list(request):
-    demands = Demand.objects.filter(status="Completed").order_by("-completed_at")
-    return render(request, "hotel_queue/completed.html", {"demands": demands})
+    # Live and archived completed demands, newest first, one keyset page at a time
+    context = paged_context(request, completed_sources(), "completed_at")
+    return render(request, "hotel_queue/completed.html", context)
 
 
 @login_required
+@reporting_view
 def export_completed_to_excel(request):
     if not request.user.is_staff:
         messages.error(request, "Only staff can export data.")
         return redirect("completed_list")
     
-    # Get completed demands
-    demands = Demand.objects.filter(status="Completed").order_by("-completed_at")
-    
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Completed Tasks"
-    
-    # Define headers
-    headers = [
-        "ID", "Type", "Description", "Location", "Created At", 
-        "Completed At", "Time Taken", "Created By", "Fulfilled By"
-    ]
+    # Get completed demands, live and archived
+    sources = completed_sources()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Style for headers
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
+    # CSV is streamed row by row so the first bytes go out straight away
+    if request.GET.get("format") == "csv":
+        response = StreamingHttpResponse(stream_completed_csv(sources), content_type="text/csv")
+        response['Content-Disposition'] = f'attachment; filename="completed_tasks_{timestamp}.csv"'
+        return response
     
-    # Add headers
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Add data
-    for row, demand in enumerate(demands, 2):
-        time_taken = ""
-        if demand.completed_at:
-            time_taken = str(demand.completed_at - demand.created_at).split('.')[0]
-        
-        ws.cell(row=row, column=1, value=demand.id)
-        ws.cell(row=row, column=2, value=demand.demand_type)
-        ws.cell(row=row, column=3, value=demand.description)
-        ws.cell(row=row, column=4, value=demand.room_or_table or "-")
-        ws.cell(row=row, column=5, value=demand.created_at.strftime("%Y-%m-%d %H:%M"))
-        ws.cell(row=row, column=6, value=demand.completed_at.strftime("%Y-%m-%d %H:%M") if demand.completed_at else "-")
-        ws.cell(row=row, column=7, value=time_taken)
-        ws.cell(row=row, column=8, value=demand.created_by.username)
-        ws.cell(row=row, column=9, value=demand.fulfilled_by.username if demand.fulfilled_by else "-")
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # Excel is written by a write-only workbook to a temporary file and sent in chunks
+    tmp = tempfile.TemporaryFile()
+    write_completed_workbook(sources, tmp)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=f"completed_tasks_{timestamp}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    filename = f"completed_tasks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Save workbook to response
-    wb.save(response)
-    return response
+
+
+@login_required
+def start_export(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Only staff can export data."}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required."}, status=405)
+    file_format = request.POST.get("format", "xlsx")
+    if file_format not in dict(ExportJob.FORMAT_CHOICES):
+        return JsonResponse({"error": "Unknown export format."}, status=400)
+    job = request_export(request.user, file_format)
+    return JsonResponse(export_job_payload(job))
+
+
+@login_required
+def export_status(request, pk):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Only staff can export data."}, status=403)
+    job = get_object_or_404(ExportJob, pk=pk)
+    return JsonResponse(export_job_payload(job))
+
+
+@login_required
+def download_export(request, pk):
+    if not request.user.is_staff:
+        messages.error(request, "Only staff can export data.")
+        return redirect("completed_list")
+    job = get_object_or_404(ExportJob, pk=pk, status="Done")
+    path = export_path(job)
+    if not os.path.exists(path):
+        raise Http404("Export file is no longer available.")
+    content_type = "text/csv" if job.file_format == "csv" else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=job.file_name, content_type=content_type)
+
+
+def export_job_payload(job):
+    payload = {"id": job.id, "status": job.status, "rows": job.row_count}
+    if job.status == "Done":
+        payload["download_url"] = reverse("download_export", args=[job.id])
+    if job.status == "Failed":
+        payload["error"] = job.error
+    return payload
 
 
 @login_required
@@ -215,17 +549,16 @@ def clear_completed_tasks(request):
         return redirect("completed_list")
     
     if request.method == "POST":
-        # Count tasks before deletion
-        count = Demand.objects.filter(status="Completed").count()
-        
-        # Delete completed tasks
-        Demand.objects.filter(status="Completed").delete()
+        # Delete completed tasks from the live table and the archive in short chunks
+        count = 0
+        for deleted in clear_completed():
+            count += deleted
         
         messages.success(request, f"Successfully cleared {count} completed tasks.")
         return redirect("completed_list")
     
     # If GET request, show confirmation
-    count = Demand.objects.filter(status="Completed").count()
+    count = sum(demands.count() for demands in completed_sources())
     return render(request, "hotel_queue/clear_confirm.html", {"count": count})
 
 
@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+class BatchWriter:
+    """One thread that runs write operations for the whole process, several per transaction.
+
+    SQLite lets one connection write at a time, so request threads that each
+    open a write transaction mostly wait for the lock and pay for their own
+    commit. Here they hand the operation over instead: the writer collects
+    whatever arrives within ``window`` seconds, up to ``batch_size``
+    operations, and runs them in one transaction, each inside its own
+    savepoint. An operation that raises is rolled back alone and its caller
+    gets the exception; the others still commit. Callers wait on a Future
+    that resolves once the batch has committed.
+    """
+
+    def __init__(self, batch_size, window):
+        self.batch_size = batch_size
+        self.window = window
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="hotel-queue-writer", daemon=True)
+        self.stopping = False
+        self.batches = 0
+        self.operations = 0
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, operation):
+        future = Future()
+        self.pending.put((operation, future))
+        return future
+
+    def stop(self):
+        self.pending.put(None)
+        self.thread.join()
+
+    def run(self):
+        # Until stop() queues None; the writer keeps one database connection throughout
+        try:
+            while True:
+                batch = self.collect()
+                if batch:
+                    self.write(batch)
+                if self.stopping:
+                    return
+        finally:
+            connection.close()
+
+    def collect(self):
+        """Block for the first operation, then take what else arrives within the window."""
+        first = self.pending.get()
+        if first is None:
+            self.stopping = True
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def write(self, batch):
+        results = []
+        try:
+            with transaction.atomic():
+                for operation, future in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, operation(), None))
+                    except Exception as exc:
+                        results.append((future, None, exc))
+        except Exception as exc:
+            # The batch itself failed (BEGIN or COMMIT), so nothing in it was written
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.operations += len(batch)
+        for future, result, exc in results:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def batch_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter(settings.WRITE_BATCH_SIZE, settings.WRITE_BATCH_WINDOW_MS / 1000)
+            _writer.start()
+        return _writer
+
+
+def stop_batch_writer():
+    """Finish the queued operations and stop the writer thread, e.g. before switching databases.
+
+    Returns the stopped BatchWriter, for its counts, or None if none was running.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+    return writer
+
+
+def run_write(operation):
+    """Run ``operation`` (a callable doing one atomic write) and return its result.
+
+    With COALESCE_WRITES it goes through the batch writer; otherwise, or when
+    the caller is already inside a transaction the operation must join, it
+    runs here. Follow-up work that needs the change committed (recounts,
+    assignment, publishing) belongs after this returns, in the caller.
+
+    Every demand write on a request path goes through here: create, start,
+    complete, bulk transitions, ingestion, auto-assignment and releasing
+    Waiting demands, and so does queuing an export job. Archiving and
+    clearing do not; they are maintenance jobs that already write in short
+    chunks of their own.
+    """
+    if not settings.COALESCE_WRITES or connection.in_atomic_block:
+        with transaction.atomic():
+            return operation()
+    return batch_writer().submit(operation).result()